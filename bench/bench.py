@@ -0,0 +1,276 @@
+#!/usr/bin/python3
+#
+# Copyright © 2019 Keith Packard <keithp@keithp.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin St, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+
+#
+# Benchmarks for lola and the parsers it generates.
+#
+# The generator benchmarks time each phase of building a parser
+# (reading the grammar, computing FIRST/FOLLOW, building and
+# optimizing the table and writing the C and python output) for the
+# grammars in this directory, the older grammars in test/ and
+# synthetic grammars of increasing size.
+#
+# The parser benchmarks run calc, json, pycalc and pyjson over
+# generated input of increasing size and nesting depth.
+#
+# Each time is the fastest of --repeat runs. Results are written as
+# JSON so that they can be compared between releases.
+#
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+top_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, top_dir)
+
+import lola
+import synthgram
+
+ll_grammars = ('calc-gram.ll', 'json-gram.ll', 'pycalc_gram.ll', 'pyjson_gram.ll', 'lola-gram.ll')
+lisp_grammars = ('test/float', 'test/prof', 'test/tekgram')
+
+# Options the Makefile builds each grammar with
+grammar_options = { 'calc-gram.ll': { 'attributes': True },
+                    'pycalc_gram.ll': { 'attributes': True, 'left_recursion': True },
+                    'pyjson_gram.ll': { 'attributes': True } }
+synthetic_sizes = (50, 100, 200, 400)
+quick_synthetic_sizes = (50, 100)
+
+#
+# The grammars in test/ are written for the original lisp version of
+# lola, as a list of rules each holding a non-terminal followed by its
+# productions:
+#
+#   ((expr (term exprp))
+#    (exprp (+ term "ADD" exprp) ()))
+#
+# Symbols without rules are terminals, strings are actions. Terminals
+# are renamed as lola terminals need to be upper case names, other
+# non-terminals are made lower case, and the first non-terminal
+# becomes 'start'
+#
+
+def lisp_tokens(text):
+    text = re.sub(r';[^\n]*', '', text)
+    return re.findall(r'\|(?:\\.|[^|])*\||"[^"]*"|\(|\)|[^\s()]+', text)
+
+def lisp_read(tokens, pos):
+    if tokens[pos] != '(':
+        return tokens[pos], pos + 1
+    pos += 1
+    items = []
+    while tokens[pos] != ')':
+        item, pos = lisp_read(tokens, pos)
+        items.append(item)
+    return items, pos + 1
+
+def lisp_grammar(text):
+    rules, pos = lisp_read(lisp_tokens(text), 0)
+    non_terminals = {}
+    for rule in rules:
+        if not non_terminals:
+            name = 'start'
+        else:
+            name = rule[0].lower()
+            while name in non_terminals.values():
+                name += "-p"
+        non_terminals[rule[0]] = name
+
+    def symbol(item):
+        if item in non_terminals:
+            return non_terminals[item]
+        if item.startswith('"'):
+            return '@' + item[1:-1] + '@'
+        return 'T' + item.strip('|').encode().hex().upper()
+
+    out = ""
+    for rule in rules:
+        out += "%s\t: %s\n\t;\n" % (symbol(rule[0]),
+                                   "\n\t| ".join(" ".join(symbol(item) for item in prod) for prod in rule[1:]))
+    return out
+
+def grammars(quick):
+    for name in ll_grammars:
+        with open(os.path.join(top_dir, name)) as file:
+            yield name, file.read()
+    for name in lisp_grammars:
+        with open(os.path.join(top_dir, name)) as file:
+            yield name, lisp_grammar(file.read())
+    for n in quick_synthetic_sizes if quick else synthetic_sizes:
+        yield "synthetic-%d" % n, synthgram.synth_grammar(n)
+
+def best_time(repeat, func):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+#
+# Time each phase of building one grammar. Each phase starts from the
+# results of the previous one, so the phases are run in order for
+# every repetition
+#
+
+phases = ('load', 'analyze', 'table', 'optimize', 'emit_c', 'emit_python')
+
+def bench_grammar(name, text, repeat):
+    times = dict((phase, None) for phase in phases)
+    for i in range(repeat):
+        generator = lola.Lola(**grammar_options.get(name, {}))
+        steps = (('load', lambda: generator.load(io.StringIO(text), name)),
+                 ('analyze', generator.analyze),
+                 ('table', generator.build_table),
+                 ('optimize', generator.optimize),
+                 ('emit_c', lambda: generator.emit_c(file=io.StringIO(), filename=name)),
+                 ('emit_python', lambda: generator.emit_python(file=io.StringIO())))
+        with contextlib.redirect_stderr(io.StringIO()):
+            for phase, step in steps:
+                start = time.perf_counter()
+                step()
+                elapsed = time.perf_counter() - start
+                if times[phase] is None or elapsed < times[phase]:
+                    times[phase] = elapsed
+
+    symbols = generator.symbols
+    c_output = io.StringIO()
+    generator.emit_c(file=c_output, filename=name)
+    return { 'grammar': name,
+             'phases': times,
+             'total': sum(times.values()),
+             'terminals': symbols.first_non_terminal,
+             'non_terminals': symbols.first_action - symbols.first_non_terminal,
+             'actions': len(symbols.names) - symbols.first_action,
+             'table_entries': len(generator.parse_table),
+             'conflicts': len(generator.warnings),
+             'c_bytes': len(c_output.getvalue()) }
+
+#
+# Input for the example parsers. Each calc line is an expression
+# wrapped in 'depth' parentheses, each json document an array of
+# 'size' objects nested 'depth' deep
+#
+
+def calc_input(size, depth):
+    expr = "1"
+    for d in range(depth):
+        expr = "(%s + %d) - %d" % (expr, d, d)
+    return "".join("%s * %d\n" % (expr, i) for i in range(size))
+
+def json_input(size, depth):
+    item = '"leaf"'
+    for d in range(depth):
+        item = '{"name": "n%d", "values": [%d, true, null, %s]}' % (d, d, item)
+    return "[\n" + ",\n".join(item for i in range(size)) + "\n]\n"
+
+parser_inputs = (('calc', calc_input), ('json', json_input))
+
+sizes = (100, 1000, 10000)
+depths = (1, 16, 128)
+quick_sizes = (100, 1000)
+quick_depths = (1, 16)
+
+#
+# Build the C parsers with stacks deep enough for the nested input
+#
+
+stack_defines = ('-DPARSE_STACK_SIZE=65536', '-DVALUE_STACK_SIZE=4096')
+
+def build_parsers(build_dir):
+    subprocess.run(('make', '-s', '-C', top_dir, 'calc-gram.h', 'json-gram.h',
+                    'pycalc_gram.py', 'pyjson_gram.py'), check=True)
+    commands = {}
+    for name, input in parser_inputs:
+        program = os.path.join(build_dir, name)
+        subprocess.run(('cc', '-O2', '-I', top_dir) + stack_defines +
+                       ('-o', program, os.path.join(top_dir, name + '.c')), check=True)
+        commands['c-' + name] = (program,)
+        commands['python-' + name] = (sys.executable, os.path.join(top_dir, 'py' + name + '.py'))
+    return commands
+
+def run_parser(command, input_name):
+    with open(input_name, 'rb') as input:
+        result = subprocess.run(command, stdin=input, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+def bench_parsers(repeat, quick):
+    results = []
+    with tempfile.TemporaryDirectory() as build_dir:
+        commands = build_parsers(build_dir)
+        cases = [(size, 1) for size in (quick_sizes if quick else sizes)]
+        cases += [(100, depth) for depth in (quick_depths if quick else depths) if depth != 1]
+        for name, make_input in parser_inputs:
+            for size, depth in cases:
+                input_name = os.path.join(build_dir, "%s-%d-%d.in" % (name, size, depth))
+                with open(input_name, 'w') as input:
+                    input.write(make_input(size, depth))
+                input_bytes = os.path.getsize(input_name)
+                for language in ('c', 'python'):
+                    parser = language + '-' + name
+                    seconds, ok = best_time(repeat, lambda: run_parser(commands[parser], input_name))
+                    results.append({ 'parser': parser,
+                                     'size': size,
+                                     'depth': depth,
+                                     'bytes': input_bytes,
+                                     'seconds': seconds,
+                                     'bytes_per_second': input_bytes / seconds,
+                                     'ok': ok })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lola and the parsers it generates.")
+    parser.add_argument('-o', '--output', help='Write JSON results to this file')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs of each benchmark, keeping the fastest')
+    parser.add_argument('-q', '--quick', action='store_true', help='Use smaller grammars and inputs')
+    parser.add_argument('--no-generator', action='store_true', help='Skip the generator benchmarks')
+    parser.add_argument('--no-parsers', action='store_true', help='Skip the parser benchmarks')
+    args = parser.parse_args()
+
+    results = { 'lola_version': lola.version,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'repeat': args.repeat }
+    if not args.no_generator:
+        results['generator'] = [bench_grammar(name, text, args.repeat) for name, text in grammars(args.quick)]
+    if not args.no_parsers:
+        results['parsers'] = bench_parsers(args.repeat, args.quick)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+            print(file=file)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
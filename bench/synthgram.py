@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+#
+# Copyright © 2019 Keith Packard <keithp@keithp.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin St, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+
+#
+# Generate large LL(1) grammars in lola syntax for scaling tests.
+#
+# The grammars are LL(1) by construction:
+#
+#  * Each production starts with a 'lead' terminal, different for
+#    each production of a non-terminal, so FIRST sets of the
+#    productions never overlap and there is no left recursion.
+#
+#  * Nullable non-terminals have an empty production. Everywhere
+#    they are used, they are followed by a 'filler' terminal, which
+#    is never a lead, so their FOLLOW sets never overlap their FIRST
+#    sets. The one exception is a nullable non-terminal ending one of
+#    its own productions, making a list.
+#
+#  * Non-terminals only refer to those after them, other than those
+#    lists, so every non-terminal derives some string.
+#
+# With --time, lola is run over grammars of increasing size and the
+# time taken for each phase is printed along with how fast it grows.
+#
+
+import argparse
+import math
+import random
+import sys
+
+class SynthGrammar:
+    def __init__(self, non_terminals=100, terminals=40, length=4, alternatives=3,
+                 nullable=0.25, actions=0.2, seed=0):
+        self.non_terminals = max(non_terminals, 1)
+        self.length = max(length, 1)
+        self.alternatives = max(alternatives, 1)
+        self.nullable = nullable
+        self.actions = actions
+        self.random = random.Random(seed)
+        fillers = max(terminals // 4, 1)
+        self.leads = max(terminals - fillers, self.alternatives)
+        self.fillers = fillers
+        self.action_count = 0
+
+    def non_terminal_name(self, i):
+        if i == 0:
+            return "start"
+        return "n%d" % i
+
+    def lead(self, i):
+        return "L%d" % i
+
+    def filler(self):
+        return "F%d" % self.random.randrange(self.fillers)
+
+    def terminal(self):
+        i = self.random.randrange(self.leads + self.fillers)
+        if i < self.leads:
+            return self.lead(i)
+        return "F%d" % (i - self.leads)
+
+    def action(self):
+        self.action_count += 1
+        return "@{ a%d(); }@" % self.action_count
+
+    #
+    # Append a non-terminal to a production, with the filler terminal
+    # needed after nullable ones
+    #
+
+    def use(self, body, j):
+        body.append(self.non_terminal_name(j))
+        if self.is_nullable[j]:
+            body.append(self.filler())
+
+    def generate(self):
+        n = self.non_terminals
+        r = self.random
+        self.is_nullable = [i != 0 and r.random() < self.nullable for i in range(n)]
+        bodies = []
+        for i in range(n):
+            count = r.randint(1, self.alternatives)
+            leads = r.sample(range(self.leads), count)
+            prods = []
+            for lead in leads:
+                body = [self.lead(lead)]
+                for k in range(r.randrange(self.length)):
+                    if i + 1 < n and r.random() < 0.4:
+                        self.use(body, r.randrange(i + 1, n))
+                    else:
+                        body.append(self.terminal())
+                prods.append(body)
+            bodies.append(prods)
+
+        #
+        # Make sure each non-terminal is used by one before it
+        #
+
+        for j in range(1, n):
+            i = r.randrange(max(j - 8, 0), j)
+            self.use(r.choice(bodies[i]), j)
+
+        for i in range(n):
+            if self.is_nullable[i]:
+                r.choice(bodies[i]).append(self.non_terminal_name(i))
+
+        out = ""
+        for i in range(n):
+            prods = []
+            for body in bodies[i]:
+                symbols = []
+                for symbol in body:
+                    symbols.append(symbol)
+                    if r.random() < self.actions:
+                        symbols.append(self.action())
+                prods.append(" ".join(symbols))
+            if self.is_nullable[i]:
+                prods.append("")
+            out += "%s\t: %s\n\t;\n" % (self.non_terminal_name(i), "\n\t| ".join(prods))
+        return out
+
+def synth_grammar(non_terminals, **options):
+    return SynthGrammar(non_terminals, **options).generate()
+
+#
+# Time lola on grammars of 'start' non-terminals and twice as many on
+# each step. Growth is the exponent k where the time grows as n ** k
+# between steps
+#
+
+def time_scaling(start, steps, repeat, max_growth, options, file=sys.stdout):
+    import bench
+
+    previous = None
+    worst = 0
+    for step in range(steps):
+        n = start << step
+        result = bench.bench_grammar("synthetic-%d" % n, synth_grammar(n, **options), repeat)
+        line = "%6d nts %6d entries %3d conflicts" % (n, result['table_entries'], result['conflicts'])
+        for phase in bench.phases:
+            line += " %s %8.4f" % (phase, result['phases'][phase])
+        line += " total %8.4f" % result['total']
+        if previous:
+            growth = math.log(max(result['total'], 1e-9) / max(previous, 1e-9), 2)
+            worst = max(worst, growth)
+            line += " growth %.2f" % growth
+        print(line, file=file)
+        previous = result['total']
+    if max_growth is not None and worst > max_growth:
+        print("growth %.2f exceeds %.2f" % (worst, max_growth), file=sys.stderr)
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate LL(1) grammars for lola scaling tests.")
+    parser.add_argument('-n', '--non-terminals', type=int, default=100, help='Number of non-terminals')
+    parser.add_argument('-t', '--terminals', type=int, default=40, help='Number of terminals')
+    parser.add_argument('-l', '--length', type=int, default=4, help='Maximum symbols in each production')
+    parser.add_argument('-a', '--alternatives', type=int, default=3, help='Maximum productions for each non-terminal')
+    parser.add_argument('--nullable', type=float, default=0.25, help='Fraction of non-terminals which are nullable')
+    parser.add_argument('--actions', type=float, default=0.2, help='Chance of an action after each symbol')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('-o', '--output', help='Output file')
+    parser.add_argument('--time', action='store_true', help='Time lola on grammars of increasing size')
+    parser.add_argument('--steps', type=int, default=5, help='Number of sizes to time, doubling each step')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Runs of each timing, keeping the fastest')
+    parser.add_argument('--max-growth', type=float, help='Fail if time grows faster than n to this power')
+    args = parser.parse_args()
+
+    options = { 'terminals': args.terminals,
+                'length': args.length,
+                'alternatives': args.alternatives,
+                'nullable': args.nullable,
+                'actions': args.actions,
+                'seed': args.seed }
+
+    if args.output:
+        file = open(args.output, 'w')
+    else:
+        file = sys.stdout
+    if args.time:
+        ok = time_scaling(args.non_terminals, args.steps, args.repeat, args.max_growth, options, file=file)
+    else:
+        print(synth_grammar(args.non_terminals, **options), end='', file=file)
+        ok = True
+    if file is not sys.stdout:
+        file.close()
+    if not ok:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,885 @@
+/* 9 terminals 7 non_terminals 11 actions (8 duplicates) 28 parse table entries */
+
+#ifndef CONST
+#define CONST const
+#endif
+#if !defined(GRAMMAR_TABLE) && !defined(TOKEN_NAMES) && !defined(PARSE_CODE) && !defined(LEX_CODE)
+typedef enum {
+    TOKEN_NONE = 0,
+    END = 1,
+    NL = 2,
+    PLUS = 3,
+    MINUS = 4,
+    TIMES = 5,
+    DIVIDE = 6,
+    OP = 7,
+    CP = 8,
+    NUMBER = 9,
+    FIRST_NON_TERMINAL = 10,
+    NON_TERMINAL_start = 10,
+    NON_TERMINAL_line = 11,
+    NON_TERMINAL_expr = 12,
+    NON_TERMINAL_expr_p = 13,
+    NON_TERMINAL_term = 14,
+    NON_TERMINAL_term_p = 15,
+    NON_TERMINAL_fact = 16,
+    FIRST_ACTION = 17,
+    ACTION_17 = 17, // $[4] = $[2];
+    ACTION_18 = 18, // $[3] = -$[1];
+    ACTION_ATTR_POP_2 = 19, // ATTR_POP_2 $pop(2)
+    ACTION_ATTR_POP_3 = 20, // ATTR_POP_3 $pop(3)
+    ACTION_21 = 21, // $[4] = $[4] + $[1];
+    ACTION_22 = 22, // $[4] = $[4] - $[1];
+    ACTION_23 = 23, // $[4] = $[4] * $[1];
+    ACTION_24 = 24, // $[4] = $[4] / $[1];
+    ACTION_25 = 25, // printf("%g\n", $[2]);
+    ACTION_ATTR_COPY_POP_2 = 26, // ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)
+    ACTION_ATTR_COPY_POP_1 = 27, // ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)
+} __attribute__((packed)) token_t;
+#endif
+
+#ifdef GRAMMAR_TABLE
+#undef GRAMMAR_TABLE
+#ifndef PARSE_TABLE_DECLARATION
+#define PARSE_TABLE_DECLARATION(n) n
+#endif
+/*
+ * Parse table
+ *
+ * NL          , start        line, ACTION_ATTR_POP_2, start,
+ * MINUS       , start        line, ACTION_ATTR_POP_2, start,
+ * OP          , start        line, ACTION_ATTR_POP_2, start,
+ * NUMBER      , start        line, ACTION_ATTR_POP_2, start,
+ * END         , start       ()
+ * MINUS       , line         expr, NL, ACTION_25, ACTION_ATTR_COPY_POP_2,
+ * OP          , line         expr, NL, ACTION_25, ACTION_ATTR_COPY_POP_2,
+ * NUMBER      , line         expr, NL, ACTION_25, ACTION_ATTR_COPY_POP_2,
+ * NL          , line         NL, ACTION_ATTR_COPY_POP_1,
+ * MINUS       , expr         term, expr-p, ACTION_ATTR_COPY_POP_2,
+ * OP          , expr         term, expr-p, ACTION_ATTR_COPY_POP_2,
+ * NUMBER      , expr         term, expr-p, ACTION_ATTR_COPY_POP_2,
+ * PLUS        , expr-p       PLUS, term, ACTION_21, ACTION_ATTR_POP_3, expr-p,
+ * MINUS       , expr-p       MINUS, term, ACTION_22, ACTION_ATTR_POP_3, expr-p,
+ * NL          , expr-p      ()
+ * CP          , expr-p      ()
+ * MINUS       , term         fact, term-p, ACTION_ATTR_COPY_POP_2,
+ * OP          , term         fact, term-p, ACTION_ATTR_COPY_POP_2,
+ * NUMBER      , term         fact, term-p, ACTION_ATTR_COPY_POP_2,
+ * TIMES       , term-p       TIMES, fact, ACTION_23, ACTION_ATTR_POP_3, term-p,
+ * DIVIDE      , term-p       DIVIDE, fact, ACTION_24, ACTION_ATTR_POP_3, term-p,
+ * NL          , term-p      ()
+ * PLUS        , term-p      ()
+ * MINUS       , term-p      ()
+ * CP          , term-p      ()
+ * OP          , fact         OP, expr, CP, ACTION_17, ACTION_ATTR_POP_3,
+ * MINUS       , fact         MINUS, fact, ACTION_18, ACTION_ATTR_POP_2,
+ * NUMBER      , fact         NUMBER, ACTION_ATTR_COPY_POP_1,
+ */
+static CONST token_t PARSE_TABLE_DECLARATION(production_table)[] = {
+    /*    0 */    NON_TERMINAL_start, NON_TERMINAL_start, ACTION_ATTR_POP_2, NON_TERMINAL_line, TOKEN_NONE,
+    /*    5 */    NON_TERMINAL_start, TOKEN_NONE,
+    /*    7 */    NON_TERMINAL_line, ACTION_ATTR_COPY_POP_2, ACTION_25, NL, NON_TERMINAL_expr, TOKEN_NONE,
+    /*   13 */    NON_TERMINAL_line, ACTION_ATTR_COPY_POP_1, NL, TOKEN_NONE,
+    /*   17 */    NON_TERMINAL_expr, ACTION_ATTR_COPY_POP_2, NON_TERMINAL_expr_p, NON_TERMINAL_term, TOKEN_NONE,
+    /*   22 */    NON_TERMINAL_expr_p, NON_TERMINAL_expr_p, ACTION_ATTR_POP_3, ACTION_21, NON_TERMINAL_term, PLUS, TOKEN_NONE,
+    /*   29 */    NON_TERMINAL_expr_p, NON_TERMINAL_expr_p, ACTION_ATTR_POP_3, ACTION_22, NON_TERMINAL_term, MINUS, TOKEN_NONE,
+    /*   36 */    NON_TERMINAL_expr_p, TOKEN_NONE,
+    /*   38 */    NON_TERMINAL_term, ACTION_ATTR_COPY_POP_2, NON_TERMINAL_term_p, NON_TERMINAL_fact, TOKEN_NONE,
+    /*   43 */    NON_TERMINAL_term_p, NON_TERMINAL_term_p, ACTION_ATTR_POP_3, ACTION_23, NON_TERMINAL_fact, TIMES, TOKEN_NONE,
+    /*   50 */    NON_TERMINAL_term_p, NON_TERMINAL_term_p, ACTION_ATTR_POP_3, ACTION_24, NON_TERMINAL_fact, DIVIDE, TOKEN_NONE,
+    /*   57 */    NON_TERMINAL_term_p, TOKEN_NONE,
+    /*   59 */    NON_TERMINAL_fact, ACTION_ATTR_POP_3, ACTION_17, CP, NON_TERMINAL_expr, OP, TOKEN_NONE,
+    /*   66 */    NON_TERMINAL_fact, ACTION_ATTR_POP_2, ACTION_18, NON_TERMINAL_fact, MINUS, TOKEN_NONE,
+    /*   72 */    NON_TERMINAL_fact, ACTION_ATTR_COPY_POP_1, NUMBER, TOKEN_NONE,
+};
+typedef uint8_t token_key_t;
+#define production_index(i) ((i) << 0)
+/*
+ * Possible graph edges 36 total 4 minimal
+ */
+typedef uint8_t non_terminal_entry_t;
+#define NON_TERMINAL_CHAIN 0xfe
+#define NON_TERMINAL_END 0xff
+#define non_terminal_index(i) ((i) << 0)
+static CONST non_terminal_entry_t PARSE_TABLE_DECLARATION(non_terminal_table)[] = {
+    /* 0: (END) */
+          5,     /*              start: */
+      0xff,
+
+    /* 2: (NL PLUS MINUS CP) */
+         57,     /*             term-p: */
+      0xff,
+
+    /* 4: (NL CP) */
+         36,     /*             expr-p: */
+      0xfe,   2, /* NL PLUS MINUS CP */
+
+    /* 7: (NL) */
+         13,     /*               line: NL ACTION_ATTR_COPY_POP_1 */
+          0,     /*              start: line ACTION_ATTR_POP_2 start */
+      0xfe,   4, /* NL CP */
+
+    /* 11: (PLUS) */
+         22,     /*             expr-p: PLUS term ACTION_21 ACTION_ATTR_POP_3 expr-p */
+      0xfe,   2, /* NL PLUS MINUS CP */
+
+    /* 14: (NL MINUS OP NUMBER) */
+          0,     /*              start: line ACTION_ATTR_POP_2 start */
+      0xff,
+
+    /* 16: (MINUS OP NUMBER) */
+          7,     /*               line: expr NL ACTION_25 ACTION_ATTR_COPY_POP_2 */
+         17,     /*               expr: term expr-p ACTION_ATTR_COPY_POP_2 */
+         38,     /*               term: fact term-p ACTION_ATTR_COPY_POP_2 */
+      0xfe,  14, /* NL MINUS OP NUMBER */
+
+    /* 21: (MINUS) */
+         29,     /*             expr-p: MINUS term ACTION_22 ACTION_ATTR_POP_3 expr-p */
+         66,     /*               fact: MINUS fact ACTION_18 ACTION_ATTR_POP_2 */
+         57,     /*             term-p: */
+      0xfe,  16, /* MINUS OP NUMBER */
+
+    /* 26: (TIMES) */
+         43,     /*             term-p: TIMES fact ACTION_23 ACTION_ATTR_POP_3 term-p */
+      0xff,
+
+    /* 28: (DIVIDE) */
+         50,     /*             term-p: DIVIDE fact ACTION_24 ACTION_ATTR_POP_3 term-p */
+      0xff,
+
+    /* 30: (OP) */
+         59,     /*               fact: OP expr CP ACTION_17 ACTION_ATTR_POP_3 */
+      0xfe,  16, /* MINUS OP NUMBER */
+
+    /* 33: (NUMBER) */
+         72,     /*               fact: NUMBER ACTION_ATTR_COPY_POP_1 */
+      0xfe,  16, /* MINUS OP NUMBER */
+
+    /* 36: (CP) */
+         36,     /*             expr-p: */
+         57,     /*             term-p: */
+      0xff,
+
+};
+#define NON_TERMINAL_SIZE 39
+static CONST non_terminal_entry_t PARSE_TABLE_DECLARATION(terminal_table)[] = {
+    [END] = 0,
+    [NL] = 7,
+    [PLUS] = 11,
+    [MINUS] = 21,
+    [TIMES] = 26,
+    [DIVIDE] = 28,
+    [OP] = 30,
+    [CP] = 36,
+    [NUMBER] = 33,
+    [TOKEN_NONE] = 39,
+};
+#endif /* GRAMMAR_TABLE */
+
+#ifdef TOKEN_NAMES
+#undef TOKEN_NAMES
+#define token_name(a) token_names[a]
+static CONST char *CONST token_names[] = {
+    0,
+    "END",
+    "NL",
+    "PLUS",
+    "MINUS",
+    "TIMES",
+    "DIVIDE",
+    "OP",
+    "CP",
+    "NUMBER",
+    "start",
+    "line",
+    "expr",
+    "expr-p",
+    "term",
+    "term-p",
+    "fact",
+};
+#endif /* TOKEN_NAMES */
+
+#ifdef PARSE_CODE
+#undef PARSE_CODE
+#define PARSE_ATTRIBUTES
+#ifdef PARSE_PROFILE
+#define PARSE_PROFILE_ACTIONS 11
+static CONST char *CONST parse_profile_names[] = {
+    "TOKEN_NONE",
+    "END",
+    "NL",
+    "PLUS",
+    "MINUS",
+    "TIMES",
+    "DIVIDE",
+    "OP",
+    "CP",
+    "NUMBER",
+    "start",
+    "line",
+    "expr",
+    "expr-p",
+    "term",
+    "term-p",
+    "fact",
+    "ACTION_17",
+    "ACTION_18",
+    "ACTION_ATTR_POP_2",
+    "ACTION_ATTR_POP_3",
+    "ACTION_21",
+    "ACTION_22",
+    "ACTION_23",
+    "ACTION_24",
+    "ACTION_25",
+    "ACTION_ATTR_COPY_POP_2",
+    "ACTION_ATTR_COPY_POP_1",
+};
+#endif
+
+
+/*
+ * The parse stack. With PARSE_STACK_ALLOC defined, the stack starts
+ * with PARSE_STACK_SIZE entries and is grown as needed by calling
+ * PARSE_STACK_ALLOC(old, bytes), which works like realloc and is
+ * called with bytes == 0 to free the stack.
+ *
+ * Grammars built with --attributes also have an attribute stack of
+ * PARSE_ATTR_STACK_SIZE values of PARSE_ATTR_TYPE, which the
+ * application defines, and which grows along with the parse stack.
+ * Each terminal matched pushes PARSE_ATTR_TOKEN.
+ */
+
+#ifdef PARSE_ATTRIBUTES
+#ifndef PARSE_ATTR_STACK_SIZE
+#define PARSE_ATTR_STACK_SIZE	PARSE_STACK_SIZE
+#endif
+#ifndef PARSE_ATTR_TOKEN
+#define PARSE_ATTR_TOKEN	((PARSE_ATTR_TYPE) {0})
+#endif
+#endif
+
+struct parse_state {
+#ifdef PARSE_STACK_ALLOC
+    token_t	*stack;
+    int		stack_size;
+#else
+    token_t	stack[PARSE_STACK_SIZE];
+#endif
+    int		stack_p;
+#ifdef PARSE_TOKENS
+    const token_t *tokens;
+    size_t	n_tokens;
+    size_t	token_index;
+#endif
+#ifdef PARSE_ATTRIBUTES
+#ifdef PARSE_STACK_ALLOC
+    PARSE_ATTR_TYPE *attr;
+    int		attr_size;
+#else
+    PARSE_ATTR_TYPE attr[PARSE_ATTR_STACK_SIZE];
+#endif
+    int		attr_p;
+#endif
+};
+
+#ifdef PARSE_STACK_ALLOC
+#define PARSE_STATE_STACK_SIZE(state)	((state)->stack_size)
+#define PARSE_STATE_ATTR_SIZE(state)	((state)->attr_size)
+#else
+#define PARSE_STATE_STACK_SIZE(state)	PARSE_STACK_SIZE
+#define PARSE_STATE_ATTR_SIZE(state)	PARSE_ATTR_STACK_SIZE
+#endif
+
+#ifdef PARSE_PROFILE
+struct parse_profile {
+	unsigned long	lookups[FIRST_NON_TERMINAL][FIRST_ACTION - FIRST_NON_TERMINAL];
+	unsigned long	actions[PARSE_PROFILE_ACTIONS];
+	unsigned long	iterations;
+	int		max_depth;
+};
+
+static struct parse_profile parse_profile;
+
+#define PARSE_PROFILE_COUNT(counter) ((counter)++)
+#define PARSE_PROFILE_LOOKUP(terminal, non_terminal) do {		\
+		if ((terminal) < FIRST_NON_TERMINAL)			\
+			parse_profile.lookups[terminal][(non_terminal) - FIRST_NON_TERMINAL]++; \
+	} while (0)
+#define PARSE_PROFILE_DEPTH(depth) do {				\
+		if ((depth) > parse_profile.max_depth)			\
+			parse_profile.max_depth = (depth);		\
+	} while (0)
+
+static inline void
+parse_profile_reset(void)
+{
+	parse_profile = (struct parse_profile) { 0 };
+}
+
+/*
+ * Write the counters in the format read by lola --profile
+ */
+static inline void
+parse_profile_dump(FILE *file)
+{
+	int t, n, a;
+
+	fprintf(file, "# lola parse profile\n");
+	fprintf(file, "iterations %lu\n", parse_profile.iterations);
+	fprintf(file, "max-depth %d\n", parse_profile.max_depth);
+	for (t = 0; t < FIRST_NON_TERMINAL; t++)
+		for (n = 0; n < FIRST_ACTION - FIRST_NON_TERMINAL; n++)
+			if (parse_profile.lookups[t][n])
+				fprintf(file, "lookup %s %s %lu\n",
+					parse_profile_names[t],
+					parse_profile_names[n + FIRST_NON_TERMINAL],
+					parse_profile.lookups[t][n]);
+	for (a = 0; a < PARSE_PROFILE_ACTIONS; a++)
+		if (parse_profile.actions[a])
+			fprintf(file, "action %s %lu\n",
+				parse_profile_names[a + FIRST_ACTION],
+				parse_profile.actions[a]);
+}
+#else
+#define PARSE_PROFILE_COUNT(counter)
+#define PARSE_PROFILE_LOOKUP(terminal, non_terminal)
+#define PARSE_PROFILE_DEPTH(depth)
+#endif
+
+#if NON_TERMINAL_SIZE < 256
+typedef uint8_t non_terminal_index_t;
+#else
+#if NON_TERMINAL_SIZE < 65536
+typedef uint16_t non_terminal_index_t;
+#else
+typedef uint32_t non_terminal_index_t;
+#endif
+#endif
+
+#ifndef PARSE_TABLE_FETCH_TOKEN
+#define PARSE_TABLE_FETCH_TOKEN(addr) (*(addr))
+#endif
+#ifndef PARSE_TABLE_FETCH_INDEX
+#define PARSE_TABLE_FETCH_INDEX(addr) (*(addr))
+#endif
+
+static CONST token_t *
+match_state(token_t terminal, token_t non_terminal)
+{
+	token_key_t terminal_key = terminal;
+	if (terminal_key >= sizeof(terminal_table) / sizeof(terminal_table[0]))
+		return 0;
+	non_terminal_index_t non_term = non_terminal_index(PARSE_TABLE_FETCH_INDEX(&terminal_table[terminal_key]));
+	for (;;) {
+		non_terminal_entry_t i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term]);
+		PARSE_PROFILE_COUNT(parse_profile.iterations);
+		if (i == NON_TERMINAL_CHAIN) {
+			i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term+1]);
+			non_term = non_terminal_index(i);
+		} else if (i == NON_TERMINAL_END) {
+			break;
+		} else {
+			CONST token_t *production = &production_table[production_index(i)];
+			if (PARSE_TABLE_FETCH_TOKEN(production) == non_terminal) {
+				return production + 1;
+			}
+			non_term++;
+		}
+	}
+	return 0;
+}
+
+static inline token_t
+parse_pop(struct parse_state *state)
+{
+    if (state->stack_p == 0)
+	return TOKEN_NONE;
+    return state->stack[--state->stack_p];
+}
+
+#ifdef PARSE_STACK_ALLOC
+/*
+ * Double the size of a stack holding 'size' entries of 'bytes' each,
+ * returning NULL if it cannot be grown, including when the new size
+ * would overflow an int or the byte count a size_t
+ */
+static void *
+parse_grow(void *stack, int *size, size_t bytes)
+{
+    int new_size;
+    void *new_stack;
+
+    if (*size > (int) (~0u >> 2) || (size_t) *size * 2 > SIZE_MAX / bytes)
+	return NULL;
+    new_size = *size * 2;
+    new_stack = PARSE_STACK_ALLOC(stack, (size_t) new_size * bytes);
+    if (!new_stack)
+	return NULL;
+    *size = new_size;
+    return new_stack;
+}
+#endif
+
+static inline bool
+parse_push(struct parse_state *state, CONST token_t *tokens)
+{
+    token_t token;
+    while ((token = PARSE_TABLE_FETCH_TOKEN(tokens++)) != TOKEN_NONE) {
+        if (state->stack_p >= PARSE_STATE_STACK_SIZE(state)) {
+#ifdef PARSE_STACK_ALLOC
+	    token_t *stack = parse_grow(state->stack, &state->stack_size, sizeof (token_t));
+
+	    if (!stack)
+		return false;
+	    state->stack = stack;
+#else
+            return false;
+#endif
+	}
+	state->stack[state->stack_p++] = token;
+    }
+    return true;
+}
+
+#ifdef PARSE_ATTRIBUTES
+#define PARSE_ATTR(d)		(state->attr[state->attr_p - (d)])
+#define PARSE_ATTR_POP(n)	(state->attr_p -= (n))
+
+static inline bool
+parse_attr_push(struct parse_state *state, PARSE_ATTR_TYPE value)
+{
+    if (state->attr_p >= PARSE_STATE_ATTR_SIZE(state)) {
+#ifdef PARSE_STACK_ALLOC
+	PARSE_ATTR_TYPE *attr = parse_grow(state->attr, &state->attr_size, sizeof (PARSE_ATTR_TYPE));
+
+	if (!attr)
+	    return false;
+	state->attr = attr;
+#else
+	return false;
+#endif
+    }
+    state->attr[state->attr_p++] = value;
+    return true;
+}
+#endif
+
+static inline bool
+is_terminal(token_t token)
+{
+    return token < FIRST_NON_TERMINAL;
+}
+
+static inline bool
+is_action(token_t token)
+{
+    return token >= FIRST_ACTION;
+}
+
+static inline bool
+is_non_terminal(token_t token)
+{
+    return !is_terminal(token) && !is_action(token);
+}
+
+typedef enum {
+    parse_return_success,
+    parse_return_syntax,
+    parse_return_end,
+    parse_return_oom,
+    parse_return_error,
+    parse_return_more,
+} __attribute__((packed)) parse_return_t;
+
+/*
+ * Set up the parse stack with the start symbol. Returns false if the
+ * stack cannot be allocated
+ */
+static inline bool
+parser_init(struct parse_state *state)
+{
+#ifdef PARSE_STACK_ALLOC
+    state->stack = PARSE_STACK_ALLOC(NULL, PARSE_STACK_SIZE * sizeof (token_t));
+    if (!state->stack)
+	return false;
+    state->stack_size = PARSE_STACK_SIZE;
+#ifdef PARSE_ATTRIBUTES
+    state->attr = PARSE_STACK_ALLOC(NULL, PARSE_ATTR_STACK_SIZE * sizeof (PARSE_ATTR_TYPE));
+    if (!state->attr) {
+	(void) PARSE_STACK_ALLOC(state->stack, 0);
+	state->stack = NULL;
+	return false;
+    }
+    state->attr_size = PARSE_ATTR_STACK_SIZE;
+#endif
+#endif
+    state->stack_p = 0;
+    state->stack[state->stack_p++] = NON_TERMINAL_start;
+#ifdef PARSE_ATTRIBUTES
+    state->attr_p = 0;
+#endif
+    return true;
+}
+
+static inline void
+parser_fini(struct parse_state *state)
+{
+#ifdef PARSE_STACK_ALLOC
+    (void) PARSE_STACK_ALLOC(state->stack, 0);
+    state->stack = NULL;
+#ifdef PARSE_ATTRIBUTES
+    (void) PARSE_STACK_ALLOC(state->attr, 0);
+    state->attr = NULL;
+#endif
+#endif
+    state->stack_p = 0;
+}
+
+#ifdef PARSE_DEBUG
+static void
+parse_debug(token_t token, token_t top, struct parse_state *state)
+{
+    int i;
+#ifdef token_name
+    printf("%-15s : %s", token_names[token], token_names[top]);
+    for (i = state->stack_p-1; i >= 0; i--) {
+	if (!is_action(state->stack[i]))
+	    printf(" %s", token_names[state->stack[i]]);
+	else
+	    printf(" <%d>", state->stack[i]);
+    }
+#else
+    printf("token %d stack %d", token, top);
+    for (i = state->stack_p-1; i >= 0; i--)
+	printf(" %d", state->stack[i]);
+#endif
+    printf("\n");
+}
+#endif
+
+#ifndef PARSE_PUSH
+
+/*
+ * With PARSE_TOKENS, tokens come from an array instead of lex.
+ * PARSE_TOKEN_INDEX is the index of the last token read, and if the
+ * application defines PARSE_TOKEN_VALUE(lex_context, index), actions
+ * can use PARSE_VALUE to fetch the value of that token
+ */
+#ifdef PARSE_TOKENS
+#define PARSE_TOKEN_INDEX	(state->token_index - 1)
+#ifdef PARSE_TOKEN_VALUE
+#define PARSE_VALUE		PARSE_TOKEN_VALUE(lex_context, PARSE_TOKEN_INDEX)
+#endif
+#endif
+
+static parse_return_t
+parse_run(struct parse_state *state, void *lex_context)
+{
+    token_t token = TOKEN_NONE;
+#ifdef PARSE_TOP
+    PARSE_TOP
+#endif
+
+    for (;;) {
+	token_t top = parse_pop(state);
+
+	if (is_action(top)) {
+	    PARSE_PROFILE_COUNT(parse_profile.actions[top - FIRST_ACTION]);
+	    switch(top) {
+    case ACTION_17:
+#line 115 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(2);
+		}; break;
+    case ACTION_18:
+#line 119 "calc-gram.ll"
+        {
+			PARSE_ATTR(3) = -PARSE_ATTR(1);
+		}; break;
+    case ACTION_ATTR_POP_2:
+#line 61 "calc-gram.ll"
+        PARSE_ATTR_POP(2); break;
+    case ACTION_ATTR_POP_3:
+#line 88 "calc-gram.ll"
+        PARSE_ATTR_POP(3); break;
+    case ACTION_21:
+#line 89 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) + PARSE_ATTR(1);
+		}; break;
+    case ACTION_22:
+#line 94 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) - PARSE_ATTR(1);
+		}; break;
+    case ACTION_23:
+#line 103 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) * PARSE_ATTR(1);
+		}; break;
+    case ACTION_24:
+#line 108 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) / PARSE_ATTR(1);
+		}; break;
+    case ACTION_25:
+#line 71 "calc-gram.ll"
+        {
+			printf("%g\n", PARSE_ATTR(2));
+		}; break;
+    case ACTION_ATTR_COPY_POP_2:
+#line 70 "calc-gram.ll"
+        PARSE_ATTR(3) = PARSE_ATTR(2); PARSE_ATTR_POP(2); break;
+    case ACTION_ATTR_COPY_POP_1:
+#line 70 "calc-gram.ll"
+        PARSE_ATTR(2) = PARSE_ATTR(1); PARSE_ATTR_POP(1); break;
+#line 638 "calc-gram.h"
+
+	    default:
+		break;
+	    }
+#ifdef PARSE_ACTION_BOTTOM
+	    PARSE_ACTION_BOTTOM;
+#endif
+	    continue;
+	}
+
+	if (token == TOKEN_NONE) {
+#ifdef PARSE_TOKENS
+	    if (state->token_index < state->n_tokens)
+		token = state->tokens[state->token_index++];
+	    else
+		token = END;
+#elif defined(PARSE_LEX_SCAN)
+	    token = lex_scan(lex_context);
+	    if (token == TOKEN_NONE)
+		return parse_return_syntax;
+#else
+	    token = lex(lex_context);
+#endif
+	}
+
+	if (top == TOKEN_NONE) {
+	    if (token != END)
+	        return parse_return_syntax;
+	    return parse_return_success;
+	}
+
+#ifdef PARSE_DEBUG
+	parse_debug(token, top, state);
+#endif
+
+	if (is_terminal(top)) {
+	    if (top != token) {
+                if (token == END)
+                    return parse_return_end;
+		return parse_return_syntax;
+            }
+	    token = TOKEN_NONE;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, PARSE_ATTR_TOKEN))
+		return parse_return_oom;
+#endif
+	} else {
+	    CONST token_t *tokens;
+
+	    PARSE_PROFILE_LOOKUP(token, top);
+	    tokens = match_state(token, top);
+
+	    if (!tokens)
+		return parse_return_syntax;
+
+	    if (!parse_push(state, tokens))
+                return parse_return_oom;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, (PARSE_ATTR_TYPE) {0}))
+		return parse_return_oom;
+#endif
+	    PARSE_PROFILE_DEPTH(state->stack_p);
+	}
+    }
+}
+
+/*
+ * With PARSE_REENTRANT, the caller supplies the parse state, so
+ * separate threads can each run a parser
+ */
+#ifdef PARSE_TOKENS
+#ifdef PARSE_REENTRANT
+static parse_return_t
+parse_tokens(struct parse_state *state, const token_t *tokens, size_t n, void *lex_context)
+#else
+static parse_return_t
+parse_tokens(const token_t *tokens, size_t n, void *lex_context)
+#endif
+#else
+#ifdef PARSE_REENTRANT
+static parse_return_t
+parse(struct parse_state *state, void *lex_context)
+#else
+static parse_return_t
+parse(void *lex_context)
+#endif
+#endif
+{
+#ifndef PARSE_REENTRANT
+    static struct parse_state parse_static_state;
+    struct parse_state *state = &parse_static_state;
+#endif
+    parse_return_t ret;
+
+    if (!parser_init(state))
+	return parse_return_oom;
+#ifdef PARSE_TOKENS
+    state->tokens = tokens;
+    state->n_tokens = n;
+    state->token_index = 0;
+#endif
+    ret = parse_run(state, lex_context);
+    parser_fini(state);
+    return ret;
+}
+
+#else
+
+/*
+ * Push interface. The caller owns the parse state and hands tokens
+ * to parser_feed one at a time, which returns parse_return_more once
+ * the token has been matched. parser_finish supplies END. When the
+ * grammar matches END itself, the parse is complete once END has been
+ * matched and the stack is empty.
+ */
+
+static parse_return_t
+parser_feed(struct parse_state *state, token_t token)
+{
+    bool matched_end = false;
+
+#ifdef PARSE_TOP
+    PARSE_TOP
+#endif
+
+    for (;;) {
+	token_t top = parse_pop(state);
+
+	if (is_action(top)) {
+	    PARSE_PROFILE_COUNT(parse_profile.actions[top - FIRST_ACTION]);
+	    switch(top) {
+    case ACTION_17:
+#line 115 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(2);
+		}; break;
+    case ACTION_18:
+#line 119 "calc-gram.ll"
+        {
+			PARSE_ATTR(3) = -PARSE_ATTR(1);
+		}; break;
+    case ACTION_ATTR_POP_2:
+#line 61 "calc-gram.ll"
+        PARSE_ATTR_POP(2); break;
+    case ACTION_ATTR_POP_3:
+#line 88 "calc-gram.ll"
+        PARSE_ATTR_POP(3); break;
+    case ACTION_21:
+#line 89 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) + PARSE_ATTR(1);
+		}; break;
+    case ACTION_22:
+#line 94 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) - PARSE_ATTR(1);
+		}; break;
+    case ACTION_23:
+#line 103 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) * PARSE_ATTR(1);
+		}; break;
+    case ACTION_24:
+#line 108 "calc-gram.ll"
+        {
+			PARSE_ATTR(4) = PARSE_ATTR(4) / PARSE_ATTR(1);
+		}; break;
+    case ACTION_25:
+#line 71 "calc-gram.ll"
+        {
+			printf("%g\n", PARSE_ATTR(2));
+		}; break;
+    case ACTION_ATTR_COPY_POP_2:
+#line 70 "calc-gram.ll"
+        PARSE_ATTR(3) = PARSE_ATTR(2); PARSE_ATTR_POP(2); break;
+    case ACTION_ATTR_COPY_POP_1:
+#line 70 "calc-gram.ll"
+        PARSE_ATTR(2) = PARSE_ATTR(1); PARSE_ATTR_POP(1); break;
+#line 817 "calc-gram.h"
+
+	    default:
+		break;
+	    }
+#ifdef PARSE_ACTION_BOTTOM
+	    PARSE_ACTION_BOTTOM;
+#endif
+	    continue;
+	}
+
+	if (token == TOKEN_NONE) {
+	    if (top != TOKEN_NONE)
+		state->stack[state->stack_p++] = top;
+	    else if (matched_end)
+		return parse_return_success;
+	    return parse_return_more;
+	}
+
+	if (top == TOKEN_NONE) {
+	    if (token != END)
+	        return parse_return_syntax;
+	    return parse_return_success;
+	}
+
+#ifdef PARSE_DEBUG
+	parse_debug(token, top, state);
+#endif
+
+	if (is_terminal(top)) {
+	    if (top != token) {
+                if (token == END)
+                    return parse_return_end;
+		return parse_return_syntax;
+            }
+	    matched_end = token == END;
+	    token = TOKEN_NONE;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, PARSE_ATTR_TOKEN))
+		return parse_return_oom;
+#endif
+	} else {
+	    CONST token_t *tokens;
+
+	    PARSE_PROFILE_LOOKUP(token, top);
+	    tokens = match_state(token, top);
+
+	    if (!tokens)
+		return parse_return_syntax;
+
+	    if (!parse_push(state, tokens))
+                return parse_return_oom;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, (PARSE_ATTR_TYPE) {0}))
+		return parse_return_oom;
+#endif
+	    PARSE_PROFILE_DEPTH(state->stack_p);
+	}
+    }
+}
+
+static inline parse_return_t
+parser_finish(struct parse_state *state)
+{
+    return parser_feed(state, END);
+}
+
+#endif
+
+#endif /* PARSE_CODE */
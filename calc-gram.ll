@@ -49,20 +49,11 @@
 # Actions are any sequence of characters enclosed in
 # @. Use two @ signs to include an actual @ in the action.
 #
-# What I'd like to figure out is how to automate the management
-# of the value stack so that actions can associate values
-# with the non-terminal associated with the production in which
-# they occur. This would make them work more like yacc actions as
-# values could then be synthesized upwards in the grammar
-#
-# Perhaps a special token could be placed on the stack at the end of
-# each sequence of tokens that replace a non-terminal, and this token
-# could signal suitable value stack handling? That would need to know
-# the number of elements that had been in the production when it was
-# placed on the parse stack to know how many values to remove from the
-# value stack, it would then drop that number of elements from the
-# value stack and push the value computed by the last action within
-# the production
+# The grammar is built with --attributes, so each symbol has a value
+# which actions use as $1..$n, as in yacc, setting the value of the
+# production with $$. Without an action setting it, the value of a
+# production is that of its first symbol. The value of a NUMBER is
+# the number, which calc.c supplies as PARSE_ATTR_TOKEN.
 #
 
 # A calculator session is a sequence of lines
@@ -75,36 +66,33 @@ start	: line start
 # A line is an expression followed by a newline, or just a newline
 # alone.
 #
-# The C code implementing the calculator provides a numeric stack with
-# push/pop functions. Note that this set of actions is responsible for
-# maintaining that stack correctly; errors will terminate the parser, and so
-# the stack could be re-initialized when the parser is restarted.
-#
 
 line	: expr NL
 		@{
-			printf("%g\n", pop());
+			printf("%g\n", $1);
 		}@ 
 	| NL
 	;
 
 # Three levels of precedence, (+ -), (* /) and then unary
-# minus/parenthesized exprs
+# minus/parenthesized exprs.
+#
+# The operators are left associative, so each one is applied to the
+# value computed so far, which the -p lists hold in $0, the value just
+# before them in the production which started the list. Each
+# repetition of a list sees the same $0, so the list ends with the
+# whole value there, which becomes the value of that production.
 
 expr	: term expr-p
 	;
 expr-p	: PLUS term
 		@{
-			double b = pop();
-			double a = pop();
-			push(a + b);
+			$0 = $0 + $2;
 		}@
 	  expr-p
 	| MINUS term
 		@{
-			double b = pop();
-			double a = pop();
-			push(a - b);
+			$0 = $0 - $2;
 		}@
 	  expr-p
 	|
@@ -113,28 +101,23 @@ term	: fact term-p
 	;
 term-p	: TIMES fact
 		@{
-			double b = pop();
-			double a = pop();
-			push(a * b);
+			$0 = $0 * $2;
 		}@
 	  term-p
 	| DIVIDE fact
 		@{
-			double b = pop();
-			double a = pop();
-			push(a / b);
+			$0 = $0 / $2;
 		}@
 	  term-p
 	|
 	;
 fact	: OP expr CP
-	| MINUS fact
 		@{
-			double a = pop();
-			push(-a);
+			$$ = $2;
 		}@
-	| NUMBER
+	| MINUS fact
 		@{
-			push(lex_value);
+			$$ = -$2;
 		}@
+	| NUMBER
 	;
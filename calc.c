@@ -24,7 +24,9 @@
 
 #include "calc-gram.h"
 
+#ifndef PARSE_STACK_SIZE
 #define PARSE_STACK_SIZE	32
+#endif
 
 static int lex_c = 0;
 
@@ -105,18 +107,11 @@ lex(void *lex_context)
     }
 }
 
-static double value_stack[32];
-static int value_stack_p = 0;
-
-static void push(double value)
-{
-    value_stack[value_stack_p++] = value;
-}
-
-static double pop(void)
-{
-    return value_stack[--value_stack_p];
-}
+/*
+ * Values of the symbols in the grammar
+ */
+#define PARSE_ATTR_TYPE		double
+#define PARSE_ATTR_TOKEN	lex_value
 
 #define GRAMMAR_TABLE
 #define TOKEN_NAMES
@@ -0,0 +1,1194 @@
+/* 12 terminals 11 non_terminals 10 actions (2 duplicates) 39 parse table entries */
+
+#ifndef CONST
+#define CONST const
+#endif
+#if !defined(GRAMMAR_TABLE) && !defined(TOKEN_NAMES) && !defined(PARSE_CODE) && !defined(LEX_CODE)
+typedef enum {
+    TOKEN_NONE = 0,
+    END = 1,
+    OC = 2,
+    CC = 3,
+    COMMA = 4,
+    STRING = 5,
+    COLON = 6,
+    OS = 7,
+    CS = 8,
+    NUMBER = 9,
+    TRUE_TOKEN = 10,
+    FALSE_TOKEN = 11,
+    NULL_TOKEN = 12,
+    FIRST_NON_TERMINAL = 13,
+    NON_TERMINAL_start = 13,
+    NON_TERMINAL_object = 14,
+    NON_TERMINAL_o_pairs = 15,
+    NON_TERMINAL_pairs = 16,
+    NON_TERMINAL_pairs_p = 17,
+    NON_TERMINAL_pair = 18,
+    NON_TERMINAL_array = 19,
+    NON_TERMINAL_o_values = 20,
+    NON_TERMINAL_values = 21,
+    NON_TERMINAL_values_p = 22,
+    NON_TERMINAL_value = 23,
+    FIRST_ACTION = 24,
+    ACTION_24 = 24, // push_null();
+    ACTION_25 = 25, // push_array();
+    ACTION_26 = 26, // push_object();
+    ACTION_27 = 27, // push_bool(true);
+    ACTION_28 = 28, // push_bool(false);
+    ACTION_29 = 29, // push_string(PARSE_SPAN);
+    ACTION_30 = 30, // return(parse_return_success);
+    ACTION_31 = 31, // push_number(span_number(PARSE_SPAN));
+    ACTION_32 = 32, // value_t value = pop(); add_array(value);
+    ACTION_33 = 33, // value_t value = pop(); struct lex_span name = pop().string; add_object(name, value);
+} __attribute__((packed)) token_t;
+#endif
+
+#ifdef GRAMMAR_TABLE
+#undef GRAMMAR_TABLE
+#ifndef PARSE_TABLE_DECLARATION
+#define PARSE_TABLE_DECLARATION(n) n
+#endif
+/*
+ * Parse table
+ *
+ * OC          , start        value, END, ACTION_30,
+ * STRING      , start        value, END, ACTION_30,
+ * OS          , start        value, END, ACTION_30,
+ * NUMBER      , start        value, END, ACTION_30,
+ * TRUE_TOKEN  , start        value, END, ACTION_30,
+ * FALSE_TOKEN , start        value, END, ACTION_30,
+ * NULL_TOKEN  , start        value, END, ACTION_30,
+ * OC          , object       OC, ACTION_26, o-pairs, CC,
+ * STRING      , o-pairs      pairs,
+ * CC          , o-pairs     ()
+ * STRING      , pairs        pair, pairs-p,
+ * COMMA       , pairs-p      COMMA, pair, pairs-p,
+ * CC          , pairs-p     ()
+ * STRING      , pair         STRING, ACTION_29, COLON, value, ACTION_33,
+ * OS          , array        OS, ACTION_25, o-values, CS,
+ * OC          , o-values     values,
+ * STRING      , o-values     values,
+ * OS          , o-values     values,
+ * NUMBER      , o-values     values,
+ * TRUE_TOKEN  , o-values     values,
+ * FALSE_TOKEN , o-values     values,
+ * NULL_TOKEN  , o-values     values,
+ * CS          , o-values    ()
+ * OC          , values       value, ACTION_32, values-p,
+ * STRING      , values       value, ACTION_32, values-p,
+ * OS          , values       value, ACTION_32, values-p,
+ * NUMBER      , values       value, ACTION_32, values-p,
+ * TRUE_TOKEN  , values       value, ACTION_32, values-p,
+ * FALSE_TOKEN , values       value, ACTION_32, values-p,
+ * NULL_TOKEN  , values       value, ACTION_32, values-p,
+ * COMMA       , values-p     COMMA, value, ACTION_32, values-p,
+ * CS          , values-p    ()
+ * STRING      , value        STRING, ACTION_29,
+ * NUMBER      , value        NUMBER, ACTION_31,
+ * OC          , value        object,
+ * OS          , value        array,
+ * TRUE_TOKEN  , value        TRUE_TOKEN, ACTION_27,
+ * FALSE_TOKEN , value        FALSE_TOKEN, ACTION_28,
+ * NULL_TOKEN  , value        NULL_TOKEN, ACTION_24,
+ */
+static CONST token_t PARSE_TABLE_DECLARATION(production_table)[] = {
+    /*    0 */    NON_TERMINAL_start, ACTION_30, END, NON_TERMINAL_value, TOKEN_NONE,
+    /*    5 */    NON_TERMINAL_object, CC, NON_TERMINAL_o_pairs, ACTION_26, OC, TOKEN_NONE,
+    /*   11 */    NON_TERMINAL_o_pairs, NON_TERMINAL_pairs, TOKEN_NONE,
+    /*   14 */    NON_TERMINAL_o_pairs, TOKEN_NONE,
+    /*   16 */    NON_TERMINAL_pairs, NON_TERMINAL_pairs_p, NON_TERMINAL_pair, TOKEN_NONE,
+    /*   20 */    NON_TERMINAL_pairs_p, NON_TERMINAL_pairs_p, NON_TERMINAL_pair, COMMA, TOKEN_NONE,
+    /*   25 */    NON_TERMINAL_pairs_p, TOKEN_NONE,
+    /*   27 */    NON_TERMINAL_pair, ACTION_33, NON_TERMINAL_value, COLON, ACTION_29, STRING, TOKEN_NONE,
+    /*   34 */    NON_TERMINAL_array, CS, NON_TERMINAL_o_values, ACTION_25, OS, TOKEN_NONE,
+    /*   40 */    NON_TERMINAL_o_values, NON_TERMINAL_values, TOKEN_NONE,
+    /*   43 */    NON_TERMINAL_o_values, TOKEN_NONE,
+    /*   45 */    NON_TERMINAL_values, NON_TERMINAL_values_p, ACTION_32, NON_TERMINAL_value, TOKEN_NONE,
+    /*   50 */    NON_TERMINAL_values_p, NON_TERMINAL_values_p, ACTION_32, NON_TERMINAL_value, COMMA, TOKEN_NONE,
+    /*   56 */    NON_TERMINAL_values_p, TOKEN_NONE,
+    /*   58 */    NON_TERMINAL_value, ACTION_29, STRING, TOKEN_NONE,
+    /*   62 */    NON_TERMINAL_value, ACTION_31, NUMBER, TOKEN_NONE,
+    /*   66 */    NON_TERMINAL_value, NON_TERMINAL_object, TOKEN_NONE,
+    /*   69 */    NON_TERMINAL_value, NON_TERMINAL_array, TOKEN_NONE,
+    /*   72 */    NON_TERMINAL_value, ACTION_27, TRUE_TOKEN, TOKEN_NONE,
+    /*   76 */    NON_TERMINAL_value, ACTION_28, FALSE_TOKEN, TOKEN_NONE,
+    /*   80 */    NON_TERMINAL_value, ACTION_24, NULL_TOKEN, TOKEN_NONE,
+};
+typedef uint8_t token_key_t;
+#define production_index(i) ((i) << 0)
+/*
+ * Possible graph edges 1 total 1 minimal
+ */
+typedef uint8_t non_terminal_entry_t;
+#define NON_TERMINAL_CHAIN 0xfe
+#define NON_TERMINAL_END 0xff
+#define non_terminal_index(i) ((i) << 0)
+static CONST non_terminal_entry_t PARSE_TABLE_DECLARATION(non_terminal_table)[] = {
+    /* 0: (OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN) */
+          0,     /*              start: value END ACTION_30 */
+         40,     /*           o-values: values */
+         45,     /*             values: value ACTION_32 values-p */
+      0xff,
+
+    /* 4: (OC) */
+          5,     /*             object: OC ACTION_26 o-pairs CC */
+         66,     /*              value: object */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+    /* 8: (CC) */
+         14,     /*            o-pairs: */
+         25,     /*            pairs-p: */
+      0xff,
+
+    /* 11: (COMMA) */
+         20,     /*            pairs-p: COMMA pair pairs-p */
+         50,     /*           values-p: COMMA value ACTION_32 values-p */
+      0xff,
+
+    /* 14: (STRING) */
+         11,     /*            o-pairs: pairs */
+         16,     /*              pairs: pair pairs-p */
+         27,     /*               pair: STRING ACTION_29 COLON value ACTION_33 */
+         58,     /*              value: STRING ACTION_29 */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+    /* 20: (OS) */
+         34,     /*              array: OS ACTION_25 o-values CS */
+         69,     /*              value: array */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+    /* 24: (CS) */
+         43,     /*           o-values: */
+         56,     /*           values-p: */
+      0xff,
+
+    /* 27: (NUMBER) */
+         62,     /*              value: NUMBER ACTION_31 */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+    /* 30: (TRUE_TOKEN) */
+         72,     /*              value: TRUE_TOKEN ACTION_27 */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+    /* 33: (FALSE_TOKEN) */
+         76,     /*              value: FALSE_TOKEN ACTION_28 */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+    /* 36: (NULL_TOKEN) */
+         80,     /*              value: NULL_TOKEN ACTION_24 */
+      0xfe,   0, /* OC STRING OS NUMBER TRUE_TOKEN FALSE_TOKEN NULL_TOKEN */
+
+};
+#define NON_TERMINAL_SIZE 39
+static CONST non_terminal_entry_t PARSE_TABLE_DECLARATION(terminal_table)[] = {
+    [OC] = 4,
+    [CC] = 8,
+    [COMMA] = 11,
+    [STRING] = 14,
+    [OS] = 20,
+    [CS] = 24,
+    [NUMBER] = 27,
+    [TRUE_TOKEN] = 30,
+    [FALSE_TOKEN] = 33,
+    [NULL_TOKEN] = 36,
+    [TOKEN_NONE] = 39,
+};
+#endif /* GRAMMAR_TABLE */
+
+#ifdef TOKEN_NAMES
+#undef TOKEN_NAMES
+#define token_name(a) token_names[a]
+static CONST char *CONST token_names[] = {
+    0,
+    "END",
+    "OC",
+    "CC",
+    "COMMA",
+    "STRING",
+    "COLON",
+    "OS",
+    "CS",
+    "NUMBER",
+    "TRUE_TOKEN",
+    "FALSE_TOKEN",
+    "NULL_TOKEN",
+    "start",
+    "object",
+    "o-pairs",
+    "pairs",
+    "pairs-p",
+    "pair",
+    "array",
+    "o-values",
+    "values",
+    "values-p",
+    "value",
+};
+#endif /* TOKEN_NAMES */
+
+#ifdef LEX_CODE
+#undef LEX_CODE
+#ifndef PARSE_TABLE_DECLARATION
+#define PARSE_TABLE_DECLARATION(n) n
+#endif
+#ifndef LEX_TABLE_FETCH
+#define LEX_TABLE_FETCH(addr) (*(addr))
+#endif
+#define LEX_STATES 31
+#define LEX_CLASSES 25
+#define LEX_SKIP 13
+typedef uint8_t lex_state_t;
+typedef uint8_t lex_accept_t;
+typedef uint8_t lex_class_t;
+static CONST lex_class_t PARSE_TABLE_DECLARATION(lex_class)[256] = {
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    1,    2,    0,    0,    1,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       1,    0,    3,    0,    0,    0,    0,    0,    0,    0,    0,    4,    5,    6,    7,    0,
+       8,    8,    8,    8,    8,    8,    8,    8,    8,    8,    9,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,   10,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,   11,   12,   13,    0,    0,
+       0,   14,    0,    0,    0,   15,   16,    0,    0,    0,    0,    0,   17,    0,   18,    0,
+       0,    0,   19,   20,   21,   22,    0,    0,    0,    0,    0,   23,    0,   24,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+};
+static CONST lex_state_t PARSE_TABLE_DECLARATION(lex_next)[LEX_STATES * LEX_CLASSES] = {
+    /* 0 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 1 */
+       0,    2,    2,    3,    0,    4,    5,    0,    6,    7,    0,    8,    0,    9,    0,    0,
+      10,    0,   11,    0,    0,   12,    0,   13,   14,
+    /* 2 */
+       0,    2,    2,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 3 */
+       3,    3,    3,   15,    3,    3,    3,    3,    3,    3,    3,    3,   16,    3,    3,    3,
+       3,    3,    3,    3,    3,    3,    3,    3,    3,
+    /* 4 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 5 */
+       0,    0,    0,    0,    0,    0,    0,    0,    6,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 6 */
+       0,    0,    0,    0,    0,    0,    0,   17,    6,    0,   18,    0,    0,    0,    0,   18,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 7 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 8 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 9 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 10 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,   19,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 11 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,   20,    0,    0,
+    /* 12 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,   21,    0,    0,    0,    0,    0,
+    /* 13 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 14 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 15 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 16 */
+       3,    3,    0,    3,    3,    3,    3,    3,    3,    3,    3,    3,    3,    3,    3,    3,
+       3,    3,    3,    3,    3,    3,    3,    3,    3,
+    /* 17 */
+       0,    0,    0,    0,    0,    0,    0,    0,   17,    0,   18,    0,    0,    0,    0,   18,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 18 */
+       0,    0,    0,    0,   22,    0,   22,    0,   23,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 19 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,   24,    0,    0,    0,    0,    0,    0,    0,
+    /* 20 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,   25,    0,    0,    0,    0,    0,    0,    0,
+    /* 21 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,   26,    0,    0,
+    /* 22 */
+       0,    0,    0,    0,    0,    0,    0,    0,   23,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 23 */
+       0,    0,    0,    0,    0,    0,    0,    0,   23,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 24 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,   27,    0,    0,    0,    0,
+    /* 25 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,   28,    0,    0,    0,    0,    0,    0,    0,
+    /* 26 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,   29,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 27 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,   30,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 28 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 29 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+    /* 30 */
+       0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,    0,
+       0,    0,    0,    0,    0,    0,    0,    0,    0,
+};
+static CONST lex_accept_t PARSE_TABLE_DECLARATION(lex_accept)[LEX_STATES] = {
+    0,
+    0,
+    LEX_SKIP,
+    0,
+    COMMA,
+    0,
+    NUMBER,
+    COLON,
+    OS,
+    CS,
+    0,
+    0,
+    0,
+    OC,
+    CC,
+    STRING,
+    0,
+    NUMBER,
+    0,
+    0,
+    0,
+    0,
+    0,
+    NUMBER,
+    0,
+    0,
+    0,
+    0,
+    NULL_TOKEN,
+    TRUE_TOKEN,
+    FALSE_TOKEN,
+};
+
+struct lex_span {
+    const char	*start;
+    size_t	len;
+};
+
+struct lex_input {
+    const char		*text;
+    const char		*pos;
+    const char		*end;
+    struct lex_span	span;
+};
+
+/*
+ * In actions of a parser whose lex_context is the struct lex_input,
+ * PARSE_SPAN is the span of the last token read
+ */
+#define PARSE_SPAN	(((struct lex_input *) lex_context)->span)
+
+static inline void
+lex_input_init(struct lex_input *input, const char *text, size_t len)
+{
+    input->text = text;
+    input->pos = text;
+    input->end = text + len;
+    input->span.start = text;
+    input->span.len = 0;
+}
+
+#ifdef LEX_MMAP
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+/*
+ * Scan the file open on 'fd' by mapping it into memory. Returns false
+ * if it cannot be mapped, which happens for pipes and terminals
+ */
+static inline bool
+lex_input_map(struct lex_input *input, int fd)
+{
+    struct stat st;
+    void *text;
+
+    if (fstat(fd, &st) < 0 || !S_ISREG(st.st_mode))
+	return false;
+    if (st.st_size == 0) {
+	lex_input_init(input, "", 0);
+	return true;
+    }
+    text = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    if (text == MAP_FAILED)
+	return false;
+    lex_input_init(input, text, st.st_size);
+    return true;
+}
+
+static inline void
+lex_input_unmap(struct lex_input *input)
+{
+    if (input->end != input->text)
+	munmap((void *) input->text, input->end - input->text);
+}
+#endif
+
+/*
+ * Return the next token, END at the end of the buffer, or TOKEN_NONE
+ * when no token matches, leaving pos at the text which didn't match
+ */
+static token_t
+lex_scan(struct lex_input *input)
+{
+    for (;;) {
+	const char *pos = input->pos;
+	const char *token_end = pos;
+	lex_accept_t token = 0;
+	lex_state_t state = 1;
+
+	if (pos == input->end) {
+	    input->span.start = pos;
+	    input->span.len = 0;
+	    return END;
+	}
+	while (pos < input->end) {
+	    state = LEX_TABLE_FETCH(&lex_next[state * LEX_CLASSES +
+					      LEX_TABLE_FETCH(&lex_class[(uint8_t) *pos])]);
+	    if (state == 0)
+		break;
+	    pos++;
+	    if (LEX_TABLE_FETCH(&lex_accept[state])) {
+		token = LEX_TABLE_FETCH(&lex_accept[state]);
+		token_end = pos;
+	    }
+	}
+	if (token == 0)
+	    return TOKEN_NONE;
+	input->span.start = input->pos;
+	input->span.len = token_end - input->pos;
+	input->pos = token_end;
+	if (token != LEX_SKIP)
+	    return (token_t) token;
+    }
+}
+#endif /* LEX_CODE */
+
+#ifdef PARSE_CODE
+#undef PARSE_CODE
+#ifdef PARSE_PROFILE
+#define PARSE_PROFILE_ACTIONS 10
+static CONST char *CONST parse_profile_names[] = {
+    "TOKEN_NONE",
+    "END",
+    "OC",
+    "CC",
+    "COMMA",
+    "STRING",
+    "COLON",
+    "OS",
+    "CS",
+    "NUMBER",
+    "TRUE_TOKEN",
+    "FALSE_TOKEN",
+    "NULL_TOKEN",
+    "start",
+    "object",
+    "o-pairs",
+    "pairs",
+    "pairs-p",
+    "pair",
+    "array",
+    "o-values",
+    "values",
+    "values-p",
+    "value",
+    "ACTION_24",
+    "ACTION_25",
+    "ACTION_26",
+    "ACTION_27",
+    "ACTION_28",
+    "ACTION_29",
+    "ACTION_30",
+    "ACTION_31",
+    "ACTION_32",
+    "ACTION_33",
+};
+#endif
+
+
+/*
+ * The parse stack. With PARSE_STACK_ALLOC defined, the stack starts
+ * with PARSE_STACK_SIZE entries and is grown as needed by calling
+ * PARSE_STACK_ALLOC(old, bytes), which works like realloc and is
+ * called with bytes == 0 to free the stack.
+ *
+ * Grammars built with --attributes also have an attribute stack of
+ * PARSE_ATTR_STACK_SIZE values of PARSE_ATTR_TYPE, which the
+ * application defines, and which grows along with the parse stack.
+ * Each terminal matched pushes PARSE_ATTR_TOKEN.
+ */
+
+#ifdef PARSE_ATTRIBUTES
+#ifndef PARSE_ATTR_STACK_SIZE
+#define PARSE_ATTR_STACK_SIZE	PARSE_STACK_SIZE
+#endif
+#ifndef PARSE_ATTR_TOKEN
+#define PARSE_ATTR_TOKEN	((PARSE_ATTR_TYPE) {0})
+#endif
+#endif
+
+struct parse_state {
+#ifdef PARSE_STACK_ALLOC
+    token_t	*stack;
+    int		stack_size;
+#else
+    token_t	stack[PARSE_STACK_SIZE];
+#endif
+    int		stack_p;
+#ifdef PARSE_TOKENS
+    const token_t *tokens;
+    size_t	n_tokens;
+    size_t	token_index;
+#endif
+#ifdef PARSE_ATTRIBUTES
+#ifdef PARSE_STACK_ALLOC
+    PARSE_ATTR_TYPE *attr;
+    int		attr_size;
+#else
+    PARSE_ATTR_TYPE attr[PARSE_ATTR_STACK_SIZE];
+#endif
+    int		attr_p;
+#endif
+};
+
+#ifdef PARSE_STACK_ALLOC
+#define PARSE_STATE_STACK_SIZE(state)	((state)->stack_size)
+#define PARSE_STATE_ATTR_SIZE(state)	((state)->attr_size)
+#else
+#define PARSE_STATE_STACK_SIZE(state)	PARSE_STACK_SIZE
+#define PARSE_STATE_ATTR_SIZE(state)	PARSE_ATTR_STACK_SIZE
+#endif
+
+#ifdef PARSE_PROFILE
+struct parse_profile {
+	unsigned long	lookups[FIRST_NON_TERMINAL][FIRST_ACTION - FIRST_NON_TERMINAL];
+	unsigned long	actions[PARSE_PROFILE_ACTIONS];
+	unsigned long	iterations;
+	int		max_depth;
+};
+
+static struct parse_profile parse_profile;
+
+#define PARSE_PROFILE_COUNT(counter) ((counter)++)
+#define PARSE_PROFILE_LOOKUP(terminal, non_terminal) do {		\
+		if ((terminal) < FIRST_NON_TERMINAL)			\
+			parse_profile.lookups[terminal][(non_terminal) - FIRST_NON_TERMINAL]++; \
+	} while (0)
+#define PARSE_PROFILE_DEPTH(depth) do {				\
+		if ((depth) > parse_profile.max_depth)			\
+			parse_profile.max_depth = (depth);		\
+	} while (0)
+
+static inline void
+parse_profile_reset(void)
+{
+	parse_profile = (struct parse_profile) { 0 };
+}
+
+/*
+ * Write the counters in the format read by lola --profile
+ */
+static inline void
+parse_profile_dump(FILE *file)
+{
+	int t, n, a;
+
+	fprintf(file, "# lola parse profile\n");
+	fprintf(file, "iterations %lu\n", parse_profile.iterations);
+	fprintf(file, "max-depth %d\n", parse_profile.max_depth);
+	for (t = 0; t < FIRST_NON_TERMINAL; t++)
+		for (n = 0; n < FIRST_ACTION - FIRST_NON_TERMINAL; n++)
+			if (parse_profile.lookups[t][n])
+				fprintf(file, "lookup %s %s %lu\n",
+					parse_profile_names[t],
+					parse_profile_names[n + FIRST_NON_TERMINAL],
+					parse_profile.lookups[t][n]);
+	for (a = 0; a < PARSE_PROFILE_ACTIONS; a++)
+		if (parse_profile.actions[a])
+			fprintf(file, "action %s %lu\n",
+				parse_profile_names[a + FIRST_ACTION],
+				parse_profile.actions[a]);
+}
+#else
+#define PARSE_PROFILE_COUNT(counter)
+#define PARSE_PROFILE_LOOKUP(terminal, non_terminal)
+#define PARSE_PROFILE_DEPTH(depth)
+#endif
+
+#if NON_TERMINAL_SIZE < 256
+typedef uint8_t non_terminal_index_t;
+#else
+#if NON_TERMINAL_SIZE < 65536
+typedef uint16_t non_terminal_index_t;
+#else
+typedef uint32_t non_terminal_index_t;
+#endif
+#endif
+
+#ifndef PARSE_TABLE_FETCH_TOKEN
+#define PARSE_TABLE_FETCH_TOKEN(addr) (*(addr))
+#endif
+#ifndef PARSE_TABLE_FETCH_INDEX
+#define PARSE_TABLE_FETCH_INDEX(addr) (*(addr))
+#endif
+
+static CONST token_t *
+match_state(token_t terminal, token_t non_terminal)
+{
+	token_key_t terminal_key = terminal;
+	if (terminal_key >= sizeof(terminal_table) / sizeof(terminal_table[0]))
+		return 0;
+	non_terminal_index_t non_term = non_terminal_index(PARSE_TABLE_FETCH_INDEX(&terminal_table[terminal_key]));
+	for (;;) {
+		non_terminal_entry_t i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term]);
+		PARSE_PROFILE_COUNT(parse_profile.iterations);
+		if (i == NON_TERMINAL_CHAIN) {
+			i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term+1]);
+			non_term = non_terminal_index(i);
+		} else if (i == NON_TERMINAL_END) {
+			break;
+		} else {
+			CONST token_t *production = &production_table[production_index(i)];
+			if (PARSE_TABLE_FETCH_TOKEN(production) == non_terminal) {
+				return production + 1;
+			}
+			non_term++;
+		}
+	}
+	return 0;
+}
+
+static inline token_t
+parse_pop(struct parse_state *state)
+{
+    if (state->stack_p == 0)
+	return TOKEN_NONE;
+    return state->stack[--state->stack_p];
+}
+
+#ifdef PARSE_STACK_ALLOC
+/*
+ * Double the size of a stack holding 'size' entries of 'bytes' each,
+ * returning NULL if it cannot be grown, including when the new size
+ * would overflow an int or the byte count a size_t
+ */
+static void *
+parse_grow(void *stack, int *size, size_t bytes)
+{
+    int new_size;
+    void *new_stack;
+
+    if (*size > (int) (~0u >> 2) || (size_t) *size * 2 > SIZE_MAX / bytes)
+	return NULL;
+    new_size = *size * 2;
+    new_stack = PARSE_STACK_ALLOC(stack, (size_t) new_size * bytes);
+    if (!new_stack)
+	return NULL;
+    *size = new_size;
+    return new_stack;
+}
+#endif
+
+static inline bool
+parse_push(struct parse_state *state, CONST token_t *tokens)
+{
+    token_t token;
+    while ((token = PARSE_TABLE_FETCH_TOKEN(tokens++)) != TOKEN_NONE) {
+        if (state->stack_p >= PARSE_STATE_STACK_SIZE(state)) {
+#ifdef PARSE_STACK_ALLOC
+	    token_t *stack = parse_grow(state->stack, &state->stack_size, sizeof (token_t));
+
+	    if (!stack)
+		return false;
+	    state->stack = stack;
+#else
+            return false;
+#endif
+	}
+	state->stack[state->stack_p++] = token;
+    }
+    return true;
+}
+
+#ifdef PARSE_ATTRIBUTES
+#define PARSE_ATTR(d)		(state->attr[state->attr_p - (d)])
+#define PARSE_ATTR_POP(n)	(state->attr_p -= (n))
+
+static inline bool
+parse_attr_push(struct parse_state *state, PARSE_ATTR_TYPE value)
+{
+    if (state->attr_p >= PARSE_STATE_ATTR_SIZE(state)) {
+#ifdef PARSE_STACK_ALLOC
+	PARSE_ATTR_TYPE *attr = parse_grow(state->attr, &state->attr_size, sizeof (PARSE_ATTR_TYPE));
+
+	if (!attr)
+	    return false;
+	state->attr = attr;
+#else
+	return false;
+#endif
+    }
+    state->attr[state->attr_p++] = value;
+    return true;
+}
+#endif
+
+static inline bool
+is_terminal(token_t token)
+{
+    return token < FIRST_NON_TERMINAL;
+}
+
+static inline bool
+is_action(token_t token)
+{
+    return token >= FIRST_ACTION;
+}
+
+static inline bool
+is_non_terminal(token_t token)
+{
+    return !is_terminal(token) && !is_action(token);
+}
+
+typedef enum {
+    parse_return_success,
+    parse_return_syntax,
+    parse_return_end,
+    parse_return_oom,
+    parse_return_error,
+    parse_return_more,
+} __attribute__((packed)) parse_return_t;
+
+/*
+ * Set up the parse stack with the start symbol. Returns false if the
+ * stack cannot be allocated
+ */
+static inline bool
+parser_init(struct parse_state *state)
+{
+#ifdef PARSE_STACK_ALLOC
+    state->stack = PARSE_STACK_ALLOC(NULL, PARSE_STACK_SIZE * sizeof (token_t));
+    if (!state->stack)
+	return false;
+    state->stack_size = PARSE_STACK_SIZE;
+#ifdef PARSE_ATTRIBUTES
+    state->attr = PARSE_STACK_ALLOC(NULL, PARSE_ATTR_STACK_SIZE * sizeof (PARSE_ATTR_TYPE));
+    if (!state->attr) {
+	(void) PARSE_STACK_ALLOC(state->stack, 0);
+	state->stack = NULL;
+	return false;
+    }
+    state->attr_size = PARSE_ATTR_STACK_SIZE;
+#endif
+#endif
+    state->stack_p = 0;
+    state->stack[state->stack_p++] = NON_TERMINAL_start;
+#ifdef PARSE_ATTRIBUTES
+    state->attr_p = 0;
+#endif
+    return true;
+}
+
+static inline void
+parser_fini(struct parse_state *state)
+{
+#ifdef PARSE_STACK_ALLOC
+    (void) PARSE_STACK_ALLOC(state->stack, 0);
+    state->stack = NULL;
+#ifdef PARSE_ATTRIBUTES
+    (void) PARSE_STACK_ALLOC(state->attr, 0);
+    state->attr = NULL;
+#endif
+#endif
+    state->stack_p = 0;
+}
+
+#ifdef PARSE_DEBUG
+static void
+parse_debug(token_t token, token_t top, struct parse_state *state)
+{
+    int i;
+#ifdef token_name
+    printf("%-15s : %s", token_names[token], token_names[top]);
+    for (i = state->stack_p-1; i >= 0; i--) {
+	if (!is_action(state->stack[i]))
+	    printf(" %s", token_names[state->stack[i]]);
+	else
+	    printf(" <%d>", state->stack[i]);
+    }
+#else
+    printf("token %d stack %d", token, top);
+    for (i = state->stack_p-1; i >= 0; i--)
+	printf(" %d", state->stack[i]);
+#endif
+    printf("\n");
+}
+#endif
+
+#ifndef PARSE_PUSH
+
+/*
+ * With PARSE_TOKENS, tokens come from an array instead of lex.
+ * PARSE_TOKEN_INDEX is the index of the last token read, and if the
+ * application defines PARSE_TOKEN_VALUE(lex_context, index), actions
+ * can use PARSE_VALUE to fetch the value of that token
+ */
+#ifdef PARSE_TOKENS
+#define PARSE_TOKEN_INDEX	(state->token_index - 1)
+#ifdef PARSE_TOKEN_VALUE
+#define PARSE_VALUE		PARSE_TOKEN_VALUE(lex_context, PARSE_TOKEN_INDEX)
+#endif
+#endif
+
+static parse_return_t
+parse_run(struct parse_state *state, void *lex_context)
+{
+    token_t token = TOKEN_NONE;
+#ifdef PARSE_TOP
+    PARSE_TOP
+#endif
+
+    for (;;) {
+	token_t top = parse_pop(state);
+
+	if (is_action(top)) {
+	    PARSE_PROFILE_COUNT(parse_profile.actions[top - FIRST_ACTION]);
+	    switch(top) {
+    case ACTION_24:
+#line 84 "json-gram.ll"
+        {
+			push_null();
+		}; break;
+    case ACTION_25:
+#line 38 "json-gram.ll"
+        {
+			push_array();
+		}; break;
+    case ACTION_26:
+#line 8 "json-gram.ll"
+        {
+			push_object();
+		}; break;
+    case ACTION_27:
+#line 76 "json-gram.ll"
+        {
+			push_bool(true);
+		}; break;
+    case ACTION_28:
+#line 80 "json-gram.ll"
+        {
+			push_bool(false);
+		}; break;
+    case ACTION_29:
+#line 66 "json-gram.ll"
+        {
+			push_string(PARSE_SPAN);
+		}; break;
+    case ACTION_30:
+#line 2 "json-gram.ll"
+        {
+			return(parse_return_success);
+		}; break;
+    case ACTION_31:
+#line 70 "json-gram.ll"
+        {
+			push_number(span_number(PARSE_SPAN));
+		}; break;
+    case ACTION_32:
+#line 57 "json-gram.ll"
+        {
+			value_t value = pop();
+			add_array(value);
+		}; break;
+    case ACTION_33:
+#line 30 "json-gram.ll"
+        {
+			value_t value = pop();
+			struct lex_span name = pop().string;
+			add_object(name, value);
+		}; break;
+#line 941 "json-gram.h"
+
+	    default:
+		break;
+	    }
+#ifdef PARSE_ACTION_BOTTOM
+	    PARSE_ACTION_BOTTOM;
+#endif
+	    continue;
+	}
+
+	if (token == TOKEN_NONE) {
+#ifdef PARSE_TOKENS
+	    if (state->token_index < state->n_tokens)
+		token = state->tokens[state->token_index++];
+	    else
+		token = END;
+#elif defined(PARSE_LEX_SCAN)
+	    token = lex_scan(lex_context);
+	    if (token == TOKEN_NONE)
+		return parse_return_syntax;
+#else
+	    token = lex(lex_context);
+#endif
+	}
+
+	if (top == TOKEN_NONE) {
+	    if (token != END)
+	        return parse_return_syntax;
+	    return parse_return_success;
+	}
+
+#ifdef PARSE_DEBUG
+	parse_debug(token, top, state);
+#endif
+
+	if (is_terminal(top)) {
+	    if (top != token) {
+                if (token == END)
+                    return parse_return_end;
+		return parse_return_syntax;
+            }
+	    token = TOKEN_NONE;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, PARSE_ATTR_TOKEN))
+		return parse_return_oom;
+#endif
+	} else {
+	    CONST token_t *tokens;
+
+	    PARSE_PROFILE_LOOKUP(token, top);
+	    tokens = match_state(token, top);
+
+	    if (!tokens)
+		return parse_return_syntax;
+
+	    if (!parse_push(state, tokens))
+                return parse_return_oom;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, (PARSE_ATTR_TYPE) {0}))
+		return parse_return_oom;
+#endif
+	    PARSE_PROFILE_DEPTH(state->stack_p);
+	}
+    }
+}
+
+/*
+ * With PARSE_REENTRANT, the caller supplies the parse state, so
+ * separate threads can each run a parser
+ */
+#ifdef PARSE_TOKENS
+#ifdef PARSE_REENTRANT
+static parse_return_t
+parse_tokens(struct parse_state *state, const token_t *tokens, size_t n, void *lex_context)
+#else
+static parse_return_t
+parse_tokens(const token_t *tokens, size_t n, void *lex_context)
+#endif
+#else
+#ifdef PARSE_REENTRANT
+static parse_return_t
+parse(struct parse_state *state, void *lex_context)
+#else
+static parse_return_t
+parse(void *lex_context)
+#endif
+#endif
+{
+#ifndef PARSE_REENTRANT
+    static struct parse_state parse_static_state;
+    struct parse_state *state = &parse_static_state;
+#endif
+    parse_return_t ret;
+
+    if (!parser_init(state))
+	return parse_return_oom;
+#ifdef PARSE_TOKENS
+    state->tokens = tokens;
+    state->n_tokens = n;
+    state->token_index = 0;
+#endif
+    ret = parse_run(state, lex_context);
+    parser_fini(state);
+    return ret;
+}
+
+#else
+
+/*
+ * Push interface. The caller owns the parse state and hands tokens
+ * to parser_feed one at a time, which returns parse_return_more once
+ * the token has been matched. parser_finish supplies END. When the
+ * grammar matches END itself, the parse is complete once END has been
+ * matched and the stack is empty.
+ */
+
+static parse_return_t
+parser_feed(struct parse_state *state, token_t token)
+{
+    bool matched_end = false;
+
+#ifdef PARSE_TOP
+    PARSE_TOP
+#endif
+
+    for (;;) {
+	token_t top = parse_pop(state);
+
+	if (is_action(top)) {
+	    PARSE_PROFILE_COUNT(parse_profile.actions[top - FIRST_ACTION]);
+	    switch(top) {
+    case ACTION_24:
+#line 84 "json-gram.ll"
+        {
+			push_null();
+		}; break;
+    case ACTION_25:
+#line 38 "json-gram.ll"
+        {
+			push_array();
+		}; break;
+    case ACTION_26:
+#line 8 "json-gram.ll"
+        {
+			push_object();
+		}; break;
+    case ACTION_27:
+#line 76 "json-gram.ll"
+        {
+			push_bool(true);
+		}; break;
+    case ACTION_28:
+#line 80 "json-gram.ll"
+        {
+			push_bool(false);
+		}; break;
+    case ACTION_29:
+#line 66 "json-gram.ll"
+        {
+			push_string(PARSE_SPAN);
+		}; break;
+    case ACTION_30:
+#line 2 "json-gram.ll"
+        {
+			return(parse_return_success);
+		}; break;
+    case ACTION_31:
+#line 70 "json-gram.ll"
+        {
+			push_number(span_number(PARSE_SPAN));
+		}; break;
+    case ACTION_32:
+#line 57 "json-gram.ll"
+        {
+			value_t value = pop();
+			add_array(value);
+		}; break;
+    case ACTION_33:
+#line 30 "json-gram.ll"
+        {
+			value_t value = pop();
+			struct lex_span name = pop().string;
+			add_object(name, value);
+		}; break;
+#line 1126 "json-gram.h"
+
+	    default:
+		break;
+	    }
+#ifdef PARSE_ACTION_BOTTOM
+	    PARSE_ACTION_BOTTOM;
+#endif
+	    continue;
+	}
+
+	if (token == TOKEN_NONE) {
+	    if (top != TOKEN_NONE)
+		state->stack[state->stack_p++] = top;
+	    else if (matched_end)
+		return parse_return_success;
+	    return parse_return_more;
+	}
+
+	if (top == TOKEN_NONE) {
+	    if (token != END)
+	        return parse_return_syntax;
+	    return parse_return_success;
+	}
+
+#ifdef PARSE_DEBUG
+	parse_debug(token, top, state);
+#endif
+
+	if (is_terminal(top)) {
+	    if (top != token) {
+                if (token == END)
+                    return parse_return_end;
+		return parse_return_syntax;
+            }
+	    matched_end = token == END;
+	    token = TOKEN_NONE;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, PARSE_ATTR_TOKEN))
+		return parse_return_oom;
+#endif
+	} else {
+	    CONST token_t *tokens;
+
+	    PARSE_PROFILE_LOOKUP(token, top);
+	    tokens = match_state(token, top);
+
+	    if (!tokens)
+		return parse_return_syntax;
+
+	    if (!parse_push(state, tokens))
+                return parse_return_oom;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, (PARSE_ATTR_TYPE) {0}))
+		return parse_return_oom;
+#endif
+	    PARSE_PROFILE_DEPTH(state->stack_p);
+	}
+    }
+}
+
+static inline parse_return_t
+parser_finish(struct parse_state *state)
+{
+    return parser_feed(state, END);
+}
+
+#endif
+
+#endif /* PARSE_CODE */
@@ -24,12 +24,12 @@ pairs-p	: COMMA pair pairs-p
 
 pair	: STRING
 		@{
-			push_string(lex_value);
+			push_string(PARSE_SPAN);
 		}@
 	  COLON value
 		@{
 			value_t value = pop();
-			const char *name = pop().string;
+			struct lex_span name = pop().string;
 			add_object(name, value);
 		}@
 	;
@@ -64,11 +64,11 @@ values-p: COMMA value
 
 value	: STRING
 		@{
-			push_string(lex_value);
+			push_string(PARSE_SPAN);
 		}@
 	| NUMBER
 		@{
-			push_number(strtod(lex_value, NULL));
+			push_number(span_number(PARSE_SPAN));
 		}@
 	| object
 	| array
@@ -85,3 +85,16 @@ value	: STRING
 			push_null();
 		}@
 	;
+
+OC	= "{" ;
+CC	= "}" ;
+OS	= "[" ;
+CS	= "]" ;
+COMMA	= "," ;
+COLON	= ":" ;
+STRING	= /"([^"\\]|\\.)*"/ ;
+NUMBER	= /-?[0-9]+(\.[0-9]*)?([eE][-+]?[0-9]+)?/ ;
+TRUE_TOKEN	= "true" ;
+FALSE_TOKEN	= "false" ;
+NULL_TOKEN	= "null" ;
+= /[ \t\r\n]+/ ;
@@ -25,148 +25,28 @@
 
 #include "json-gram.h"
 
+#ifndef PARSE_STACK_SIZE
 #define PARSE_STACK_SIZE	32
+#endif
 
-static int lex_c = 0;
-
-static int in_c(void)
-{
-    int c;
-    if (lex_c != 0) {
-        c = lex_c;
-        lex_c = 0;
-    } else {
-	c = getchar();
-    }
-    return c;
-}
+/*
+ * The scanner is generated by lola from the terminal definitions in
+ * json-gram.ll. Tokens are spans of the input buffer, which is mapped
+ * into memory when reading from a file, so no token text is copied
+ */
+#define LEX_CODE
+#define LEX_MMAP
+#include "json-gram.h"
 
-static void un_in_c(int c)
+static double span_number(struct lex_span span)
 {
-    lex_c = c;
-}
-
-static char *lex_value;
+    char buf[64];
 
-static bool
-lexadd(char c)
-{
-    size_t len = lex_value ? strlen(lex_value) : 0;
-    lex_value = realloc(lex_value, len + 2);
-    if (!lex_value)
-	return false;
-    lex_value[len] = c;
-    lex_value[len+1] = '\0';
-    return true;
-}
-
-static token_t
-lex(void *lex_context)
-{
-    if (!lex_value)
-	lex_value = malloc(1);
-    lex_value[0] = '\0';
-    for (;;) {
-	int c = in_c();
-	switch (c) {
-	case EOF:
-	    return END;
-	case '{':
-	    return OC;
-	case '}':
-	    return CC;
-	case '[':
-	    return OS;
-	case ']':
-	    return CS;
-	case ',':
-	    return COMMA;
-	case ':':
-	    return COLON;
-	case '\n':
-	case ' ':
-	case '\t':
-	    continue;
-	case '"':
-	    for (;;) {
-		c = in_c();
-		if (c == '"')
-		    break;
-		if (c == '\\') {
-		    c = in_c();
-		    switch (c) {
-		    case 'b':
-			c = '\b';
-			break;
-		    case 'f':
-			c = '\f';
-			break;
-		    case 'n':
-			c = '\n';
-			break;
-		    case 'r':
-			c = '\r';
-			break;
-		    case 't':
-			c = '\t';
-			break;
-		    default:
-			break;
-		    }
-		}
-		if (!lexadd(c))
-		    return END;
-	    }
-	    return STRING;
-	case '0': case '1': case '2': case '3':	case '4':
-	case '5': case '6': case '7': case '8':	case '9':
-	    while (isdigit(c)) {
-		if (!lexadd(c))
-		    return END;
-		c = in_c();
-	    }
-	    if (c == '.') {
-		if (!lexadd(c))
-		    return END;
-		c = in_c();
-		while (isdigit(c)) {
-		    if (!lexadd(c))
-			return END;
-		    c = in_c();
-		}
-	    }
-	    if (c == 'e') {
-		if (!lexadd(c))
-		    return END;
-		c = in_c();
-		if (c == '-' || c == '+') {
-		    if (!lexadd(c))
-			return END;
-		    c = in_c();
-		}
-		while (isdigit(c)) {
-		    if (!lexadd(c))
-			return END;
-		    c = in_c();
-		}
-	    }
-            un_in_c(c);
-	    return NUMBER;
-	default:
-	    while (islower(c)) {
-		if (!lexadd(c))
-		    return END;
-		c = in_c();
-	    }
-	    un_in_c(c);
-	    if (!strcmp(lex_value, "true"))
-		return TRUE_TOKEN;
-	    if (!strcmp(lex_value, "false"))
-		return FALSE_TOKEN;
-	    if (!strcmp(lex_value, "null"))
-		return NULL_TOKEN;
-	}
-    }
+    if (span.len >= sizeof(buf))
+	span.len = sizeof(buf) - 1;
+    memcpy(buf, span.start, span.len);
+    buf[span.len] = '\0';
+    return strtod(buf, NULL);
 }
 
 typedef struct value value_t;
@@ -182,15 +62,15 @@ struct value {
     union {
 	object_t	*object;
 	array_t		*array;
-	char		*string;
+	struct lex_span	string;
 	double		number;
 	bool		boolean;
     };
 };
 
 typedef struct {
-    char	*name;
-    value_t	value;
+    struct lex_span	name;
+    value_t		value;
 } member_t;
 
 struct object {
@@ -203,7 +83,11 @@ struct array {
     value_t	values[];
 };
 
-static value_t value_stack[32];
+#ifndef VALUE_STACK_SIZE
+#define VALUE_STACK_SIZE	32
+#endif
+
+static value_t value_stack[VALUE_STACK_SIZE];
 static int value_stack_p = 0;
 
 static void dump_value(int id, value_t value);
@@ -229,19 +113,40 @@ static void push_bool(bool boolean)
     push((value_t) { .type = value_bool, .boolean = boolean });
 }
 
+/* Values can't be built without memory, so give up when it runs out */
+static void *xrealloc(void *old, size_t size)
+{
+    void *new = realloc(old, size);
+
+    if (!new) {
+	fprintf(stderr, "json: out of memory\n");
+	exit(1);
+    }
+    return new;
+}
+
 static void push_array(void)
 {
-    push((value_t) { .type = value_array, .array = calloc(sizeof(array_t), 1) });
+    array_t *a = xrealloc(NULL, sizeof(array_t));
+
+    a->size = 0;
+    push((value_t) { .type = value_array, .array = a });
 }
 
 static void push_object(void)
 {
-    push((value_t) { .type = value_object, .object = calloc(sizeof(object_t), 1) });
+    object_t *o = xrealloc(NULL, sizeof(object_t));
+
+    o->size = 0;
+    push((value_t) { .type = value_object, .object = o });
 }
 
-static void push_string(const char *s)
+/* Strip the quotes from a STRING token */
+static void push_string(struct lex_span s)
 {
-    push((value_t) { .type = value_string, .string = strdup(s) });
+    s.start++;
+    s.len -= 2;
+    push((value_t) { .type = value_string, .string = s });
 }
 
 static void push_number(double d)
@@ -254,18 +159,18 @@ static void add_array(value_t value)
 {
     array_t *a = pop().array;
 
-    a = realloc(a, sizeof(array_t) + (a->size + 1) * sizeof(value_t));
+    a = xrealloc(a, sizeof(array_t) + (a->size + 1) * sizeof(value_t));
     a->values[a->size++] = value;
     push((value_t) { .type = value_array, .array = a });
 }
 
-static void add_object(const char *name, value_t value)
+static void add_object(struct lex_span name, value_t value)
 {
     object_t *o = pop().object;
 
-    o = realloc(o, sizeof(object_t) + (o->size + 1) * sizeof(member_t));
+    o = xrealloc(o, sizeof(object_t) + (o->size + 1) * sizeof(member_t));
     o->members[o->size++] = (member_t) {
-	.name = strdup(name),
+	.name = name,
 	.value = value
     };
     push((value_t) { .type = value_object, .object = o });
@@ -284,7 +189,7 @@ static void dump_object(int id, object_t *object)
     id++;
     for (i = 0; i < object->size; i++) {
 	indent(id);
-	printf("\"%s\": ", object->members[i].name);
+	printf("\"%.*s\": ", (int) object->members[i].name.len, object->members[i].name.start);
 	dump_value(id, object->members[i].value);
 	if (i < object->size - 1)
 	    printf(",");
@@ -323,7 +228,7 @@ static void dump_value(int id, value_t value)
 	dump_array(id, value.array);
 	break;
     case value_string:
-	printf("\"%s\"", value.string);
+	printf("\"%.*s\"", (int) value.string.len, value.string.start);
 	break;
     case value_number:
 	printf("%.17g", value.number);
@@ -340,13 +245,55 @@ static void dump_value(int id, value_t value)
 #define GRAMMAR_TABLE
 #define TOKEN_NAMES
 #define PARSE_CODE
+#define PARSE_LEX_SCAN
 #include "json-gram.h"
 
+/*
+ * Read all of a pipe into memory when the input can't be mapped
+ */
+static char *read_input(FILE *file, size_t *len)
+{
+    size_t size = 4096;
+    char *text = malloc(size);
+    size_t n;
+
+    *len = 0;
+    while (text && (n = fread(text + *len, 1, size - *len, file)) > 0) {
+	*len += n;
+	if (*len == size) {
+	    char *new = realloc(text, size * 2);
+
+	    if (!new) {
+		free(text);
+		return NULL;
+	    }
+	    text = new;
+	    size *= 2;
+	}
+    }
+    return text;
+}
+
 int main(int argc, char **argv)
 {
-    if (parse(NULL) == parse_return_success) {
+    struct lex_input input;
+    char *text = NULL;
+    bool mapped = lex_input_map(&input, 0);
+
+    if (!mapped) {
+	size_t len;
+
+	text = read_input(stdin, &len);
+	if (!text)
+	    return 1;
+	lex_input_init(&input, text, len);
+    }
+    if (parse(&input) == parse_return_success) {
 	dump_value(0, pop());
 	printf("\n");
     }
+    if (mapped)
+	lex_input_unmap(&input);
+    free(text);
     return 0;
 }
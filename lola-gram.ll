@@ -1,7 +1,11 @@
 start		: non-term start
 		|
 		;
-non-term	: SYMBOL @NONTERM@ COLON rules @RULES@ SEMI
+non-term	: SYMBOL @NONTERM@ non-term-p
+		| EQUALS PATTERN @SKIP@ SEMI
+		;
+non-term-p	: COLON rules @RULES@ SEMI
+		| EQUALS PATTERN @PATTERN@ SEMI
 		;
 rules		: rule rules-p
 		;
@@ -20,88 +20,209 @@
 
 import argparse
 import collections
+import concurrent.futures
+import hashlib
+import os
+import pickle
 import pprint
 import re
 import sys
+import tempfile
+import textwrap
+import time
+import tracemalloc
+
+version = "1.8"
 
 actions_marker = "@@ACTIONS@@"
 
 parse_code = """
 
-static token_t parse_stack[PARSE_STACK_SIZE];
-
-#if PARSE_STACK_SIZE < 256
-typedef uint8_t parse_stack_p_t;
-#else
-#if PARSE_STACK_SIZE < 65536
-typedef uint16_t parse_stack_p_t;
-#else
-typedef uint32_t parse_stack_p_t;
+/*
+ * The parse stack. With PARSE_STACK_ALLOC defined, the stack starts
+ * with PARSE_STACK_SIZE entries and is grown as needed by calling
+ * PARSE_STACK_ALLOC(old, bytes), which works like realloc and is
+ * called with bytes == 0 to free the stack.
+ *
+ * Grammars built with --attributes also have an attribute stack of
+ * PARSE_ATTR_STACK_SIZE values of PARSE_ATTR_TYPE, which the
+ * application defines, and which grows along with the parse stack.
+ * Each terminal matched pushes PARSE_ATTR_TOKEN.
+ */
+
+#ifdef PARSE_ATTRIBUTES
+#ifndef PARSE_ATTR_STACK_SIZE
+#define PARSE_ATTR_STACK_SIZE	PARSE_STACK_SIZE
+#endif
+#ifndef PARSE_ATTR_TOKEN
+#define PARSE_ATTR_TOKEN	((PARSE_ATTR_TYPE) {0})
 #endif
 #endif
 
-#if NON_TERMINAL_SIZE < 256
-typedef uint8_t non_terminal_index_t;
+struct parse_state {
+#ifdef PARSE_STACK_ALLOC
+    token_t	*stack;
+    int		stack_size;
 #else
-#if NON_TERMINAL_SIZE < 65536
-typedef uint16_t non_terminal_index_t;
+    token_t	stack[PARSE_STACK_SIZE];
+#endif
+    int		stack_p;
+#ifdef PARSE_TOKENS
+    const token_t *tokens;
+    size_t	n_tokens;
+    size_t	token_index;
+#endif
+#ifdef PARSE_ATTRIBUTES
+#ifdef PARSE_STACK_ALLOC
+    PARSE_ATTR_TYPE *attr;
+    int		attr_size;
 #else
-typedef uint32_t non_terminal_index_t;
+    PARSE_ATTR_TYPE attr[PARSE_ATTR_STACK_SIZE];
 #endif
+    int		attr_p;
 #endif
+};
 
-#ifndef PARSE_TABLE_FETCH_TOKEN
-#define PARSE_TABLE_FETCH_TOKEN(addr) (*(addr))
-#endif
-#ifndef PARSE_TABLE_FETCH_INDEX
-#define PARSE_TABLE_FETCH_INDEX(addr) (*(addr))
+#ifdef PARSE_STACK_ALLOC
+#define PARSE_STATE_STACK_SIZE(state)	((state)->stack_size)
+#define PARSE_STATE_ATTR_SIZE(state)	((state)->attr_size)
+#else
+#define PARSE_STATE_STACK_SIZE(state)	PARSE_STACK_SIZE
+#define PARSE_STATE_ATTR_SIZE(state)	PARSE_ATTR_STACK_SIZE
 #endif
 
-static CONST token_t *
-match_state(token_t terminal, token_t non_terminal)
+#ifdef PARSE_PROFILE
+struct parse_profile {
+	unsigned long	lookups[FIRST_NON_TERMINAL][FIRST_ACTION - FIRST_NON_TERMINAL];
+	unsigned long	actions[PARSE_PROFILE_ACTIONS];
+	unsigned long	iterations;
+	int		max_depth;
+};
+
+static struct parse_profile parse_profile;
+
+#define PARSE_PROFILE_COUNT(counter) ((counter)++)
+#define PARSE_PROFILE_LOOKUP(terminal, non_terminal) do {		\\
+		if ((terminal) < FIRST_NON_TERMINAL)			\\
+			parse_profile.lookups[terminal][(non_terminal) - FIRST_NON_TERMINAL]++; \\
+	} while (0)
+#define PARSE_PROFILE_DEPTH(depth) do {				\\
+		if ((depth) > parse_profile.max_depth)			\\
+			parse_profile.max_depth = (depth);		\\
+	} while (0)
+
+static inline void
+parse_profile_reset(void)
 {
-	token_key_t terminal_key = terminal;
-	if (terminal_key >= sizeof(terminal_table) / sizeof(terminal_table[0]))
-		return 0;
-	non_terminal_index_t non_term = non_terminal_index(PARSE_TABLE_FETCH_INDEX(&terminal_table[terminal_key]));
-	for (;;) {
-		uint8_t i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term]);
-		if (i == 0xfe) {
-			i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term+1]);
-			non_term = non_terminal_index(i);
-		} else if (i == 0xff) {
-			break;
-		} else {
-			CONST token_t *production = &production_table[production_index(i)];
-			if (PARSE_TABLE_FETCH_TOKEN(production) == non_terminal) {
-				return production + 1;
-			}
-			non_term++;
-		}
-	}
-	return 0;
+	parse_profile = (struct parse_profile) { 0 };
+}
+
+/*
+ * Write the counters in the format read by lola --profile
+ */
+static inline void
+parse_profile_dump(FILE *file)
+{
+	int t, n, a;
+
+	fprintf(file, "# lola parse profile\\n");
+	fprintf(file, "iterations %lu\\n", parse_profile.iterations);
+	fprintf(file, "max-depth %d\\n", parse_profile.max_depth);
+	for (t = 0; t < FIRST_NON_TERMINAL; t++)
+		for (n = 0; n < FIRST_ACTION - FIRST_NON_TERMINAL; n++)
+			if (parse_profile.lookups[t][n])
+				fprintf(file, "lookup %s %s %lu\\n",
+					parse_profile_names[t],
+					parse_profile_names[n + FIRST_NON_TERMINAL],
+					parse_profile.lookups[t][n]);
+	for (a = 0; a < PARSE_PROFILE_ACTIONS; a++)
+		if (parse_profile.actions[a])
+			fprintf(file, "action %s %lu\\n",
+				parse_profile_names[a + FIRST_ACTION],
+				parse_profile.actions[a]);
 }
+#else
+#define PARSE_PROFILE_COUNT(counter)
+#define PARSE_PROFILE_LOOKUP(terminal, non_terminal)
+#define PARSE_PROFILE_DEPTH(depth)
+#endif
 
+@@MATCH_STATE@@
 static inline token_t
-parse_pop(int *parse_stack_p)
+parse_pop(struct parse_state *state)
 {
-    if ((*parse_stack_p) == 0)
+    if (state->stack_p == 0)
 	return TOKEN_NONE;
-    return parse_stack[--(*parse_stack_p)];
+    return state->stack[--state->stack_p];
 }
 
+#ifdef PARSE_STACK_ALLOC
+/*
+ * Double the size of a stack holding 'size' entries of 'bytes' each,
+ * returning NULL if it cannot be grown, including when the new size
+ * would overflow an int or the byte count a size_t
+ */
+static void *
+parse_grow(void *stack, int *size, size_t bytes)
+{
+    int new_size;
+    void *new_stack;
+
+    if (*size > (int) (~0u >> 2) || (size_t) *size * 2 > SIZE_MAX / bytes)
+	return NULL;
+    new_size = *size * 2;
+    new_stack = PARSE_STACK_ALLOC(stack, (size_t) new_size * bytes);
+    if (!new_stack)
+	return NULL;
+    *size = new_size;
+    return new_stack;
+}
+#endif
+
 static inline bool
-parse_push(CONST token_t *tokens, int *parse_stack_p)
+parse_push(struct parse_state *state, CONST token_t *tokens)
 {
     token_t token;
     while ((token = PARSE_TABLE_FETCH_TOKEN(tokens++)) != TOKEN_NONE) {
-        if ((*parse_stack_p) >= PARSE_STACK_SIZE)
+        if (state->stack_p >= PARSE_STATE_STACK_SIZE(state)) {
+#ifdef PARSE_STACK_ALLOC
+	    token_t *stack = parse_grow(state->stack, &state->stack_size, sizeof (token_t));
+
+	    if (!stack)
+		return false;
+	    state->stack = stack;
+#else
             return false;
-	parse_stack[(*parse_stack_p)++] = token;
+#endif
+	}
+	state->stack[state->stack_p++] = token;
     }
     return true;
 }
 
+#ifdef PARSE_ATTRIBUTES
+#define PARSE_ATTR(d)		(state->attr[state->attr_p - (d)])
+#define PARSE_ATTR_POP(n)	(state->attr_p -= (n))
+
+static inline bool
+parse_attr_push(struct parse_state *state, PARSE_ATTR_TYPE value)
+{
+    if (state->attr_p >= PARSE_STATE_ATTR_SIZE(state)) {
+#ifdef PARSE_STACK_ALLOC
+	PARSE_ATTR_TYPE *attr = parse_grow(state->attr, &state->attr_size, sizeof (PARSE_ATTR_TYPE));
+
+	if (!attr)
+	    return false;
+	state->attr = attr;
+#else
+	return false;
+#endif
+    }
+    state->attr[state->attr_p++] = value;
+    return true;
+}
+#endif
+
 static inline bool
 is_terminal(token_t token)
 {
@@ -126,23 +247,103 @@ typedef enum {
     parse_return_end,
     parse_return_oom,
     parse_return_error,
+    parse_return_more,
 } __attribute__((packed)) parse_return_t;
 
+/*
+ * Set up the parse stack with the start symbol. Returns false if the
+ * stack cannot be allocated
+ */
+static inline bool
+parser_init(struct parse_state *state)
+{
+#ifdef PARSE_STACK_ALLOC
+    state->stack = PARSE_STACK_ALLOC(NULL, PARSE_STACK_SIZE * sizeof (token_t));
+    if (!state->stack)
+	return false;
+    state->stack_size = PARSE_STACK_SIZE;
+#ifdef PARSE_ATTRIBUTES
+    state->attr = PARSE_STACK_ALLOC(NULL, PARSE_ATTR_STACK_SIZE * sizeof (PARSE_ATTR_TYPE));
+    if (!state->attr) {
+	(void) PARSE_STACK_ALLOC(state->stack, 0);
+	state->stack = NULL;
+	return false;
+    }
+    state->attr_size = PARSE_ATTR_STACK_SIZE;
+#endif
+#endif
+    state->stack_p = 0;
+    state->stack[state->stack_p++] = NON_TERMINAL_start;
+#ifdef PARSE_ATTRIBUTES
+    state->attr_p = 0;
+#endif
+    return true;
+}
+
+static inline void
+parser_fini(struct parse_state *state)
+{
+#ifdef PARSE_STACK_ALLOC
+    (void) PARSE_STACK_ALLOC(state->stack, 0);
+    state->stack = NULL;
+#ifdef PARSE_ATTRIBUTES
+    (void) PARSE_STACK_ALLOC(state->attr, 0);
+    state->attr = NULL;
+#endif
+#endif
+    state->stack_p = 0;
+}
+
+#ifdef PARSE_DEBUG
+static void
+parse_debug(token_t token, token_t top, struct parse_state *state)
+{
+    int i;
+#ifdef token_name
+    printf("%-15s : %s", token_names[token], token_names[top]);
+    for (i = state->stack_p-1; i >= 0; i--) {
+	if (!is_action(state->stack[i]))
+	    printf(" %s", token_names[state->stack[i]]);
+	else
+	    printf(" <%d>", state->stack[i]);
+    }
+#else
+    printf("token %d stack %d", token, top);
+    for (i = state->stack_p-1; i >= 0; i--)
+	printf(" %d", state->stack[i]);
+#endif
+    printf("\\n");
+}
+#endif
+
+#ifndef PARSE_PUSH
+
+/*
+ * With PARSE_TOKENS, tokens come from an array instead of lex.
+ * PARSE_TOKEN_INDEX is the index of the last token read, and if the
+ * application defines PARSE_TOKEN_VALUE(lex_context, index), actions
+ * can use PARSE_VALUE to fetch the value of that token
+ */
+#ifdef PARSE_TOKENS
+#define PARSE_TOKEN_INDEX	(state->token_index - 1)
+#ifdef PARSE_TOKEN_VALUE
+#define PARSE_VALUE		PARSE_TOKEN_VALUE(lex_context, PARSE_TOKEN_INDEX)
+#endif
+#endif
+
 static parse_return_t
-parse(void *lex_context)
+parse_run(struct parse_state *state, void *lex_context)
 {
     token_t token = TOKEN_NONE;
-    int parse_stack_p = 0;
 #ifdef PARSE_TOP
     PARSE_TOP
 #endif
 
-    parse_stack[parse_stack_p++] = NON_TERMINAL_start;
-
     for (;;) {
-	token_t top = parse_pop(&parse_stack_p);
+	token_t top = parse_pop(state);
 
 	if (is_action(top)) {
+	    PARSE_PROFILE_COUNT(parse_profile.actions[top - FIRST_ACTION]);
 	    switch(top) {
 @@ACTIONS@@
 	    default:
@@ -154,8 +355,20 @@ parse(void *lex_context)
 	    continue;
 	}
 
-	if (token == TOKEN_NONE)
+	if (token == TOKEN_NONE) {
+#ifdef PARSE_TOKENS
+	    if (state->token_index < state->n_tokens)
+		token = state->tokens[state->token_index++];
+	    else
+		token = END;
+#elif defined(PARSE_LEX_SCAN)
+	    token = lex_scan(lex_context);
+	    if (token == TOKEN_NONE)
+		return parse_return_syntax;
+#else
 	    token = lex(lex_context);
+#endif
+	}
 
 	if (top == TOKEN_NONE) {
 	    if (token != END)
@@ -164,23 +377,131 @@ parse(void *lex_context)
 	}
 
 #ifdef PARSE_DEBUG
-	{
-	    int i;
-#ifdef token_name
-	    printf("%-15s : %s", token_names[token], token_names[top]);
-	    for (i = parse_stack_p-1; i >= 0; i--) {
-		if (!is_action(parse_stack[i]))
-		    printf(" %s", token_names[parse_stack[i]]);
-		else
-		    printf(" <%d>", parse_stack[i]);
-	    }
+	parse_debug(token, top, state);
+#endif
+
+	if (is_terminal(top)) {
+	    if (top != token) {
+                if (token == END)
+                    return parse_return_end;
+		return parse_return_syntax;
+            }
+	    token = TOKEN_NONE;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, PARSE_ATTR_TOKEN))
+		return parse_return_oom;
+#endif
+	} else {
+	    CONST token_t *tokens;
+
+	    PARSE_PROFILE_LOOKUP(token, top);
+	    tokens = match_state(token, top);
+
+	    if (!tokens)
+		return parse_return_syntax;
+
+	    if (!parse_push(state, tokens))
+                return parse_return_oom;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, (PARSE_ATTR_TYPE) {0}))
+		return parse_return_oom;
+#endif
+	    PARSE_PROFILE_DEPTH(state->stack_p);
+	}
+    }
+}
+
+/*
+ * With PARSE_REENTRANT, the caller supplies the parse state, so
+ * separate threads can each run a parser
+ */
+#ifdef PARSE_TOKENS
+#ifdef PARSE_REENTRANT
+static parse_return_t
+parse_tokens(struct parse_state *state, const token_t *tokens, size_t n, void *lex_context)
+#else
+static parse_return_t
+parse_tokens(const token_t *tokens, size_t n, void *lex_context)
+#endif
+#else
+#ifdef PARSE_REENTRANT
+static parse_return_t
+parse(struct parse_state *state, void *lex_context)
+#else
+static parse_return_t
+parse(void *lex_context)
+#endif
+#endif
+{
+#ifndef PARSE_REENTRANT
+    static struct parse_state parse_static_state;
+    struct parse_state *state = &parse_static_state;
+#endif
+    parse_return_t ret;
+
+    if (!parser_init(state))
+	return parse_return_oom;
+#ifdef PARSE_TOKENS
+    state->tokens = tokens;
+    state->n_tokens = n;
+    state->token_index = 0;
+#endif
+    ret = parse_run(state, lex_context);
+    parser_fini(state);
+    return ret;
+}
+
 #else
-	    printf("token %d stack %d", token, top);
-	    for (i = parse_stack_p-1; i >= 0; i--)
-		printf(" %d", parse_stack[i]);
+
+/*
+ * Push interface. The caller owns the parse state and hands tokens
+ * to parser_feed one at a time, which returns parse_return_more once
+ * the token has been matched. parser_finish supplies END. When the
+ * grammar matches END itself, the parse is complete once END has been
+ * matched and the stack is empty.
+ */
+
+static parse_return_t
+parser_feed(struct parse_state *state, token_t token)
+{
+    bool matched_end = false;
+
+#ifdef PARSE_TOP
+    PARSE_TOP
+#endif
+
+    for (;;) {
+	token_t top = parse_pop(state);
+
+	if (is_action(top)) {
+	    PARSE_PROFILE_COUNT(parse_profile.actions[top - FIRST_ACTION]);
+	    switch(top) {
+@@ACTIONS@@
+	    default:
+		break;
+	    }
+#ifdef PARSE_ACTION_BOTTOM
+	    PARSE_ACTION_BOTTOM;
 #endif
-	    printf("\\n");
+	    continue;
+	}
+
+	if (token == TOKEN_NONE) {
+	    if (top != TOKEN_NONE)
+		state->stack[state->stack_p++] = top;
+	    else if (matched_end)
+		return parse_return_success;
+	    return parse_return_more;
+	}
+
+	if (top == TOKEN_NONE) {
+	    if (token != END)
+	        return parse_return_syntax;
+	    return parse_return_success;
 	}
+
+#ifdef PARSE_DEBUG
+	parse_debug(token, top, state);
 #endif
 
 	if (is_terminal(top)) {
@@ -189,21 +510,248 @@ parse(void *lex_context)
                     return parse_return_end;
 		return parse_return_syntax;
             }
+	    matched_end = token == END;
 	    token = TOKEN_NONE;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, PARSE_ATTR_TOKEN))
+		return parse_return_oom;
+#endif
 	} else {
-	    CONST token_t *tokens = match_state(token, top);
+	    CONST token_t *tokens;
+
+	    PARSE_PROFILE_LOOKUP(token, top);
+	    tokens = match_state(token, top);
 
 	    if (!tokens)
 		return parse_return_syntax;
 
-	    if (!parse_push(tokens, &parse_stack_p))
+	    if (!parse_push(state, tokens))
                 return parse_return_oom;
+#ifdef PARSE_ATTRIBUTES
+	    if (!parse_attr_push(state, (PARSE_ATTR_TYPE) {0}))
+		return parse_return_oom;
+#endif
+	    PARSE_PROFILE_DEPTH(state->stack_p);
+	}
+    }
+}
+
+static inline parse_return_t
+parser_finish(struct parse_state *state)
+{
+    return parser_feed(state, END);
+}
+
+#endif
+
+"""
+
+#
+# The scanner generated from terminal definitions in the grammar. It
+# reads from a buffer, taking the longest match at each step, and
+# leaves the span of each token, pointing into the buffer, in 'span',
+# so no token text is copied
+#
+
+lex_code = r"""
+struct lex_span {
+    const char	*start;
+    size_t	len;
+};
+
+struct lex_input {
+    const char		*text;
+    const char		*pos;
+    const char		*end;
+    struct lex_span	span;
+};
+
+/*
+ * In actions of a parser whose lex_context is the struct lex_input,
+ * PARSE_SPAN is the span of the last token read
+ */
+#define PARSE_SPAN	(((struct lex_input *) lex_context)->span)
+
+static inline void
+lex_input_init(struct lex_input *input, const char *text, size_t len)
+{
+    input->text = text;
+    input->pos = text;
+    input->end = text + len;
+    input->span.start = text;
+    input->span.len = 0;
+}
+
+#ifdef LEX_MMAP
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+/*
+ * Scan the file open on 'fd' by mapping it into memory. Returns false
+ * if it cannot be mapped, which happens for pipes and terminals
+ */
+static inline bool
+lex_input_map(struct lex_input *input, int fd)
+{
+    struct stat st;
+    void *text;
+
+    if (fstat(fd, &st) < 0 || !S_ISREG(st.st_mode))
+	return false;
+    if (st.st_size == 0) {
+	lex_input_init(input, "", 0);
+	return true;
+    }
+    text = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    if (text == MAP_FAILED)
+	return false;
+    lex_input_init(input, text, st.st_size);
+    return true;
+}
+
+static inline void
+lex_input_unmap(struct lex_input *input)
+{
+    if (input->end != input->text)
+	munmap((void *) input->text, input->end - input->text);
+}
+#endif
+
+/*
+ * Return the next token, END at the end of the buffer, or TOKEN_NONE
+ * when no token matches, leaving pos at the text which didn't match
+ */
+static token_t
+lex_scan(struct lex_input *input)
+{
+    for (;;) {
+	const char *pos = input->pos;
+	const char *token_end = pos;
+	lex_accept_t token = 0;
+	lex_state_t state = 1;
+
+	if (pos == input->end) {
+	    input->span.start = pos;
+	    input->span.len = 0;
+	    return END;
+	}
+	while (pos < input->end) {
+	    state = LEX_TABLE_FETCH(&lex_next[state * LEX_CLASSES +
+					      LEX_TABLE_FETCH(&lex_class[(uint8_t) *pos])]);
+	    if (state == 0)
+		break;
+	    pos++;
+	    if (LEX_TABLE_FETCH(&lex_accept[state])) {
+		token = LEX_TABLE_FETCH(&lex_accept[state]);
+		token_end = pos;
+	    }
 	}
+	if (token == 0)
+	    return TOKEN_NONE;
+	input->span.start = input->pos;
+	input->span.len = token_end - input->pos;
+	input->pos = token_end;
+	if (token != LEX_SKIP)
+	    return (token_t) token;
     }
 }
+"""
+
+#
+# Finding the production for a terminal and non-terminal depends on
+# the table layout. The compact table is searched along a chain of
+# non-terminal table entries, the dense table is indexed directly and
+# the comb table is indexed by the row offset for the non-terminal
+# plus the terminal, with a check that the slot belongs to that row
+#
+
+match_state_marker = "@@MATCH_STATE@@"
+
+parse_fetch_code = """#ifndef PARSE_TABLE_FETCH_TOKEN
+#define PARSE_TABLE_FETCH_TOKEN(addr) (*(addr))
+#endif
+#ifndef PARSE_TABLE_FETCH_INDEX
+#define PARSE_TABLE_FETCH_INDEX(addr) (*(addr))
+#endif
 
 """
 
+match_state_code = {
+    'compact' : """#if NON_TERMINAL_SIZE < 256
+typedef uint8_t non_terminal_index_t;
+#else
+#if NON_TERMINAL_SIZE < 65536
+typedef uint16_t non_terminal_index_t;
+#else
+typedef uint32_t non_terminal_index_t;
+#endif
+#endif
+
+""" + parse_fetch_code + """static CONST token_t *
+match_state(token_t terminal, token_t non_terminal)
+{
+	token_key_t terminal_key = terminal;
+	if (terminal_key >= sizeof(terminal_table) / sizeof(terminal_table[0]))
+		return 0;
+	non_terminal_index_t non_term = non_terminal_index(PARSE_TABLE_FETCH_INDEX(&terminal_table[terminal_key]));
+	for (;;) {
+		non_terminal_entry_t i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term]);
+		PARSE_PROFILE_COUNT(parse_profile.iterations);
+		if (i == NON_TERMINAL_CHAIN) {
+			i = PARSE_TABLE_FETCH_INDEX(&non_terminal_table[non_term+1]);
+			non_term = non_terminal_index(i);
+		} else if (i == NON_TERMINAL_END) {
+			break;
+		} else {
+			CONST token_t *production = &production_table[production_index(i)];
+			if (PARSE_TABLE_FETCH_TOKEN(production) == non_terminal) {
+				return production + 1;
+			}
+			non_term++;
+		}
+	}
+	return 0;
+}
+""",
+    'dense' : parse_fetch_code + """static CONST token_t *
+match_state(token_t terminal, token_t non_terminal)
+{
+	dense_entry_t i;
+	PARSE_PROFILE_COUNT(parse_profile.iterations);
+	if (terminal == TOKEN_NONE || terminal >= FIRST_NON_TERMINAL)
+		return 0;
+	i = PARSE_TABLE_FETCH_INDEX(&dense_table[terminal - 1][non_terminal - FIRST_NON_TERMINAL]);
+	if (i == DENSE_NONE)
+		return 0;
+	return &production_table[production_index(i)] + 1;
+}
+""",
+    'comb' : parse_fetch_code + """#ifndef PARSE_TABLE_FETCH_BASE
+#define PARSE_TABLE_FETCH_BASE(addr) (*(addr))
+#endif
+#ifndef PARSE_TABLE_FETCH_CHECK
+#define PARSE_TABLE_FETCH_CHECK(addr) (*(addr))
+#endif
+
+static CONST token_t *
+match_state(token_t terminal, token_t non_terminal)
+{
+	comb_check_t row = non_terminal - FIRST_NON_TERMINAL;
+	comb_base_t i;
+	PARSE_PROFILE_COUNT(parse_profile.iterations);
+	if (terminal == TOKEN_NONE || terminal >= FIRST_NON_TERMINAL)
+		return 0;
+	i = PARSE_TABLE_FETCH_BASE(&comb_base[row]) + (terminal - 1);
+	if (i < 0 || i >= COMB_SIZE || PARSE_TABLE_FETCH_CHECK(&comb_check[i]) != row)
+		return 0;
+	return &production_table[production_index(PARSE_TABLE_FETCH_INDEX(&comb_next[i]))] + 1;
+}
+""",
+}
+
+table_formats = tuple(match_state_code)
+
 
 # ll parser table generator
 #
@@ -239,14 +787,6 @@ def is_terminal(item):
 def is_action(item):
     return item[0] == '@'
 
-def is_null_production(p):
-    if len(p) == 0:
-        return True
-    elif is_action(p[0]):
-        return is_null_production(p[1:])
-    else:
-        return False
-
 start_symbol = "start"
 
 def is_start_symbol(item):
@@ -263,316 +803,707 @@ def fprint(msg, end='\n', file=sys.stdout):
     file.write(msg)
     file.write(end)
 
-def error(msg):
-    fprint(msg, file=sys.stderr)
-    exit(1)
-
 #
-# generate the first set for the productions
-#  of a non-terminal
+# Errors raise LolaError so that a program processing many grammars
+# can carry on after one fails; main() reports them and exits
 #
-def first_set(grammar, non_terminal):
-    ret=()
-    for prod in productions(grammar, non_terminal):
-        if is_null_production(prod):
-            ret += ((),)
-        else:
-            ret += first(grammar, prod)
-    return ret
 
-first_list = ()
+class LolaError(Exception):
+    pass
 
-def unique(list):
-    if not list:
-        return list
-    f = head(list)
-    r = rest(list)
-    if f in r:
-        return unique(r)
-    else:
-        return (f,) + unique(r)
+def error(msg):
+    raise LolaError(msg)
 
-def delete(elt, list):
-    ret = ()
-    for i in list:
-        if i != elt:
-            ret = ret + (i,)
-    return ret
+def get_non_terminals(grammar):
+    non_terminals = ()
+    for non_terminal in grammar:
+        non_terminals += (non_terminal,)
+    return non_terminals
 
-#
-# generate the first set for a single symbol This is easy for a
-#  terminal -- the result is the item itself.  For non-terminals, the
-#  first set is the union of the first sets of all the productions
-#  that derive the non-terminal
-#
-# Note that this also checks to see if the grammar is left-recursive.
-# This will succeed because a left recursive grammar will always
-# re-reference a particular non-terminal when trying to generate a
-# first set containing it.
-#
-
-def first_for_symbol(grammar, item):
-    global first_list
-    if item in first_list:
-        error("lola: left-recursive grammar for symbol %s" % item)
-    first_list = (item,) + first_list
-    ret = False
-    if is_terminal(item):
-        ret = (item,)
-    elif is_non_terminal(item):
-        set = first_set(grammar, item)
-        ret = unique(set)
-    first_list = rest(first_list)
-    return ret
+def get_terminals(grammar):
+    terminals = [end_token]
+    seen = {end_token}
+    for non_terminal, prods in grammar.items():
+        for prod in prods:
+            for token in prod:
+                if is_terminal(token) and not token in seen:
+                    seen.add(token)
+                    terminals.append(token)
+    return tuple(terminals)
+
+def count_actions(symbols):
+    actions = 0
+    for prods in symbols.productions:
+        for prod in prods:
+            for id in prod:
+                if symbols.is_action(id):
+                    actions += 1
+    return actions
+
+def compress_action(action):
+    # trailing comments
+    action = re.sub("//.*\n", "\n", action)
+    # embedded comments
+    action = re.sub("/\\*.*?\\*/", " ", action)
+    # compress whitespace
+    action = re.sub("\\s+", " ", action)
+    # remove leading and trailing whitespace and braces
+    action = action.strip('@ \t\n{}')
+    return action
+
+def action_sort(action):
+    return len(compress_action(action))
+
+def get_actions(symbols):
+    actions = ()
+    seen = set()
+    for id in range(symbols.first_action, len(symbols.names)):
+        action = symbols.name(id)
+        compressed = compress_action(action)
+        if compressed not in seen:
+            seen.add(compressed)
+            actions += (action,)
+    return sorted(actions, key=action_sort)
 
 #
-# generate the first list for a production.
-#
-# the first list is the set of symbols which are legal
-# as the first symbols in some possible expansion of the
-# production.  The cases are simple:
+# Synthesized attributes
 #
-# if the (car production) is a terminal, then obviously
-# the only possible first symbol is that terminal
+# With --attributes, each terminal and non-terminal in a production
+# has a value, held on an attribute stack beside the parse stack.
+# Actions use $1..$n for the values of the symbols before them and
+# $$ for the value of the production, as in yacc; $0 and below are
+# the values before the production in the one which used it.
 #
-# Otherwise, generate the first lists for *all* expansions
-# of the non-terminal (car production).  If that list doesn't
-# contain an epsilon production 'nil, the we're done.  Otherwise,
-# this set must be added to the first set of (cdr production) because
-# some of the possible expansions of the production will not have any
-# terminals at all from (car production).
+# The parser pushes a slot for $$ as it expands a non-terminal and
+# the value of each terminal as it is matched, so the value of a
+# non-terminal is left in its slot. An implicit action at the end of
+# each production pops the values of its symbols, first copying $1
+# to $$ when no action mentions $$. An action after k symbols finds
+# $$ k + 1 entries from the top of the stack, so references are
+# rewritten as distances, $[d], which are turned into code for each
+# language on output.
 #
-# Note the crufty use of dictionaries to save old expansion of first
-# sets.  This is because both ll and follow call first quite often,
-# frequently for the same production
+# A production which ends by repeating its own non-terminal, as a
+# right-recursive list does, pops its values, and its slot, before
+# the repetition instead. The list takes the value of the last
+# repetition, $0 stays the same in each one, and long lists use no
+# more stack than short ones.
 #
 
-first_dictionary = {}
+attribute_ref_re = re.compile("\\$(\\$|-?\\d+)")
+attribute_stack_re = re.compile("\\$\\[(\\d+)\\]")
+attribute_pop_re = re.compile("\\$pop\\((\\d+)\\)")
 
-def reset_first():
-    global first_dictionary
-    global first_list
-    first_dictionary = {}
-    first_list = ()
+def attribute_distance(ref, k):
+    if ref == '$':
+        return k + 1
+    i = int(ref)
+    if i > 0:
+        return k + 1 - i
+    return k + 2 - i
 
-def first(grammar, production):
-    global first_dictionary
-    while production and is_action(head(production)):
-        production = rest(production)
-    if production in first_dictionary:
-        ret = first_dictionary[production]
-    else:
-        if production:
-            ret = first_for_symbol(grammar, head(production))
-            if () in ret:
-                ret = delete((), ret) + first(grammar, rest(production))
-        else:
-            ret = ((),)
-        first_dictionary[production] = ret
-    return ret
+def attribute_pop_action(n, copy):
+    if copy:
+        return "@ATTR_COPY_POP_%d $[%d] = $[%d]; $pop(%d)" % (n, n + 1, n, n)
+    return "@ATTR_POP_%d $pop(%d)" % (n, n)
+
+def c_attributes(code):
+    code = attribute_pop_re.sub("PARSE_ATTR_POP(\\1)", code)
+    return attribute_stack_re.sub("PARSE_ATTR(\\1)", code)
+
+def python_attributes(code):
+    code = attribute_pop_re.sub("del attrs[-\\1:]", code)
+    return attribute_stack_re.sub("attrs[-\\1]", code)
 
 #
-# generate the follow set of a for an item in a particular
-# production which derives a particular non-terminal.
+# Left factoring
 #
-# This is nil if the production does
-# not contain the item.
+# With --left-factor, productions of a non-terminal which start with
+# the same symbols are merged, as flo does:
 #
-# Otherwise, it is the first set for the portion of the production
-# which follows the item -- if that first set contains nil, then the
-# follow set also contains the follow set for the non-terminal which
-# is derived by the production
+#   foo : a b c | a b d | e       becomes    foo   : a b foo-p | e
+#                                            foo-p : c | d
+#
+# The productions are put in a trie, one symbol per level, so common
+# prefixes of any length, and prefixes within prefixes, are found in
+# a single pass. Each node where the productions diverge becomes a
+# new non-terminal, named by adding "-p" to the one being factored
+# until the name is unused. Productions keep the order in which they
+# first appear, and a non-terminal with nothing in common keeps its
+# productions unchanged.
 #
 
-def follow_in_production(grammar, item, non_terminal, production, non_terminals):
+class FactorNode:
+    def __init__(self):
+        self.children = {}
+        self.order = []
 
-    # Find all instances of the item in this production; it
-    # may be repeated
+def factor_trie(prods):
+    root = FactorNode()
+    for prod in prods:
+        node = root
+        for token in prod:
+            child = node.children.get(token)
+            if child is None:
+                child = FactorNode()
+                node.children[token] = child
+                node.order.append(token)
+            node = child
+        if None not in node.children:
+            node.children[None] = None
+            node.order.append(None)
+    return root
+
+def left_factor(grammar):
+    names = set(grammar)
+    result = {}
+    created = 0
 
-    f = ()
-    for i in range(len(production)):
-        if production[i] == item:
-            f += first(grammar, production[i+1:])
+    def new_name(base):
+        name = base + "-p"
+        while name in names:
+            name += "-p"
+        names.add(name)
+        return name
 
-    if () in f:
-        f = delete((), f) + follow(grammar, non_terminal, non_terminals)
-    return f
+    for non_terminal, prods in grammar.items():
+        work = collections.deque(((non_terminal, factor_trie(prods)),))
+        while work:
+            name, node = work.popleft()
+            out = ()
+            for token in node.order:
+                if token is None:
+                    out += ((),)
+                    continue
+                prefix = [token]
+                child = node.children[token]
+                while len(child.order) == 1 and child.order[0] is not None:
+                    token = child.order[0]
+                    prefix.append(token)
+                    child = child.children[token]
+                if child.order == [None]:
+                    out += (tuple(prefix),)
+                else:
+                    helper = new_name(name)
+                    created += 1
+                    out += (tuple(prefix) + (helper,),)
+                    work.append((helper, child))
+            result[name] = out
+    return result, created
 
 #
-# loop through the productions of a non-terminal adding
-# the follow sets for each one.  Note that this will often
-# generate duplicate entries -- as possibly many of the
-# follow sets for productions will contain the entire follow
-# set for the non-terminal
+# Left recursion
 #
-
-def follow_in_non_terminal (grammar, item, non_terminal, non_terminals):
-    ret = ()
-    for prod in productions(grammar, non_terminal):
-        ret += follow_in_production(grammar, item, non_terminal, prod, non_terminals)
-    return ret
-
+# With --left-recursion, left-recursive non-terminals are rewritten
+# into the form calc-gram.ll uses, with the repeated part of the
+# production moved to a new non-terminal ending with itself:
+#
+#   expr : expr PLUS term | term     becomes    expr   : term expr-p
+#                                               expr-p : PLUS term expr-p
+#                                                      |
 #
-# generate the follow set for a particular non-terminal
-# The only special case is for the
-# start symbol who's follow set also contains the
-# end-token
+# Actions keep their place after the symbols they follow, so they run
+# in the same order, and long lists take constant parse stack space.
 #
+# A non-terminal is left-recursive when it can start with itself,
+# directly or through others, so the non-terminals starting each
+# production form a graph and the left-recursive ones are its
+# strongly connected components with a cycle. Within each component,
+# productions starting with an earlier member are expanded with that
+# member's productions, leaving each member recursive only through
+# itself, which is then rewritten. Members used from outside the
+# component come last, so the others usually end up unused and are
+# removed. Only the first symbol of each production is looked at;
+# recursion hidden behind a nullable non-terminal or an action is
+# still reported by get_firsts.
+#
+# With --attributes, references in the repeated part move along with
+# it: $1, the value so far, and $$, the new value, both become $0,
+# which each repetition shares, and the others shift down. Productions
+# starting the list which have more than one symbol, or actions, are
+# moved to a second new non-terminal so that $0 holds their value.
+# Indirect recursion would change the numbering of the expanded
+# productions and is not rewritten with --attributes.
+#
+
+def left_cycles(grammar):
+    edges = {}
+    for non_terminal, prods in grammar.items():
+        leading = []
+        for prod in prods:
+            if prod and prod[0] in grammar and prod[0] not in leading:
+                leading.append(prod[0])
+        edges[non_terminal] = leading
+
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    cycles = []
+    for root in grammar:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges[root]))]
+        while work:
+            non_terminal, leading = work[-1]
+            for next in leading:
+                if next not in index:
+                    index[next] = low[next] = len(index)
+                    stack.append(next)
+                    on_stack.add(next)
+                    work.append((next, iter(edges[next])))
+                    break
+                if next in on_stack:
+                    low[non_terminal] = min(low[non_terminal], index[next])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[non_terminal])
+                if low[non_terminal] == index[non_terminal]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == non_terminal:
+                            break
+                    if len(component) > 1 or non_terminal in edges[non_terminal]:
+                        cycles.append(component)
+    return cycles
+
+def shift_attributes(action):
+    def shift(m):
+        ref = m.group(1)
+        if ref == '$' or ref == '1':
+            return "$0"
+        i = int(ref)
+        if i > 0:
+            return "$%d" % (i - 1)
+        return "$%d" % (i - 2)
+    return attribute_ref_re.sub(shift, action)
+
+def left_recursion(grammar, attributes=False):
+    names = set(grammar)
+    order = dict((non_terminal, i) for i, non_terminal in enumerate(grammar))
+    rewritten = {}
+    moved = []
+
+    def new_name(base):
+        name = base + "-p"
+        while name in names:
+            name += "-p"
+        names.add(name)
+        return name
+
+    def plain(prod):
+        return len(prod) == 1 and not is_action(prod[0])
+
+    for component in left_cycles(grammar):
+        members = set(component)
+        entries = {start_symbol}
+        for non_terminal, prods in grammar.items():
+            if non_terminal not in members:
+                for prod in prods:
+                    entries.update(token for token in prod if token in members)
+        component.sort(key=lambda non_terminal: (non_terminal in entries, order[non_terminal]))
+        if attributes and len(component) > 1:
+            error("lola: indirect left recursion through %s cannot be rewritten with --attributes" %
+                  ", ".join(component))
+        prods = {}
+        for i, non_terminal in enumerate(component):
+            current = list(grammar[non_terminal])
+            for earlier in component[:i]:
+                expanded = []
+                for prod in current:
+                    if prod and prod[0] == earlier:
+                        expanded += [sub + prod[1:] for sub in prods[earlier]]
+                    else:
+                        expanded.append(prod)
+                current = expanded
+
+            repeats = [prod[1:] for prod in current if prod and prod[0] == non_terminal and len(prod) > 1]
+            starts = [prod for prod in current if not prod or prod[0] != non_terminal]
+            if not starts:
+                error("lola: left-recursive non-terminal %s has no other productions" % non_terminal)
+            if not repeats:
+                prods[non_terminal] = tuple(starts)
+                rewritten[non_terminal] = ((non_terminal, prods[non_terminal]),)
+                continue
 
-follow_dictionary = {}
+            tail = new_name(non_terminal)
+            if attributes:
+                shifted = []
+                for repeat in repeats:
+                    out = ()
+                    for token in repeat:
+                        if is_action(token):
+                            value = shift_attributes(token)
+                            moved.append((value, token))
+                            token = value
+                        out += (token,)
+                    shifted.append(out)
+                repeats = shifted
+            helpers = ((tail, tuple(repeat + (tail,) for repeat in repeats) + ((),)),)
+            if attributes and not all(plain(start) for start in starts):
+                head = new_name(non_terminal)
+                helpers += ((head, tuple(starts)),)
+                starts = [(head,)]
+            prods[non_terminal] = tuple(start + (tail,) for start in starts)
+            rewritten[non_terminal] = ((non_terminal, prods[non_terminal]),) + helpers
 
-def reset_follow():
-    global follow_dictionary
-    follow_dictionary = {}
+    result = {}
+    for non_terminal, prods in grammar.items():
+        for name, out in rewritten.get(non_terminal, ((non_terminal, prods),)):
+            result[name] = out
+
+    # Expanding a member can leave an earlier one unused, and its
+    # productions would still add to the follow sets
+
+    used = reachable(result)
+    for non_terminal in reachable(grammar):
+        if non_terminal in rewritten and non_terminal not in used:
+            del result[non_terminal]
+    return result, len(rewritten), moved
+
+def reachable(grammar):
+    if start_symbol not in grammar:
+        return set(grammar)
+    seen = {start_symbol}
+    work = [start_symbol]
+    while work:
+        for prod in grammar[work.pop()]:
+            for token in prod:
+                if token in grammar and token not in seen:
+                    seen.add(token)
+                    work.append(token)
+    return seen
 
 #
-# A list of in-process follow calls
-# Use this to avoid recursing into the same
-# non-terminal
+# Symbol table
+#
+# Once the grammar has been read, every terminal, non-terminal and
+# action is given a dense integer id. Terminals come first, starting
+# with END, then the non-terminals in grammar order and finally the
+# actions, so the kind of a symbol is found by comparing the id
+# against two boundaries. Productions are rewritten as tuples of ids
+# and sets of terminals are held in integer bit masks, with bit 'id'
+# set for each member.
+#
+# The names are kept around only for generating output.
 #
-follow_stack = []
-
 
-def follow(grammar, item, non_terminals):
-    global follow_dictionary, follow_stack
-    if item in follow_dictionary:
-        ret = follow_dictionary[item]
-    else:
-        ret = ()
-        follow_stack.append(item)
+class Symbols:
+    def __init__(self, grammar):
+        terminals = get_terminals(grammar)
+        non_terminals = get_non_terminals(grammar)
         for non_terminal in non_terminals:
-            if non_terminal not in follow_stack:
-                ret += follow_in_non_terminal(grammar, item, non_terminal, non_terminals)
-        follow_stack.pop()
+            if not is_non_terminal(non_terminal):
+                error("Rule defined for terminal %s" % non_terminal)
+        self.names = list(terminals) + list(non_terminals)
+        self.first_non_terminal = len(terminals)
+        self.first_action = len(self.names)
+        self.ids = {}
+        for id in range(len(self.names)):
+            self.ids[self.names[id]] = id
+        for non_terminal in non_terminals:
+            for prod in grammar[non_terminal]:
+                for token in prod:
+                    if is_action(token) and token not in self.ids:
+                        self.ids[token] = len(self.names)
+                        self.names.append(token)
+                    elif is_non_terminal(token) and token not in grammar:
+                        error("Undefined non-terminal %s" % token)
+        self.productions = []
+        for non_terminal in non_terminals:
+            prods = ()
+            for prod in grammar[non_terminal]:
+                prods += (tuple(self.ids[token] for token in prod),)
+            self.productions.append(prods)
 
-        if is_start_symbol(item):
-            ret = (end_token,) + ret
+    def is_terminal(self, id):
+        return id < self.first_non_terminal
 
-        ret = unique(ret)
-        follow_dictionary[item] = ret
+    def is_non_terminal(self, id):
+        return self.first_non_terminal <= id < self.first_action
 
-    return ret
+    def is_action(self, id):
+        return id >= self.first_action
+
+    def terminals(self):
+        return range(self.first_non_terminal)
+
+    def non_terminals(self):
+        return range(self.first_non_terminal, self.first_action)
+
+    def non_terminal_productions(self, id):
+        return self.productions[id - self.first_non_terminal]
+
+    def name(self, id):
+        return self.names[id]
+
+    def production_names(self, production):
+        return tuple(self.names[id] for id in production)
 
 #
-# this makes an entry in the output list, this is just one
-# of many possible formats
+# Terminal set bit masks
 #
 
-def make_entry(terminal, non_terminal, production):
-    return {(terminal, non_terminal): production}
+def terminal_mask(terminal):
+    return 1 << terminal
 
-def add_dict(a,b):
-    for key,value in b.items():
-        if key in a:
-            fprint("multiple productions match %r - %r and %r" % (key, value, a[key]), file=sys.stderr)
-            if len(value) < len(a[key]):
-                continue
-        a[key] = value
+def mask_members(mask):
+    members = []
+    while mask:
+        low = mask & -mask
+        members.append(low.bit_length() - 1)
+        mask ^= low
+    return members
+
+def mask_size(mask):
+    return bin(mask).count("1")
 
 #
-# generate the table entries for a particular production
-# this is taken directly from Aho, Ullman and Seti
+# Grammar analysis
 #
-# Note: this function uses dynamic scoping -- both non-terminal
-# and non-terminals are expected to have been set by the caller
+# The nullable, first and follow sets are computed for the whole
+# grammar at once. Each set is stored in a list indexed by the
+# position of the non-terminal, and the first and follow sets are bit
+# masks of terminals. Sets are grown by pushing new members along the
+# dependencies between non-terminals until nothing changes; a
+# dependency is only revisited when the set at its source grows, so
+# the cost is close to linear in the size of the grammar.
+#
+# Actions never affect the analysis, so they are removed from each
+# production before starting.
 #
 
-def ll_one_production(grammar, production, non_terminal, non_terminals):
-    firsts = first(grammar, production)
-    ret = {}
-    for f in firsts:
-        if not f:
-            follows = follow(grammar, non_terminal, non_terminals)
-            for f in follows:
-                add_dict(ret, make_entry(f, non_terminal, production))
-        elif is_terminal(f):
-            add_dict(ret, make_entry(f, non_terminal, production))
-    return ret
+def analysis_productions(symbols):
+    prods = []
+    for non_terminal in symbols.non_terminals():
+        n = non_terminal - symbols.first_non_terminal
+        for prod in symbols.non_terminal_productions(non_terminal):
+            prods.append((n, tuple(id for id in prod if not symbols.is_action(id))))
+    return prods
 
 #
-# generate the table entries for all productions of
-# a particular non-terminal
+# A non-terminal is nullable when one of its productions contains only
+# nullable non-terminals. Each production counts the symbols not yet
+# known to be nullable; when that reaches zero, the non-terminal it
+# derives becomes nullable and the counts of every production using
+# that non-terminal are decremented in turn.
 #
-def ll_one_non_terminal(grammar, non_terminal, non_terminals):
-    ret = {}
-#    print("ll_one_non_terminal %r" % non_terminal)
-    for p in productions(grammar, non_terminal):
-        add_dict(ret, ll_one_production(grammar, p, non_terminal, non_terminals))
-#    print("ll for %r is %r" % (non_terminal, ret))
-    return ret
+
+def get_nullable(symbols, prods):
+    n = len(symbols.non_terminals())
+    nullable = [False] * n
+    counts = []
+    users = [[] for i in range(n)]
+    work = []
+    for p, (non_terminal, production) in enumerate(prods):
+        counts.append(len(production))
+        for id in production:
+            if symbols.is_non_terminal(id):
+                users[id - symbols.first_non_terminal].append(p)
+        if not production and not nullable[non_terminal]:
+            nullable[non_terminal] = True
+            work.append(non_terminal)
+    while work:
+        used = work.pop()
+        for p in users[used]:
+            counts[p] -= 1
+            non_terminal = prods[p][0]
+            if counts[p] == 0 and not nullable[non_terminal]:
+                nullable[non_terminal] = True
+                work.append(non_terminal)
+    return nullable
 
 #
-# generate the table entries for all the non-terminals
+# Each production contributes to the first set of its non-terminal
+# the leading terminal, or the first sets of each leading non-terminal
+# up to and including the first one which isn't nullable.
+#
+# Those leading non-terminals form a graph which must not have any
+# cycles -- a cycle means the grammar is left-recursive. A depth-first
+# walk of that graph both detects cycles and visits each non-terminal
+# after all of those it depends upon, so a single pass in that order
+# completes every first set.
 #
 
-def ll_non_terminals(grammar, non_terminals):
-    ret = {}
-    for non_terminal in non_terminals:
-        add_dict(ret, ll_one_non_terminal(grammar, non_terminal, non_terminals))
-    return ret
+def get_firsts(symbols, prods, nullable):
+    n = len(nullable)
+    terminals = [0] * n
+    leading = [[] for i in range(n)]
+    for non_terminal, production in prods:
+        for id in production:
+            if symbols.is_terminal(id):
+                terminals[non_terminal] |= terminal_mask(id)
+                break
+            t = id - symbols.first_non_terminal
+            leading[non_terminal].append(t)
+            if not nullable[t]:
+                break
 
-def get_non_terminals(grammar):
-    non_terminals = ()
-    for non_terminal in grammar:
-        non_terminals += (non_terminal,)
-    return non_terminals
+    firsts = [0] * n
+    state = [0] * n
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(leading[root]))]
+        while stack:
+            non_terminal, edges = stack[-1]
+            for next in edges:
+                if state[next] == 1:
+                    error("lola: left-recursive grammar for symbol %s" %
+                          symbols.name(next + symbols.first_non_terminal))
+                if state[next] == 0:
+                    state[next] = 1
+                    stack.append((next, iter(leading[next])))
+                    break
+            else:
+                stack.pop()
+                state[non_terminal] = 2
+                first = terminals[non_terminal]
+                for next in leading[non_terminal]:
+                    first |= firsts[next]
+                firsts[non_terminal] = first
+    return firsts
 
-def get_terminals(grammar):
-    terminals = ("END",)
-    for non_terminal, prods in grammar.items():
-        for prod in prods:
-            for token in prod:
-                if is_terminal(token) and not token in terminals:
-                    terminals += (token,)
-    return terminals
+#
+# Generate the first set and nullability of a sequence of symbols
+#
 
-def count_actions(grammar):
-    actions = 0
-    for non_terminal, prods in grammar.items():
-        for prod in prods:
-            for token in prod:
-                if is_action(token):
-                    actions += 1
-    return actions
+def first_of(symbols, production, nullable, firsts):
+    ret = 0
+    for id in production:
+        if symbols.is_action(id):
+            continue
+        if symbols.is_terminal(id):
+            return (ret | terminal_mask(id), False)
+        t = id - symbols.first_non_terminal
+        ret |= firsts[t]
+        if not nullable[t]:
+            return (ret, False)
+    return (ret, True)
 
-def compress_action(action):
-    # trailing comments
-    action = re.sub("//.*\n", "\n", action)
-    # embedded comments
-    action = re.sub("/\\*.*?\\*/", " ", action)
-    # compress whitespace
-    action = re.sub("\\s+", " ", action)
-    # remove leading and trailing whitespace and braces
-    action = action.strip('@ \t\n{}')
-    return action
+#
+# The follow set of a non-terminal collects the first set of
+# whatever comes after each use of it, along with the follow set of
+# the non-terminal being derived when everything after it is
+# nullable. Walking each production backwards computes the first set
+# of the remaining symbols incrementally.
+#
+# The fixed part of each follow set is computed directly, then a
+# worklist propagates follow sets from each non-terminal to those
+# which end its productions.
+#
 
-def has_action(actions, action):
-    for a in actions:
-        if compress_action(a) == compress_action(action):
-            return True
-    return False
+def get_follows(symbols, prods, nullable, firsts):
+    n = len(nullable)
+    follows = [0] * n
+    trailing = [set() for i in range(n)]
+    if start_symbol in symbols.ids:
+        start = symbols.ids[start_symbol] - symbols.first_non_terminal
+        follows[start] = terminal_mask(symbols.ids[end_token])
+    for non_terminal, production in prods:
+        rest_first = 0
+        rest_nullable = True
+        for id in reversed(production):
+            if symbols.is_terminal(id):
+                rest_first = terminal_mask(id)
+                rest_nullable = False
+                continue
+            t = id - symbols.first_non_terminal
+            follows[t] |= rest_first
+            if rest_nullable and t != non_terminal:
+                trailing[non_terminal].add(t)
+            if nullable[t]:
+                rest_first |= firsts[t]
+            else:
+                rest_first = firsts[t]
+                rest_nullable = False
+
+    work = list(range(n))
+    queued = [True] * n
+    while work:
+        non_terminal = work.pop()
+        queued[non_terminal] = False
+        follow = follows[non_terminal]
+        for t in trailing[non_terminal]:
+            if follow & ~follows[t]:
+                follows[t] |= follow
+                if not queued[t]:
+                    queued[t] = True
+                    work.append(t)
+    return follows
+
+def analyze(symbols):
+    prods = analysis_productions(symbols)
+    nullable = get_nullable(symbols, prods)
+    firsts = get_firsts(symbols, prods, nullable)
+    follows = get_follows(symbols, prods, nullable, firsts)
+    return (nullable, firsts, follows)
 
-def action_sort(action):
-    return len(compress_action(action))
+#
+# Add an entry to the parse table. When two productions match the same
+# key, the longer one is preferred
+#
 
-def get_actions(grammar):
-    actions = ()
-    for non_terminal, prods in grammar.items():
-        for prod in prods:
-            for token in prod:
-                if is_action(token) and not has_action(actions, token):
-                    actions += (token,)
-    return sorted(actions, key=action_sort)
+def add_entry(symbols, table, key, production, warn):
+    if key in table:
+        warn("multiple productions match %r - %r and %r" %
+             (symbols.production_names(key),
+              symbols.production_names(production),
+              symbols.production_names(table[key])))
+        if len(production) < len(table[key]):
+            return
+    table[key] = production
 
 #
 # produce a parse table for the given grammar
 #
+# This is taken directly from Aho, Ullman and Sethi -- each production
+# is selected by the terminals in its first set, and when it can
+# derive the empty string, also by the terminals in the follow set of
+# its non-terminal. Entries for each production are added in the
+# order the terminals appear in the grammar.
+#
+# The table maps (terminal, non-terminal) ids to productions of ids
+#
+
+def warn_stderr(msg):
+    fprint(msg, file=sys.stderr)
+
+def ll_table(symbols, analysis, warn=warn_stderr):
+    nullable, firsts, follows = analysis
+    table = {}
+    for non_terminal in symbols.non_terminals():
+        follow = follows[non_terminal - symbols.first_non_terminal]
+        for production in symbols.non_terminal_productions(non_terminal):
+            terms, null = first_of(symbols, production, nullable, firsts)
+            if null:
+                terms |= follow
+            for terminal in mask_members(terms):
+                add_entry(symbols, table, (terminal, non_terminal), production, warn)
+    return table
+
+#
+# Convert a parse table back to symbol names
+#
+
+def table_names(symbols, table):
+    ret = {}
+    for key, production in table.items():
+        ret[symbols.production_names(key)] = symbols.production_names(production)
+    return ret
 
 def ll (grammar):
-    reset_first()
-    reset_follow()
-    non_terminals = get_non_terminals(grammar)
-    return ll_non_terminals(grammar, non_terminals)
+    symbols = Symbols(grammar)
+    return table_names(symbols, ll_table(symbols, analyze(symbols)))
 
 def dump_table(table, file=sys.stdout):
     fprint("Parse table", file=file)
@@ -598,7 +1529,11 @@ grammar = {
     start_symbol: (("non-term", start_symbol),
                    ()
                    ),
-    "non-term"  : (("SYMBOL", "@NONTERM", "COLON", "rules", "@RULES", "SEMI"),
+    "non-term"  : (("SYMBOL", "@NONTERM", "non-term-p"),
+                   ("EQUALS", "PATTERN", "@SKIP", "SEMI"),
+                   ),
+    "non-term-p": (("COLON", "rules", "@RULES", "SEMI"),
+                   ("EQUALS", "PATTERN", "@PATTERN", "SEMI"),
                    ),
     "rules"     : (("rule", "rules-p"),
                    ),
@@ -612,190 +1547,68 @@ grammar = {
                    ),
     }
 
-lex_c = False
-
-lex_file = sys.stdin
-lex_file_name = "<stdin>"
+lola_table = ll(grammar)
 
-lex_line = 1
-
-def onec():
-    global lex_line
-    global lex_file
-    c = lex_file.read(1)
-    if c == '\n':
-        lex_line = lex_line + 1
-    return c
-
-def getc():
-    global lex_c
-    if lex_c:
-        c = lex_c
-        lex_c = False
-    else:
-        c = onec()
-        if c == '#':
-            while c != '\n':
-                c = onec()
-    return c
-
-def ungetc(c):
-    global lex_c
-    lex_c = c
-
-lex_value = False
-
-def is_symbol_start(c):
-    return c.isalpha() or c == '_' or c == '-'
-
-def is_symbol_cont(c):
-    return is_symbol_start(c) or c.isdigit()
+#
+# The grammar lexer reads the whole input at once and splits it into
+# a list of tokens before parsing starts. A single regular expression
+# skips any characters which can't start a token and then matches the
+# next one; actions are found by searching for the closing '@'.
+#
+# Comments are removed before starting, leaving the newline which ends
+# each one so that line numbers are unchanged.
+#
+# {SYM ... } preprocessor blocks are handled while splitting the
+# input; inside an excluded block, everything other than the braces
+# is skipped.
+#
 
-action_lines = {}
+lex_comment_re = re.compile("#[^\n]*")
 
-def action_line(action):
-    global action_lines
-    return action_lines[action]
+lex_token_re = re.compile("(?:[^{}|:;@=\\w-]|\\d)*"
+                          "(?:(?P<SYMBOL>(?:[^\\W\\d]|-)[\\w-]*)"
+                          "|(?P<VBAR>\\|)"
+                          "|(?P<COLON>:)"
+                          "|(?P<SEMI>;)"
+                          "|(?P<EQUALS>=)"
+                          "|(?P<action>@)"
+                          "|\\{(?P<push>(?s:.)?[\\w-]*)"
+                          "|(?P<pop>\\})"
+                          "|(?P<END>\\Z))")
 
-def mark_action_line(action, line):
-    global action_lines
-    action_lines[action] = line
+lex_pp_re = re.compile("[^{}]*"
+                       "(?:\\{(?P<push>(?s:.)?[\\w-]*)"
+                       "|(?P<pop>\\})"
+                       "|(?P<END>\\Z))")
 
-ppsyms = {}
+#
+# A terminal definition follows '=', and is either a string in double
+# quotes or a regular expression between slashes. Backslash escapes
+# the closing delimiter
+#
 
-def lex_sym(c):
-    v = c
-    while True:
-        c = getc()
-        if is_symbol_cont(c):
-            v += c
-        else:
-            ungetc(c)
-            break;
-    return v
-    
-def define_pp(name):
-    ppsyms[name] = True
-
-def defined_pp(name):
-    return name in ppsyms
-
-pp_stack = []
-
-def include_pp():
-    global pp_stack
-    return len(pp_stack) == 0 or pp_stack[-1]
-
-def push_pp():
-    global pp_stack
-    name = lex_sym(getc())
-    pp_stack.append(include_pp() and defined_pp(name))
-
-def pop_pp():
-    global pp_stack
-    if len(pp_stack):
-        pp_stack.pop()
-
-def lex():
-    global lex_value
-    lex_value = False
-    while True:
-        c = getc()
+lex_pattern_re = re.compile('\\s*(?:"(?P<literal>(?:\\\\.|[^"\\\\])*)"'
+                            '|/(?P<regex>(?:\\\\.|[^/\\\\])*)/)', re.S)
 
-        if c == '{':
-            push_pp()
-            continue
-        if c == '}':
-            pop_pp()
-            continue
-        if not include_pp():
-            continue
+#
+# Actions run to the next '@' which isn't doubled; '@@' within an
+# action is replaced by a single '@'. Returns the action and the
+# position just past it
+#
 
-        if c == '':
-            return 'END'
-        if c == '|':
-            return "VBAR"
-        if c == ':':
-            return "COLON"
-        if c == ';':
-            return "SEMI"
-        if c == '@':
-            v = c
-            at_line = lex_line
-            while True:
-                c = getc()
-                if c == '':
-                    error("Missing @, token started at line %d" % at_line)
-                elif c == '@':
-                    c = getc()
-                    if c != '@':
-                        ungetc(c)
-                        break
-                v += c
-            lex_value = v
-            mark_action_line(v, at_line)
-            return "SYMBOL"
-        if is_symbol_start(c):
-            lex_value = lex_sym(c)
-            return "SYMBOL"
-
-def lola():
-    global lex_value
-    global value_stack
-
-    # Construct the parser for lola input files
-    table = ll(grammar)
-
-    # Run the lola parser
-
-    stack = (start_symbol,)
-    token = False
-    result = {}
-    non_term = False
-    prod = ()
-    prods = ()
+def lex_action(text, pos, at_line):
+    v = '@'
     while True:
-        if stack:
-            top = head(stack)
-            stack = rest(stack)
+        end = text.find('@', pos)
+        if end == -1:
+            error("Missing @, token started at line %d" % at_line)
+        v += text[pos:end]
+        if text.startswith('@', end + 1):
+            v += '@'
+            pos = end + 2
         else:
-            top = False
-
-        if top and is_action(top):
-            if top == "@NONTERM":
-                non_term = lex_value
-            elif top == "@RULES":
-                result[non_term] = prods
-                prods = ()
-                non_term = False
-            elif top == "@RULE":
-                prods = prods + (prod,)
-                prod = ()
-            elif top == "@SYMBOL":
-                prod = prod + (lex_value,)
-            continue
+            return (v, end + 1)
 
-        if not token:
-            token = lex()
-
-#        print("token %r top %r stack %r" % (token, top, stack))
-
-        if not top:
-            if token == end_token:
-                return result
-            error("parse stack empty at %r" % token)
-
-        if is_terminal(top):
-            if top == token:
-                token = False
-            else:
-                error("%s:%d: parse error. got %r expected %r" % (lex_file_name, lex_line, token, top))
-        else:
-            key = (token, top)
-            if key not in table:
-                error("%s:%d: parse error at %r %r" % (lex_file_name, lex_line, token, top))
-            stack = table[key] + stack
-        
 def to_c(string):
     return string.replace("-", "_")
 
@@ -824,10 +1637,10 @@ def action_value(action):
 def terminal_name(terminal):
     return to_c(terminal)
 
-def terminal_names(terminals):
+def terminal_names(symbols, terminals):
     names = None
-    for terminal in terminals:
-        name = terminal_name(terminal)
+    for terminal in mask_members(terminals):
+        name = terminal_name(symbols.name(terminal))
         if names:
             names += " " + name
         else:
@@ -845,10 +1658,264 @@ def token_name(token_values, token):
     else:
         return non_terminal_name(token)
 
-def dump_python(grammar, parse_table, file=sys.stdout):
+def dump_python(symbols, parse_table, file=sys.stdout):
     fprint('parse_table = \\', file=file)
     pp = pprint.PrettyPrinter(indent=4, stream=file)
-    pp.pprint(parse_table)
+    pp.pprint(table_names(symbols, parse_table))
+
+    dump_python_codes(symbols, parse_table, file=file)
+
+#
+# Python token codes are the symbol ids. Actions which differ only in
+# comments and whitespace share the code of the first one, as they do
+# in C
+#
+
+def python_codes(symbols):
+    codes = list(range(len(symbols.names)))
+    seen = {}
+    for id in range(symbols.first_action, len(symbols.names)):
+        compressed = compress_action(symbols.name(id))
+        if compressed in seen:
+            codes[id] = seen[compressed]
+        else:
+            seen[compressed] = id
+    return codes
+
+#
+# Python names for actions follow the C names. The code for an
+# action is in the text after the name, or the whole text for an
+# unnamed action; it is returned as a list of lines, dedented,
+# along with the number of lines skipped before it
+#
+
+def python_action_name(action, code):
+    if action_has_name(action):
+        return "ACTION_" + to_c(action[1:].split(None, 1)[0])
+    return "ACTION_%d" % code
+
+def python_action_body(action):
+    text = action[1:]
+    if action_has_name(action):
+        words = re.split("(\\s)", text, 1)
+        if len(words) < 3:
+            return (0, [])
+        text = words[1] + words[2]
+    lines = text.split("\n")
+    skipped = 0
+    while lines and not lines[0].strip():
+        lines = lines[1:]
+        skipped += 1
+    while lines and not lines[-1].strip():
+        lines = lines[:-1]
+    if not lines:
+        return (0, [])
+    first = lines[0].strip()
+    if skipped == 0 and len(lines) > 1:
+        lines = [first] + textwrap.dedent("\n".join(lines[1:])).split("\n")
+    else:
+        lines = textwrap.dedent("\n".join(lines)).split("\n")
+    return (skipped, lines)
+
+#
+# Dump the integer token codes and the table used by lola_runtime
+#
+
+def dump_python_codes(symbols, parse_table, file=sys.stdout):
+    codes = python_codes(symbols)
+    dump_python_tokens(symbols, 'Token codes and parse rows for lola_runtime.LLParser', file=file)
+    fprint('', file=file)
+    rows = {}
+    for key in sorted(parse_table):
+        terminal, non_terminal = key
+        rows.setdefault(non_terminal, []).append(terminal)
+    fprint('parse_rows = (', file=file)
+    for id in range(symbols.first_action):
+        if not symbols.is_non_terminal(id):
+            fprint('    None,', file=file)
+            continue
+        fprint('    {   # %s' % symbols.name(id), file=file)
+        for terminal in rows.get(id, ()):
+            production = tuple(codes[token] for token in parse_table[(terminal, id)][::-1])
+            fprint('        %d: %r,' % (terminal, production), file=file)
+        fprint('    },', file=file)
+    fprint(')', file=file)
+
+def dump_python_tokens(symbols, title, file=sys.stdout):
+    codes = python_codes(symbols)
+    fprint('', file=file)
+    fprint('#', file=file)
+    fprint('# %s' % title, file=file)
+    fprint('#', file=file)
+    fprint('', file=file)
+    for terminal in symbols.terminals():
+        fprint('%s = %d' % (terminal_name(symbols.name(terminal)), terminal), file=file)
+    fprint('FIRST_NON_TERMINAL = %d' % symbols.first_non_terminal, file=file)
+    fprint('FIRST_ACTION = %d' % symbols.first_action, file=file)
+    fprint('START = %d' % symbols.ids[start_symbol], file=file)
+    for id in range(symbols.first_action, len(symbols.names)):
+        if codes[id] == id:
+            fprint('%s = %d' % (python_action_name(symbols.name(id), id), id), file=file)
+    fprint('', file=file)
+    fprint('token_names = (', file=file)
+    for id in range(len(symbols.names)):
+        fprint('    %r,' % symbols.name(id), file=file)
+    fprint(')', file=file)
+
+#
+# Dump a parser written directly in python, with one function per
+# non-terminal which selects a production by comparing the lookahead
+# token with each of the terminals in the parse table, and then
+# matches terminals, runs actions and calls functions for other
+# non-terminals in turn. A production which ends with the same
+# non-terminal loops instead of recursing, so right-recursive lists
+# don't use up the python stack.
+#
+# As in the table-driven parser, the next token is not read until it
+# is needed, so that actions see the value of the token just matched
+#
+
+def python_direct_function(symbols, non_terminal):
+    return "parse_" + to_c(symbols.name(non_terminal))
+
+def python_direct_names(symbols, ids):
+    return " ".join(symbols.name(id) for id in ids)
+
+def dump_python_direct(symbols, parse_table, file=sys.stdout, attributes=False):
+    codes = python_codes(symbols)
+    dump_python_tokens(symbols, 'Token codes', file=file)
+
+    lines = []
+    def emit(indent, line):
+        lines.append("    " * indent + line)
+
+    actions = []
+    for id in range(symbols.first_action, len(symbols.names)):
+        if codes[id] == id:
+            actions.append(id)
+
+    if attributes:
+        emit(0, "def parse(lex, actions=None, value=None):")
+    else:
+        emit(0, "def parse(lex, actions=None):")
+    emit(1, "token = None")
+    if attributes:
+        emit(1, "attrs = []")
+    emit(1, "if actions is None:")
+    emit(2, "actions = {}")
+    emit(0, "")
+    if attributes:
+        emit(1, "def nothing(attrs=None):")
+    else:
+        emit(1, "def nothing():")
+    emit(2, "pass")
+    emit(0, "")
+    if attributes:
+        emit(1, "if value is None:")
+        emit(2, "value = nothing")
+    for id in actions:
+        emit(1, "action_%d = actions.get(%d, nothing)    # %s" %
+             (id, id, python_action_name(symbols.name(id), id)))
+    emit(0, "")
+    emit(1, "def error(expected):")
+    emit(2, "if expected < FIRST_NON_TERMINAL:")
+    emit(3, "raise ParseError('parse error. got %s expected %s' % (token_names[token], token_names[expected]),")
+    emit(3, "                 token, expected)")
+    emit(2, "raise ParseError('parse error at %s %s' % (token_names[token], token_names[expected]), token, expected)")
+
+    rows = {}
+    for key in sorted(parse_table):
+        rows.setdefault(key[1], []).append(key[0])
+
+    for non_terminal in symbols.non_terminals():
+        # Collect the terminals selecting each production
+
+        selects = collections.OrderedDict()
+        for terminal in rows.get(non_terminal, ()):
+            prod = parse_table[(terminal, non_terminal)]
+            if prod not in selects:
+                selects[prod] = []
+            selects[prod].append(terminal)
+
+        loops = False
+        for prod in selects:
+            if prod and prod[-1] == non_terminal:
+                loops = True
+
+        emit(0, "")
+        emit(1, "def %s():" % python_direct_function(symbols, non_terminal))
+        emit(2, "nonlocal token")
+        indent = 2
+        if loops:
+            emit(2, "while True:")
+            indent = 3
+        if attributes:
+            emit(indent, "attrs.append(None)")
+        emit(indent, "if token is None:")
+        emit(indent + 1, "token = lex()")
+        branch = "if"
+        for prod, terminals in selects.items():
+            if len(terminals) == 1:
+                test = "token == %d" % terminals[0]
+            else:
+                test = "token in (%s)" % ", ".join("%d" % t for t in terminals)
+            emit(indent, "%s %s:    # %s" % (branch, test, python_direct_names(symbols, terminals)))
+            branch = "elif"
+            body = indent + 1
+            tail = False
+            for i, token in enumerate(prod):
+                if symbols.is_terminal(token):
+                    if i == 0:
+                        emit(body, "token = None    # %s" % symbols.name(token))
+                    else:
+                        emit(body, "if token is None:")
+                        emit(body + 1, "token = lex()")
+                        emit(body, "if token != %d:    # %s" % (token, symbols.name(token)))
+                        emit(body + 1, "error(%d)" % token)
+                        emit(body, "token = None")
+                    if attributes:
+                        emit(body, "attrs.append(value())")
+                elif symbols.is_non_terminal(token):
+                    if loops and i == len(prod) - 1 and token == non_terminal:
+                        tail = True
+                    else:
+                        emit(body, "%s()" % python_direct_function(symbols, token))
+                elif attributes:
+                    emit(body, "action_%d(attrs)" % codes[token])
+                else:
+                    emit(body, "action_%d()" % codes[token])
+            if loops:
+                if tail:
+                    emit(body, "continue")
+                else:
+                    emit(body, "return")
+            elif not prod:
+                emit(body, "pass")
+        if branch == "if":
+            emit(indent, "error(%d)" % non_terminal)
+        else:
+            emit(indent, "else:")
+            emit(indent + 1, "error(%d)" % non_terminal)
+
+    emit(0, "")
+    emit(1, "%s()" % python_direct_function(symbols, symbols.ids[start_symbol]))
+    emit(1, "if token is None:")
+    emit(2, "token = lex()")
+    emit(1, "if token != END:")
+    emit(2, "raise ParseError('parse stack empty at %s' % token_names[token], token)")
+    if attributes:
+        emit(1, "return attrs[0]")
+
+    fprint('', file=file)
+    fprint('#', file=file)
+    fprint('# Parse the tokens returned by lex, calling functions from the', file=file)
+    fprint('# actions dictionary for each action', file=file)
+    fprint('#', file=file)
+    fprint('', file=file)
+    fprint('from lola_runtime import ParseError', file=file)
+    fprint('', file=file)
+    for line in lines:
+        fprint(line.rstrip(), file=file)
 
 def pad(value, round):
     p = value % round
@@ -856,12 +1923,45 @@ def pad(value, round):
         return round - p
     return 0
 
-c_line = 1
+#
+# Table entries hold indices shifted right, with each item padded to
+# a multiple of 1 << shift so that its index can be recovered. Find
+# the smallest shift keeping the index of every item within 'limit',
+# or None when there are too many items for that
+#
+
+def padded_shift(sizes, limit):
+    if len(sizes) > limit + 1:
+        return None
+    shift = 0
+    while True:
+        round = 1 << shift
+        index = 0
+        for size in sizes:
+            if index >> shift > limit:
+                break
+            index += size + pad(size, round)
+        else:
+            return shift
+        shift += 1
+
+#
+# The C tables use bytes for their entries when the indices fit,
+# otherwise 16 or 32 bit values without padding. The largest values
+# are reserved to mark empty entries and, in the compact table, the
+# links between chains
+#
+
+entry_types = { 1: "uint8_t", 2: "uint16_t", 4: "uint32_t" }
 
-def print_c(string, end='\n', file=None):
-    global c_line
-    c_line += string.count("\n") + end.count("\n")
-    fprint(string, file=file, end=end)
+def entry_max(bytes):
+    return (1 << (8 * bytes)) - 1
+
+def entry_bytes(largest):
+    for bytes in (1, 2, 4):
+        if largest <= entry_max(bytes):
+            return bytes
+    error("lola: table index %d is too large" % largest)
 
 def pretty(title, a):
     print("%s" % title)
@@ -869,7 +1969,7 @@ def pretty(title, a):
     pp.pprint(a)
 
 def is_subset(sub,sup):
-    return set(sub) - set(sup) == set()
+    return sub & ~sup == 0
 
 def pick_binding(possibles, n):
     binding = {}
@@ -895,7 +1995,7 @@ def total_bindings(possibles):
     return n
 
 def lookup_optimized(table, binding, terminal, non_terminal):
-    terms = (terminal,)
+    terms = terminal_mask(terminal)
     while True:
         if not terms in table:
             return False
@@ -913,7 +2013,7 @@ def non_terminal_table(terminals, terminal_map, binding):
     for terminal in terminals:
 
         while True:
-            terms = (terminal,)
+            terms = terminal_mask(terminal)
 
             if not terms in terminal_map:
                 break
@@ -930,8 +2030,8 @@ def non_terminal_table(terminals, terminal_map, binding):
             finished[terms] = True
 
     for terms, prods in terminal_map.items():
-        for term in terms:
-            ts = (term,)
+        for term in mask_members(terms):
+            ts = terminal_mask(term)
             for prod in prods:
                 if not lookup_optimized(table, binding, term, prod[0]):
                     if not ts in table:
@@ -943,36 +2043,28 @@ def non_terminal_table(terminals, terminal_map, binding):
 def prod_size(prod):
     return len(prod) + 1
 
-def non_terminal_size(table):
-    l = 0
-    for terms, prods in table.items():
-        l += len(prods) + 2
-    return l
-
-def optimize(grammar, parse_table, terminals, non_terminals, output):
+def optimize(symbols, parse_table, search_time=None, profile=None):
     #
     # Walk over the parse table
     # and figure out which non-terminal → production
-    # mappings are shared between terminals
+    # mappings are shared between terminals. Sets of
+    # terminals are bit masks
     #
 
     non_terminal_map = {}
 
-    for terminal in terminals:
+    for parse_key in sorted(parse_table):
 
-        for non_terminal in non_terminals:
+        terminal, non_terminal = parse_key
 
-            parse_key = (terminal, non_terminal)
-            if parse_key in parse_table:
-    
-                prod = parse_table[parse_key]
+        prod = parse_table[parse_key]
 
-                prod_key = (non_terminal, prod)
+        prod_key = (non_terminal, prod)
 
-                if prod_key not in non_terminal_map:
-                    non_terminal_map[prod_key] = ()
+        if prod_key not in non_terminal_map:
+            non_terminal_map[prod_key] = 0
 
-                non_terminal_map[prod_key] = non_terminal_map[prod_key] + (terminal,)
+        non_terminal_map[prod_key] |= terminal_mask(terminal)
 
     # Now flip that over to generate a map from a set of terminals to the
     # non-terminal/productions they match
@@ -989,16 +2081,16 @@ def optimize(grammar, parse_table, terminals, non_terminals, output):
     # Build possible terminals mappings for each entry in
     # non_terminal_map. This means, for each set of terminals,
     # find the list of all supersets
-    
-    for prod_sub, term_sub in non_terminal_map.items():
-        for prod_sup, term_sup in non_terminal_map.items():
+
+    for term_sub in terminal_map:
+        for term_sup in terminal_map:
             if term_sub != term_sup and is_subset(term_sub, term_sup):
                 # add this set to the list of possible first bindings
                 if not term_sub in possibles:
                     possibles[term_sub] = ()
                 if not term_sup in possibles[term_sub]:
                     possibles[term_sub] = possibles[term_sub] + (term_sup,)
-        
+
 
     # Trim possible terminal mappings so that only the smallest subset
     # along each path is present. This should leave the few entries
@@ -1016,31 +2108,15 @@ def optimize(grammar, parse_table, terminals, non_terminals, output):
                 new_sups = new_sups + (sup,)
         new_possibles[sub] = new_sups
 
-    print_c("/*", file=output)
-    print_c(" * Possible graph edges %d total %d minimal" %
-            (total_bindings(possibles),
-             total_bindings(new_possibles)),
-            file=output)
-    if False:
-        print_c(" *", file=output)
-        for terms in possibles:
-            print_c(" *", file=output)
-            print_c(" * all mappings for %s" % (terms,), file=output)
-            for poss in possibles[terms]:
-                print_c(" * %r -> %r" % (terms, poss), file=output)
-            print_c(" *", file=output)
-            print_c(" * minimal mappings for %s" % (terms,), file=output)
-            for poss in new_possibles[terms]:
-                print_c(" * %r -> %r" % (terms, poss), file=output)
-            print_c(" *", file=output)
-
-    print_c(" */", file=output)
+    edges = (total_bindings(possibles), total_bindings(new_possibles))
 
+    all_possibles = possibles
     possibles = new_possibles
 
     # Select a binding using the heuristic that binding to smaller
-    # supersets will be better than larger supersets.  An exhaustive
-    # search is 'too expensive' at this point.
+    # supersets will be better than larger supersets. This is used
+    # directly unless some time has been allowed to search for a
+    # better one
 
     binding_map = {}
 
@@ -1054,336 +2130,2144 @@ def optimize(grammar, parse_table, terminals, non_terminals, output):
 
         # If we have a choice of binding for this
         # set of terminals, select the one with
-        # the smallest superset
+        # the smallest superset. With a profile, prefer
+        # the superset which holds the most frequently
+        # used productions for these terminals
 
         if possible_len > 1:
+            best_hits = -1
             for i in range(len(possibles[terms])):
 
                 super = possibles[terms][i]
 
+                hits = 0
+                if profile:
+                    hits = profile_hits(profile, terms, terminal_map[super])
+
                 # Heuristic - select smaller superset
-            
-                l = len(super)
-                if best_len == -1 or l < best_len:
+
+                l = mask_size(super)
+                if hits > best_hits or (hits == best_hits and l < best_len):
                     best_i = i
                     best_len = l
+                    best_hits = hits
 
         binding_map[terms] = best_i
 
     # Construct the final binding and non-terminal table
 
     best_binding_simple = pick_binding_simple(possibles, binding_map)
-    best_table_simple = non_terminal_table(terminals, terminal_map, best_binding_simple)
-    best_len_simple = non_terminal_size(best_table_simple)
-
-    return (best_binding_simple, best_table_simple)
-
-def dump_c(grammar, parse_table, file=sys.stdout, filename="<stdout>"):
-    output=file
-    terminals = get_terminals(grammar)
-    num_terminals = len(terminals)
-    non_terminals = get_non_terminals(grammar)
-    num_non_terminals = len(non_terminals)
-    actions = get_actions(grammar)
-    num_actions = len(actions)
-    print_c("/* %d terminals %d non_terminals %d actions (%d duplicates) %d parse table entries */" %
-            (num_terminals, num_non_terminals, num_actions, count_actions(grammar) - num_actions, len(parse_table)), file=output)
-    print_c("", file=output)
-    print_c("#ifndef CONST", file=output)
-    print_c("#define CONST const", file=output)
-    print_c("#endif", file=output)
-    print_c("#if !defined(GRAMMAR_TABLE) && !defined(TOKEN_NAMES) && !defined(PARSE_CODE)", file=output)
-    print_c("typedef enum {", file=output)
-    print_c("    TOKEN_NONE = 0,", file=output)
-    token_value = {}
-    value = 1
-    first_terminal = value
-    for terminal in terminals:
-        token_value[terminal] = value
-        print_c("    %s = %d," % (terminal_name(terminal), value), file=output)
-        value += 1
-    first_non_terminal = value
-    print_c("    FIRST_NON_TERMINAL = %d," % first_non_terminal, file=output)
-    for non_terminal in non_terminals:
-        token_value[non_terminal] = value
-        print_c("    %s = %d," % (non_terminal_name(non_terminal), value), file=output)
-        value += 1
-    print_c("    FIRST_ACTION = %d," % value, file=output)
-    for action in actions:
-        token_value[compress_action(action)] = value
-        print_c("    %s = %d, // %s" %
-                (action_name(token_value, action), value, compress_action(action)), file=output)
-        value += 1
-    print_c("} __attribute__((packed)) token_t;", file=output)
-    print_c("#endif", file=output)
-    print_c("", file=output)
-    print_c("#ifdef GRAMMAR_TABLE", file=output)
-    print_c("#undef GRAMMAR_TABLE", file=output)
-
-    prod_map = {};
-    
-    # Compute total size of production table to know what padding we'll need
-
-    prod_handled = {}
-
-    total_tokens = 0;
-    for key in parse_table:
-        if len(parse_table[key]) == 0:
-            continue
-        prod = parse_table[key] + (key[1],)
-        if prod not in prod_handled:
-            total_tokens += 2 + len(prod)
-            prod_handled[prod] = True
-
-    prod_shift = 0
-    while 1 << (8 + prod_shift) < total_tokens:
-        prod_shift += 1
+    best_table_simple = non_terminal_table(symbols.terminals(), terminal_map, best_binding_simple)
+    if profile:
+        best_table_simple = profile_order(best_table_simple, profile)
 
-    prod_round = 1 << prod_shift
+    search = None
+    if search_time is not None:
+        best_binding_simple, best_table_simple, search = search_binding(symbols.terminals(), parse_table, terminal_map,
+                                                                         all_possibles, best_binding_simple,
+                                                                         search_time, profile)
 
-    print_c("#ifndef PARSE_TABLE_DECLARATION", file=output)
-    print_c("#define PARSE_TABLE_DECLARATION(n) n", file=output)
-    print_c("#endif", file=output)
-
-    #
-    # Dump production table.
-    #
-    # This table contains all of the productions in the grammar.
-    # When the top of the parse stack is a non-terminal, the
-    # production matching that non-terminal and the current input
-    # token replaces the top of the parse stack.
-    #
-    # Each production is stored in reverse order so that the
-    # tokens can be simply pushed in order. The productions are
-    # terminated with TOKEN_NONE, and then padded to a multiple
-    # of a power of two tokens so that the index into this
-    # table can be stored in a single byte.
-    #
+    return (best_binding_simple, best_table_simple, edges, search)
 
-    print_c("/*", file=output);
-    print_c(" * Parse table", file=output);
-    print_c(" *", file=output);
-    for key in parse_table:
-        terminal = key[0]
-        non_terminal = key[1]
-        print_c(" * %-12s, %-12s" % (terminal, non_terminal), end='', file=output)
-        prod = parse_table[key]
-        if not prod:
-            print_c("()", end='', file=output)
-        for token in prod:
-            name = token
-            if is_action(token):
-                name = action_name(token_value, token)
-            print_c(" %s," % name, end='', file=output)
-        print_c("", file=output)
-    print_c(" */", file=output)
-
-    print_c("static CONST token_t PARSE_TABLE_DECLARATION(production_table)[] = {", file=output);
-
-    prod_index = 0
-    for key in parse_table:
-        prod = parse_table[key] + (key[1],)
-        if prod not in prod_map:
-            prod_map[prod] = prod_index
-
-            print_c("    /* %4d */   " % prod_index, end='', file=output)
-            for token in prod[::-1]:
-                print_c(" %s," % token_name(token_value, token), end='', file=output)
-                prod_index += 1
+#
+# Measure a binding by the size of the resulting compact non-terminal
+# table and the total number of entries match_state examines to find
+# every production in the parse table, counting each chain link as
+# one. With a profile, each lookup is weighted by how often it was
+# used, and making the common lookups quick is more important than
+# the size of the table
+#
 
-            # Pad the production with TOKEN_NONE to
-            # allow a single byte to index this table
-            #
-            p = pad(prod_index + 1, prod_round)
-            for i in range(0,p):
-                print_c(" TOKEN_NONE,", end='', file=output)
-                prod_index += 1
-            print_c(" TOKEN_NONE,", file=output)
-            prod_index += 1
+def chain_length(table, binding, terminal, non_terminal):
+    terms = terminal_mask(terminal)
+    steps = 0
+    while terms in table:
+        for prod in table[terms]:
+            steps += 1
+            if prod[0] == non_terminal:
+                return steps
+        if not terms in binding:
+            break
+        steps += 1
+        terms = binding[terms]
+    return steps
+
+def binding_cost(parse_table, binding, table, profile=None):
+    chain = 0
+    weighted = 0
+    for terminal, non_terminal in parse_table:
+        length = chain_length(table, binding, terminal, non_terminal)
+        chain += length
+        if profile:
+            weighted += length * profile.get((terminal, non_terminal), 0)
+    return (compact_table_size(binding, table), chain, weighted)
+
+def cost_key(cost, profile):
+    size, chain, weighted = cost
+    if profile:
+        return (weighted, size, chain)
+    return (size, chain)
 
-    print_c("};", file=output)
+#
+# A lower bound on the cost of any binding extending 'partial', which
+# binds some of the sets of terminals. Each terminal looks along its
+# chain, which is known up to the first set not yet bound. Sets on a
+# known chain are in the table, with a link when they are bound.
+# Other sets are either in the table too or have their productions
+# copied to the table of each member terminal, and are charged the
+# cheaper of those unless every member's chain is known. A lookup
+# costs the entries on its chain ahead of its production, when that
+# is on the known part of the chain, and otherwise at least the
+# entries of the terminal's own set, after which any copied
+# productions go. Padding is ignored
+#
 
-    if num_non_terminals < 255 and num_terminals < 255:
-        token_key_type = "uint8_t"
-    else:
-        token_key_type = "uint16_t"
+def binding_bound(terminals, terminal_map, possibles, profile=None):
+    entries = {}
+    lookups = []
+    for terms, prods in terminal_map.items():
+        if profile:
+            prods = tuple(sorted(prods, key=lambda prod: -profile_hits(profile, terms, (prod,))))
+        entries[terms] = prods
+        for pos, (non_terminal, prod) in enumerate(prods, 1):
+            for terminal in mask_members(terms):
+                weight = profile.get((terminal, non_terminal), 0) if profile else 0
+                lookups.append((terminal, terms, pos, weight))
+
+    def chain(terminal, binding):
+        terms = terminal_mask(terminal)
+        if terms not in terminal_map:
+            return [], True
+        sets = [terms]
+        while terms in possibles:
+            if terms not in binding:
+                return sets, False
+            terms = binding[terms]
+            sets.append(terms)
+        return sets, True
+
+    def bound(binding):
+        chains = {}
+        included = set()
+        for terminal in terminals:
+            chains[terminal] = chain(terminal, binding)
+            included.update(chains[terminal][0])
+
+        size = 0
+        for terms, prods in terminal_map.items():
+            own = len(prods) + (2 if terms in possibles else 1)
+            members = mask_members(terms)
+            spread = len(members) * len(prods)
+            if terms in included:
+                size += own
+            elif all(chains[terminal][1] for terminal in members):
+                size += spread
+            else:
+                size += min(own, spread)
+
+        length = 0
+        weighted = 0
+        for terminal, terms, pos, weight in lookups:
+            sets, known = chains[terminal]
+            if terms in sets and not (profile and terms == sets[0]):
+                steps = pos
+                for ahead in sets[:sets.index(terms)]:
+                    steps += len(entries[ahead]) + 1
+            elif profile or not sets:
+                steps = 1
+            else:
+                steps = len(entries[sets[0]]) + 1
+            length += steps
+            weighted += steps * weight
+        return cost_key((size, length, weighted), profile)
+
+    return bound
+
+#
+# Search for the binding with the smallest table, and then the
+# shortest chains, spending at most 'seconds'. Starting from the
+# given binding, each set of terminals is re-bound to each of its
+# possible supersets in turn, keeping any change which makes things
+# better, until no change helps. That quickly finds a good binding,
+# which a depth first search then tries to beat, binding each set of
+# terminals to each of its supersets in turn, smaller sets first and
+# the current choice first. Any branch whose lower bound from
+# binding_bound is no better than the best binding found so far is
+# skipped, and costs are remembered so that no binding is measured
+# twice. When the search finishes, the result is the best binding;
+# when time runs out, it is the best found so far.
+#
+# Returns the best binding and table found, along with the number of
+# bindings measured, the total number of bindings, whether the search
+# finished and the costs of the starting and final bindings
+#
+
+def search_binding(terminals, parse_table, terminal_map, possibles, binding, seconds, profile=None):
+    deadline = time.perf_counter() + seconds
+    subs = sorted((sub for sub in possibles if len(possibles[sub]) > 1), key=lambda sub: (mask_size(sub), sub))
+    total = total_bindings(possibles)
+    bound = binding_bound(terminals, terminal_map, possibles, profile)
+    costs = {}
+
+    def measure(binding):
+        key = tuple(binding[sub] for sub in subs)
+        if key not in costs:
+            table = non_terminal_table(terminals, terminal_map, binding)
+            if profile:
+                table = profile_order(table, profile)
+            cost = binding_cost(parse_table, binding, table, profile)
+            costs[key] = (cost_key(cost, profile), cost, table)
+        return costs[key]
+
+    first_key, first_cost, table = measure(binding)
+    best = (first_key, first_cost, binding, table)
+    finished = True
+
+    improved = True
+    while improved and finished:
+        improved = False
+        for sub in subs:
+            for sup in possibles[sub]:
+                if time.perf_counter() > deadline:
+                    finished = False
+                    break
+                if sup == best[2][sub]:
+                    continue
+                candidate = dict(best[2])
+                candidate[sub] = sup
+                key, cost, table = measure(candidate)
+                if key < best[0]:
+                    best = (key, cost, candidate, table)
+                    improved = True
+            if not finished:
+                break
+
+    first_choice = best[2]
+    partial = {}
+    for sub, supers in possibles.items():
+        if len(supers) == 1:
+            partial[sub] = supers[0]
+
+    def choices(depth):
+        sub = subs[depth]
+        return iter(sorted(possibles[sub], key=lambda sup: sup != first_choice[sub]))
+
+    stack = []
+    if finished and subs and bound(partial) < best[0]:
+        stack.append(choices(0))
+    while stack:
+        if time.perf_counter() > deadline:
+            finished = False
+            break
+        depth = len(stack) - 1
+        sup = next(stack[-1], None)
+        if sup is None:
+            stack.pop()
+            partial.pop(subs[depth], None)
+            continue
+        partial[subs[depth]] = sup
+        if depth + 1 == len(subs):
+            key, cost, table = measure(partial)
+            if key < best[0]:
+                best = (key, cost, dict(partial), table)
+        elif bound(partial) < best[0]:
+            stack.append(choices(depth + 1))
+
+    key, cost, binding, table = best
+    return (binding, table, (len(costs), total, finished, first_cost, cost))
+
+#
+# Parse profiles
+#
+# A profile counts how many times the parser looked up each terminal
+# and non-terminal pair while parsing real input. It is a text file
+# with one lookup per line:
+#
+#   lookup TERMINAL non-terminal count
+#
+# using the names from the grammar. Blank lines, lines starting with
+# '#' and lines starting with any other word are ignored, as are
+# symbols not found in the grammar, so that a profile remains useful
+# as the grammar changes. Returns a map from (terminal, non-terminal)
+# ids to counts
+#
 
-    print_c("typedef %s token_key_t;" % token_key_type, file=output)
+def read_profile(symbols, file, name="<profile>"):
+    profile = {}
+    for line_number, line in enumerate(file, 1):
+        words = line.split()
+        if not words or words[0] != "lookup":
+            continue
+        if len(words) != 4 or not words[3].isdigit():
+            error("%s:%d: invalid profile line" % (name, line_number))
+        terminal = symbols.ids.get(words[1])
+        non_terminal = symbols.ids.get(words[2])
+        if terminal is None or non_terminal is None:
+            continue
+        if not symbols.is_terminal(terminal) or not symbols.is_non_terminal(non_terminal):
+            continue
+        key = (terminal, non_terminal)
+        profile[key] = profile.get(key, 0) + int(words[3])
+    return profile
 
-    print_c("#define production_index(i) ((i) << %d)" % prod_shift, file=output)
+#
+# Count the profiled lookups for a set of terminals which would be
+# satisfied by a list of non-terminal/production entries
+#
 
-    best_binding, best_table = optimize(grammar, parse_table, terminals, non_terminals, output)
+def profile_hits(profile, terms, prods):
+    hits = 0
+    for non_terminal, prod in prods:
+        for terminal in mask_members(terms):
+            hits += profile.get((terminal, non_terminal), 0)
+    return hits
 
-    best_len = non_terminal_size(best_table)
+#
+# Sort the entries for each set of terminals so that the most
+# frequently used come first. Entries which were never used keep
+# their original order
+#
 
-    best_shift = 0
-    while ((256 - 2) << best_shift) < best_len:
-        best_shift += 1
+def profile_order(table, profile):
+    ordered = collections.OrderedDict()
+    for terms, prods in table.items():
+        ordered[terms] = tuple(sorted(prods, key=lambda prod: -profile_hits(profile, terms, (prod,))))
+    return ordered
 
-    best_round = 1 << best_shift
+#
+# Each chain in the compact table holds its productions and ends with
+# a link to another chain or an end marker. The terminal table holds
+# the index of each chain, along with one past the last, which need
+# to fit in a byte for byte entries
+#
 
-    print_c("#define non_terminal_index(i) ((i) << %d)" % best_shift, file=output)
+def compact_chain_sizes(best_binding, best_table):
+    sizes = []
+    for terms, prods in best_table.items():
+        sizes.append(len(prods) + (2 if terms in best_binding else 1))
+    return sizes
 
-    print_c("static CONST uint8_t PARSE_TABLE_DECLARATION(non_terminal_table)[] = {", file=output)
+def compact_table_shift(best_binding, best_table):
+    return padded_shift(compact_chain_sizes(best_binding, best_table) + [1], entry_max(1))
+
+#
+# Compute the number of entries in the compact non-terminal table,
+# including the chain links and padding
+#
+
+def compact_table_size(best_binding, best_table):
+    best_round = 1 << (compact_table_shift(best_binding, best_table) or 0)
+    size = 0
+    for terms, prods in best_table.items():
+        size += len(prods)
+        if terms in best_binding:
+            size += 2
+        else:
+            size += 1
+        size += pad(size, best_round)
+    return size
+
+#
+# Row displacement packing
+#
+# Each row of the parse table, holding the entries for one
+# non-terminal indexed by terminal, is placed at some offset in a
+# single array such that none of its entries collide with those
+# already placed. A parallel check array records which row owns each
+# slot. Offsets may be negative as long as every entry in the row
+# lands inside the array.
+#
+# Rows are placed first-fit. The result depends on the order in which
+# rows are placed, so several orders are tried and the smallest
+# packing is kept.
+#
+# 'rows' maps each row number to a list of (column, value)
+# pairs. Returns the offset for each row and the packed array, which
+# holds (row, value) pairs or None for unused slots
+#
+
+def comb_place(rows, order):
+    base = {}
+    slots = []
+    for row in order:
+        entries = rows[row]
+        if not entries:
+            base[row] = 0
+            continue
+        first = min(column for column, value in entries)
+        offset = -first
+        while True:
+            for column, value in entries:
+                i = offset + column
+                if i < len(slots) and slots[i] is not None:
+                    break
+            else:
+                break
+            offset += 1
+        for column, value in entries:
+            i = offset + column
+            while len(slots) <= i:
+                slots.append(None)
+            slots[i] = (row, value)
+        base[row] = offset
+    return (base, slots)
+
+def comb_span(entries):
+    if not entries:
+        return 0
+    columns = [column for column, value in entries]
+    return max(columns) - min(columns)
+
+def comb_pack(rows):
+    orders = (sorted(rows, key=lambda row: (-len(rows[row]), row)),
+              sorted(rows, key=lambda row: (-comb_span(rows[row]), row)),
+              sorted(rows, key=lambda row: (-comb_span(rows[row]), -len(rows[row]), row)),
+              sorted(rows))
+    best = None
+    for order in orders:
+        packed = comb_place(rows, order)
+        if best is None or len(packed[1]) < len(best[1]):
+            best = packed
+    return best
+
+#
+# Lexer generation
+#
+# Terminals may be defined in the grammar with a literal string or a
+# regular expression:
+#
+#   NUMBER	= /[0-9]+(\.[0-9]*)?/ ;
+#   PLUS	= "+" ;
+#   = /[ \t\n]+/ ;
+#
+# Definitions without a name match text which is skipped. Each
+# pattern is compiled to an NFA, the NFAs are combined and turned
+# into a DFA, which is then minimized. The scanner takes the longest
+# match; when two definitions match the same text, the earlier one
+# wins.
+#
+# The alphabet is the 256 byte values plus one more symbol, lex_other,
+# which stands for every character past 255 when scanning python
+# strings. Sets of characters are held in integer bit masks, and the
+# characters are divided into classes which no pattern can tell apart
+# so that the DFA tables only need one column per class.
+#
+
+lex_other = 256
+lex_all = (1 << (lex_other + 1)) - 1
+lex_skip = -1
+
+def char_mask(c):
+    return 1 << c
+
+def range_mask(first, last):
+    return ((1 << (last + 1)) - 1) & ~((1 << first) - 1)
+
+lex_class_masks = {
+    'd': range_mask(ord('0'), ord('9')),
+    's': char_mask(ord(' ')) | range_mask(ord('\t'), ord('\r')),
+    'w': (range_mask(ord('0'), ord('9')) | range_mask(ord('A'), ord('Z')) |
+          range_mask(ord('a'), ord('z')) | char_mask(ord('_'))),
+}
+
+lex_escapes = { 'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', '0': '\0' }
+
+class LexNfa:
+    def __init__(self):
+        self.edges = []
+        self.accepts = {}
+
+    def state(self):
+        self.edges.append([])
+        return len(self.edges) - 1
+
+    # An edge with mask None is an epsilon edge
+    def edge(self, source, mask, target):
+        self.edges[source].append((mask, target))
+
+#
+# Parse a pattern into the NFA, returning the start and end states of
+# the new fragment. 'where' names the definition in error messages
+#
+
+class LexPattern:
+    def __init__(self, nfa, text, where):
+        self.nfa = nfa
+        self.text = text
+        self.pos = 0
+        self.where = where
+
+    def error(self, msg):
+        error("%s: %s in pattern %r" % (self.where, msg, self.text))
+
+    def peek(self):
+        if self.pos < len(self.text):
+            return self.text[self.pos]
+        return None
+
+    def next(self):
+        c = self.peek()
+        if c is None:
+            self.error("unexpected end")
+        self.pos += 1
+        return c
+
+    def char(self, c):
+        if ord(c) >= lex_other:
+            self.error("character %r is not 8-bit" % c)
+        return ord(c)
+
+    def escape(self):
+        c = self.next()
+        if c in lex_escapes:
+            return char_mask(ord(lex_escapes[c]))
+        if c.lower() in lex_class_masks:
+            mask = lex_class_masks[c.lower()]
+            if c.isupper():
+                mask = lex_all & ~mask
+            return mask
+        if c == 'x':
+            digits = self.text[self.pos:self.pos+2]
+            if len(digits) != 2 or not all(d in "0123456789abcdefABCDEF" for d in digits):
+                self.error("invalid \\x escape")
+            self.pos += 2
+            return char_mask(int(digits, 16))
+        return char_mask(self.char(c))
+
+    def fragment(self, mask):
+        start = self.nfa.state()
+        end = self.nfa.state()
+        self.nfa.edge(start, mask, end)
+        return (start, end)
+
+    def literal(self):
+        start = end = self.nfa.state()
+        while self.pos < len(self.text):
+            c = self.next()
+            if c == '\\':
+                mask = self.escape()
+            else:
+                mask = char_mask(self.char(c))
+            state = self.nfa.state()
+            self.nfa.edge(end, mask, state)
+            end = state
+        return (start, end)
+
+    def char_class(self):
+        negate = self.peek() == '^'
+        if negate:
+            self.pos += 1
+        mask = 0
+        first = True
+        while first or self.peek() != ']':
+            first = False
+            c = self.next()
+            if c == '\\':
+                low = self.escape()
+            else:
+                low = char_mask(self.char(c))
+            if self.peek() == '-' and self.text[self.pos+1:self.pos+2] not in ("]", ""):
+                self.pos += 1
+                c = self.next()
+                if c == '\\':
+                    high = self.escape()
+                else:
+                    high = char_mask(self.char(c))
+                if low & (low - 1) or high & (high - 1) or high < low:
+                    self.error("invalid range")
+                mask |= range_mask(low.bit_length() - 1, high.bit_length() - 1)
+            else:
+                mask |= low
+        self.pos += 1
+        if negate:
+            mask = lex_all & ~mask
+        return mask
+
+    def atom(self):
+        c = self.next()
+        if c == '(':
+            fragment = self.alternation()
+            if self.next() != ')':
+                self.error("missing )")
+            return fragment
+        if c == '[':
+            return self.fragment(self.char_class())
+        if c == '.':
+            return self.fragment(lex_all & ~char_mask(ord('\n')))
+        if c == '\\':
+            return self.fragment(self.escape())
+        if c in "*+?|)":
+            self.error("unexpected %r" % c)
+        return self.fragment(char_mask(self.char(c)))
+
+    def repeat(self):
+        start, end = self.atom()
+        while self.peek() and self.peek() in "*+?":
+            op = self.next()
+            new_start = self.nfa.state()
+            new_end = self.nfa.state()
+            self.nfa.edge(new_start, None, start)
+            self.nfa.edge(end, None, new_end)
+            if op != '+':
+                self.nfa.edge(new_start, None, new_end)
+            if op != '?':
+                self.nfa.edge(end, None, start)
+            start, end = new_start, new_end
+        return (start, end)
+
+    def sequence(self):
+        start = end = self.nfa.state()
+        while self.peek() and self.peek() not in "|)":
+            frag_start, frag_end = self.repeat()
+            self.nfa.edge(end, None, frag_start)
+            end = frag_end
+        return (start, end)
+
+    def alternation(self):
+        start, end = self.sequence()
+        if self.peek() != '|':
+            return (start, end)
+        new_start = self.nfa.state()
+        new_end = self.nfa.state()
+        self.nfa.edge(new_start, None, start)
+        self.nfa.edge(end, None, new_end)
+        while self.peek() == '|':
+            self.pos += 1
+            start, end = self.sequence()
+            self.nfa.edge(new_start, None, start)
+            self.nfa.edge(end, None, new_end)
+        return (new_start, new_end)
+
+    def regex(self):
+        fragment = self.alternation()
+        if self.pos != len(self.text):
+            self.error("unexpected %r" % self.text[self.pos])
+        return fragment
+
+#
+# Split the alphabet into classes of characters which are treated the
+# same by every edge in the NFA. Returns a list holding the class of
+# each character and the mask of each class
+#
+
+def lex_classes(nfa):
+    classes = [lex_all]
+    for edges in nfa.edges:
+        for mask, target in edges:
+            if mask is None:
+                continue
+            split = []
+            for c in classes:
+                for part in (c & mask, c & ~mask):
+                    if part:
+                        split.append(part)
+            classes = split
+    classes.sort(key=lambda mask: (mask & -mask))
+    char_class = [0] * (lex_other + 1)
+    for i, mask in enumerate(classes):
+        for c in mask_members(mask):
+            char_class[c] = i
+    return char_class, classes
+
+def lex_closure(nfa, states):
+    stack = list(states)
+    closure = set(states)
+    while stack:
+        for mask, target in nfa.edges[stack.pop()]:
+            if mask is None and target not in closure:
+                closure.add(target)
+                stack.append(target)
+    return frozenset(closure)
+
+#
+# Subset construction. DFA state 0 is the dead state, with every
+# transition leading back to itself. Each state accepts the
+# definition with the smallest index among its NFA states, or None
+#
+
+def lex_dfa(nfa, start, classes):
+    dead = frozenset()
+    states = { dead: 0 }
+    order = [dead]
+    next = []
+    accepts = []
+    todo = [lex_closure(nfa, (start,))]
+    states[todo[0]] = 1
+    order.append(todo[0])
+    i = 0
+    while i < len(order):
+        subset = order[i]
+        row = []
+        for mask in classes:
+            targets = set()
+            for state in subset:
+                for edge_mask, target in nfa.edges[state]:
+                    if edge_mask is not None and edge_mask & mask:
+                        targets.add(target)
+            target = lex_closure(nfa, targets) if targets else dead
+            if target not in states:
+                states[target] = len(order)
+                order.append(target)
+            row.append(states[target])
+        next.append(row)
+        accept = [nfa.accepts[state] for state in subset if state in nfa.accepts]
+        accepts.append(min(accept) if accept else None)
+        i += 1
+    return next, accepts
+
+#
+# Minimize the DFA by splitting states into blocks, starting with one
+# block for each accepted definition, and then splitting blocks whose
+# states go to different blocks, until nothing changes. The dead
+# state stays 0 and the start state 1; the other states are numbered
+# in the order they are reached from the start
+#
+
+def lex_minimize(next, accepts):
+    block = [accepts[state] for state in range(len(next))]
+    count = len(set(block))
+    while True:
+        signatures = {}
+        new_block = []
+        for state in range(len(next)):
+            signature = (block[state],) + tuple(block[target] for target in next[state])
+            if signature not in signatures:
+                signatures[signature] = len(signatures)
+            new_block.append(signatures[signature])
+        block = new_block
+        if len(signatures) == count:
+            break
+        count = len(signatures)
+
+    number = { block[0]: 0, block[1]: 1 }
+    order = [0, 1]
+    i = 1
+    while i < len(order):
+        for target in next[order[i]]:
+            if block[target] not in number:
+                number[block[target]] = len(order)
+                order.append(target)
+        i += 1
+    min_next = [[number[block[target]] for target in next[state]] for state in order]
+    min_accepts = [accepts[state] for state in order]
+    return min_next, min_accepts
+
+#
+# Build the scanner for a list of (name, kind, text, line)
+# definitions, where kind is 'literal' or 'regex' and name is None for
+# skipped text. Returns the class of each character, the transition
+# table indexed by state and class and, for each state, the index of
+# the definition it accepts or None
+#
+
+def lex_build(definitions, file_name):
+    nfa = LexNfa()
+    start = nfa.state()
+    for index, (name, kind, text, line) in enumerate(definitions):
+        pattern = LexPattern(nfa, text, "%s:%d" % (file_name, line))
+        if kind == 'literal':
+            frag_start, frag_end = pattern.literal()
+        else:
+            frag_start, frag_end = pattern.regex()
+        nfa.edge(start, None, frag_start)
+        nfa.accepts[frag_end] = index
+        if frag_end in lex_closure(nfa, (frag_start,)):
+            error("%s:%d: pattern for %s matches the empty string" % (file_name, line, name or "skipped text"))
+    char_class, classes = lex_classes(nfa)
+    next, accepts = lex_dfa(nfa, start, classes)
+    next, accepts = lex_minimize(next, accepts)
+    return char_class, next, accepts
+
+#
+# Parse table cache
+#
+# Computing and optimizing the parse table is the slow part of
+# generating a parser, and the result only depends on the structure
+# of the grammar. The cache is only used when asked for with --cache
+# or --cache-dir. Entries are stored in a directory, named by a hash
+# of the terminal and non-terminal names, the productions with each
+# action replaced by its symbol id, the pre-processor symbols and the
+# lola version. Editing the text of actions or comments leaves the
+# hash unchanged, so only the output needs to be regenerated.
+#
+# Each entry holds the parse table, the optimized table layout and
+# any warnings produced while building the table. Entries are
+# written to a temporary file and renamed so that parallel builds can
+# share a cache. Once the cache grows past max_bytes, or entries are
+# older than max_age seconds, the least recently used entries are
+# removed.
+#
+
+def source_hash():
+    try:
+        with open(__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+lola_source_hash = source_hash()
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "lola")
+
+class TableCache:
+    def __init__(self, dir=None, max_bytes=64 * 1024 * 1024, max_age=30 * 24 * 60 * 60):
+        self.dir = dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def key(self, symbols, defines, optimize_time=None, profile=None):
+        h = hashlib.sha256()
+        h.update(repr((version,
+                       lola_source_hash,
+                       tuple(sorted(defines)),
+                       optimize_time,
+                       sorted((profile or {}).items()),
+                       tuple(symbols.names[:symbols.first_action]),
+                       symbols.productions)).encode('utf-8'))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.dir, key + ".table")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.PickleError, AttributeError, ValueError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.path(key))
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        now = time.time()
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".table"):
+                continue
+            path = os.path.join(self.dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+#
+# Generator state
+#
+# Everything needed to turn one grammar into a parser lives in a Lola
+# object, so that a single program can process many grammars, one
+# after another or in separate threads. The stages are:
+#
+#   load         read and parse the grammar
+#   analyze      build the symbol table and first/follow sets
+#   build_table  construct the parse table
+#   emit_c       write the C header
+#   emit_python  write the python parse table
+#
+
+#
+# Statistics gathered with --stats. Each phase records its wall time
+# and the peak memory allocated while it ran, measured from the
+# memory in use when it started. Phases may run inside others; the
+# peak of the inner phase is included in the outer one. Tracing
+# memory slows python down, so the times are larger than without
+# --stats. close stops tracing, unless it was already running when the
+# Stats object was created
+#
+
+class Stats:
+    def __init__(self):
+        self.phases = []
+        self.sizes = []
+        self.peaks = []
+        self.tracing = not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+
+    def close(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def run(self, name, func, *args, **kwargs):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.peaks:
+            self.peaks[-1] = max(self.peaks[-1], peak)
+        tracemalloc.reset_peak()
+        depth = len(self.peaks)
+        self.peaks.append(0)
+        index = len(self.phases)
+        self.phases.append(None)
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak = max(tracemalloc.get_traced_memory()[1], self.peaks.pop())
+        if self.peaks:
+            self.peaks[-1] = max(self.peaks[-1], peak)
+        self.phases[index] = (name, depth, elapsed, peak - current)
+        return result
+
+    def size(self, name, value):
+        self.sizes.append((name, value))
+
+    def report(self, name, file=sys.stderr):
+        fprint("%s:" % name, file=file)
+        for phase, depth, elapsed, peak in self.phases:
+            fprint("  %-20s %10.4f s %12d bytes peak" % ("  " * depth + phase, elapsed, peak), file=file)
+        for size, value in self.sizes:
+            fprint("  %-30s %10d" % (size, value), file=file)
+
+class Lola:
+    def __init__(self, defines=(), optimize_time=None, stats=None, attributes=False, left_factor=False,
+                 left_recursion=False):
+        self.optimize_time = optimize_time
+        self.stats = stats
+        self.attributes = attributes
+        self.left_factor = left_factor
+        self.left_recursion = left_recursion
+        self.non_terminal_lines = {}
+        self.profile = None
+        self.ppsyms = {}
+        self.pp_stack = []
+        for name in defines:
+            self.define_pp(name)
+        self.action_lines = {}
+        self.lex_file_name = "<stdin>"
+        self.lex_text = ""
+        self.lex_tokens = []
+        self.lex_next = 0
+        self.lex_pos = 0
+        self.lex_line_number = 1
+        self.lex_value = False
+        self.c_line = 1
+        self.grammar = None
+        self.symbols = None
+        self.lex_definitions = []
+        self.analysis = None
+        self.parse_table = None
+        self.optimized = None
+        self.warnings = []
+
+    def action_line(self, action):
+        return self.action_lines[action]
+
+    def mark_action_line(self, action, line):
+        self.action_lines[action] = line
+
+    def define_pp(self, name):
+        self.ppsyms[name] = True
+
+    def defined_pp(self, name):
+        return name in self.ppsyms
+
+    def include_pp(self):
+        return len(self.pp_stack) == 0 or self.pp_stack[-1]
+
+    def push_pp(self, name):
+        self.pp_stack.append(self.include_pp() and self.defined_pp(name))
+
+    def pop_pp(self):
+        if len(self.pp_stack):
+            self.pp_stack.pop()
 
     #
-    # Dump the table mapping non-terminals to productions
+    # Split the input into (token, value, position) tuples. Line numbers
+    # are counted as actions and patterns are found, and by lex as it
+    # moves past each token
     #
-    # This table is indexed by the terminal table so that
-    # the entries need not include the terminal value as well
+
+    def lex_read(self, file):
+        text = lex_comment_re.sub("", file.read())
+        tokens = []
+        append = tokens.append
+        pos = 0
+        line = 1
+        line_pos = 0
+        token_re = lex_token_re
+        if not self.include_pp():
+            token_re = lex_pp_re
+        while True:
+            m = token_re.match(text, pos)
+            kind = m.lastgroup
+            pos = m.end()
+            if kind == "SYMBOL":
+                append((kind, m.group(kind), pos))
+            elif kind == "action":
+                line += text.count('\n', line_pos, pos)
+                line_pos = pos
+                value, pos = lex_action(text, pos, line)
+                self.mark_action_line(value, line)
+                append(("SYMBOL", value, pos))
+            elif kind == "EQUALS":
+                append((kind, False, pos))
+                line += text.count('\n', line_pos, pos)
+                line_pos = pos
+                m = lex_pattern_re.match(text, pos)
+                if not m:
+                    error("%s:%d: missing pattern after '='" % (self.lex_file_name, line))
+                pos = m.end()
+                append(("PATTERN", (m.lastgroup, m.group(m.lastgroup), line), pos))
+            elif kind == "push" or kind == "pop":
+                if kind == "push":
+                    self.push_pp(m.group(kind))
+                else:
+                    self.pop_pp()
+                if self.include_pp():
+                    token_re = lex_token_re
+                else:
+                    token_re = lex_pp_re
+            else:
+                append((kind, False, pos))
+                if kind == "END":
+                    break
+        self.lex_text = text
+        self.lex_tokens = tokens
+        self.lex_next = 0
+        self.lex_pos = 0
+        self.lex_line_number = 1
+
+    def lex(self):
+        token, self.lex_value, pos = self.lex_tokens[self.lex_next]
+        self.lex_line_number += self.lex_text.count('\n', self.lex_pos, pos)
+        self.lex_pos = pos
+        if token != "END":
+            self.lex_next += 1
+        return token
+
+    def lex_line(self):
+        return self.lex_line_number
+
+    #
+    # Read a grammar, using the parse table built from the grammar
+    # of lola input files
     #
 
-    best_indices = {}
-    best_index = 0
-    
-    for terms, prods in best_table.items():
-        best_indices[terms] = best_index
+    def load(self, file, name="<stdin>"):
+        table = lola_table
 
-        # Add a comment marking the start of the table
-        # entries for this terminal set
+        self.lex_file_name = name
+        self.lex_read(file)
 
-        print_c("    /* %d: (%s) */" %
-                (best_index, terminal_names(terms)),
-                file=output)
+        # Run the lola parser
 
-        # Dump out production table indices
-        #
+        stack = (start_symbol,)
+        token = False
+        result = {}
+        non_term = False
+        prod = ()
+        prods = ()
+        while True:
+            if stack:
+                top = head(stack)
+                stack = rest(stack)
+            else:
+                top = False
+
+            if top and is_action(top):
+                if top == "@NONTERM":
+                    non_term = self.lex_value
+                    if self.attributes:
+                        self.non_terminal_lines[non_term] = self.lex_line()
+                elif top == "@RULES":
+                    result[non_term] = prods
+                    prods = ()
+                    non_term = False
+                elif top == "@RULE":
+                    prods = prods + (prod,)
+                    prod = ()
+                elif top == "@SYMBOL":
+                    prod = prod + (self.lex_value,)
+                elif top == "@PATTERN":
+                    self.lex_definitions.append((non_term,) + self.lex_value)
+                    non_term = False
+                elif top == "@SKIP":
+                    self.lex_definitions.append((None,) + self.lex_value)
+                continue
 
-        for prod_ent in prods:
-            non_terminal, prod = prod_ent
-            key = prod + (non_terminal,)
-            print_c("        %3d,     /* %18s:" %
-                    (prod_map[key] >> prod_shift,
-                     non_terminal),
-                    end='', file=output)
-            for t in prod:
-                name = t
-                if is_action(t):
-                    name = action_name(token_value, t)
-                print_c(" %s" % name, end='', file=output)
-            print_c(" */", file=output)
-            best_index += 1
-        
-        if terms in best_binding:
-            next_terms = best_binding[terms]
-            print_c("      0xfe, %3d, /* %s */" %
-                    (best_indices[next_terms] >> best_shift,
-                     terminal_names(next_terms)),
-                    file=output)
-            best_index += 2
+            if not token:
+                token = self.lex()
+
+            if not top:
+                if token == end_token:
+                    result = self.transform(result)
+                    self.grammar = result
+                    self.symbols = Symbols(result)
+                    self.check_action_names()
+                    self.check_lex_definitions()
+                    return result
+                error("parse stack empty at %r" % token)
+
+            if is_terminal(top):
+                if top == token:
+                    token = False
+                else:
+                    error("%s:%d: parse error. got %r expected %r" % (self.lex_file_name, self.lex_line(), token, top))
+            else:
+                key = (token, top)
+                if key not in table:
+                    error("%s:%d: parse error at %r %r" % (self.lex_file_name, self.lex_line(), token, top))
+                stack = table[key] + stack
+
+    #
+    # Apply the grammar transformations selected when creating the
+    # Lola object. They change the positions of symbols within
+    # productions, which attribute references depend on
+    #
+
+    def transform(self, grammar):
+        if self.left_recursion:
+            grammar, rewritten, moved = self.phase("left_recursion", left_recursion, grammar, self.attributes)
+            for value, action in moved:
+                if value not in self.action_lines:
+                    self.mark_action_line(value, self.action_line(action))
+            self.record("left recursive non-terminals", rewritten)
+        if self.left_factor:
+            if self.attributes:
+                error("--left-factor cannot be used with --attributes")
+            grammar, created = self.phase("left_factor", left_factor, grammar)
+            self.record("left factored non-terminals", created)
+        if self.attributes:
+            grammar = self.attribute_grammar(grammar)
+        return grammar
+
+    #
+    # Rewrite the attribute references in each action as distances
+    # from the top of the attribute stack, and add the implicit
+    # actions which pop the values of each production
+    #
+
+    def attribute_grammar(self, grammar):
+        result = {}
+        for non_terminal, prods in grammar.items():
+            line = self.non_terminal_lines.get(non_terminal, 1)
+            result[non_terminal] = tuple(self.attribute_production(non_terminal, prod, line) for prod in prods)
+        return result
+
+    def attribute_production(self, non_terminal, prod, line):
+        n = 0
+        sets_value = False
+        out = []
+        for token in prod:
+            if is_action(token):
+                sets_value = sets_value or "$$" in token
+                token = self.attribute_action(token, n)
+            else:
+                n += 1
+            out.append(token)
+        if n == 0:
+            return tuple(out)
+        if prod[-1] == non_terminal and not sets_value:
+            out.insert(len(out) - 1, self.implicit_action(attribute_pop_action(n, False), line))
         else:
-            print_c("      0xff,", file=output)
-            best_index += 1
+            out.append(self.implicit_action(attribute_pop_action(n, not sets_value), line))
+        return tuple(out)
+
+    def attribute_action(self, action, k):
+        line = self.action_line(action)
+
+        def distance(m):
+            ref = m.group(1)
+            if ref != '$' and int(ref) > k:
+                error("%s:%d: $%s used before symbol %s is parsed" % (self.lex_file_name, line, ref, ref))
+            return "$[%d]" % attribute_distance(ref, k)
+
+        value = attribute_ref_re.sub(distance, action)
+        if value not in self.action_lines:
+            self.mark_action_line(value, line)
+        return value
+
+    def implicit_action(self, action, line):
+        if action not in self.action_lines:
+            self.mark_action_line(action, line)
+        return action
 
-        p = pad(best_index, best_round)
-        for i in range(p):
-            print_c("    0xff,", file=output)
-            best_index += 1
-        print_c("", file=output)
+    #
+    # Named actions become constants in the output, so one name can't
+    # be used for different code
+    #
 
-    print_c("};", file=output)
-    print_c("#define NON_TERMINAL_SIZE %d" % best_index, file=output)
+    def check_action_names(self):
+        symbols = self.symbols
+        names = {}
+        for id in range(symbols.first_action, len(symbols.names)):
+            action = symbols.name(id)
+            if not action_has_name(action):
+                continue
+            name = to_c(action[1:].split(None, 1)[0])
+            compressed = compress_action(action)
+            if names.setdefault(name, compressed) != compressed:
+                error("%s:%d: action %s is already used for different code" %
+                      (self.lex_file_name, self.action_line(action), name))
 
     #
-    # Dump the table mapping each terminal to a set of
-    # non-terminal/production bindings
+    # Terminal definitions must name terminals; those not used in the
+    # grammar have no token value and are left out of the scanner
+    #
+
+    def check_lex_definitions(self):
+        definitions = []
+        for definition in self.lex_definitions:
+            name, kind, text, line = definition
+            if name is not None:
+                if not is_terminal(name):
+                    error("%s:%d: %s is not a terminal" % (self.lex_file_name, line, name))
+                if name not in self.symbols.ids:
+                    self.warn("%s:%d: terminal %s is not used in the grammar" % (self.lex_file_name, line, name))
+                    continue
+            definitions.append(definition)
+        self.lex_definitions = definitions
+
     #
-    # This table holds indices into the non-terminal table cooresponding
-    # to each terminal.
+    # Build the scanner from the terminal definitions. Returns the
+    # class of each character, the transition table and, for each
+    # state, the symbol id it accepts, lex_skip for skipped text or
+    # None
     #
 
-    print_c("static CONST uint8_t PARSE_TABLE_DECLARATION(terminal_table)[] = {", file=output)
+    def lex_scanner(self):
+        if not self.lex_definitions:
+            return None
+        char_class, next, accepts = self.phase("lexer", lex_build, self.lex_definitions, self.lex_file_name)
+        tokens = []
+        for accept in accepts:
+            if accept is None:
+                tokens.append(None)
+            else:
+                name = self.lex_definitions[accept][0]
+                tokens.append(lex_skip if name is None else self.symbols.ids[name])
+        self.record("lexer states", len(next))
+        self.record("lexer character classes", len(next[0]))
+        return char_class, next, tokens
 
-    for terminal in terminals:
-        terms = (terminal,)
-        if terms in best_indices:
-            print_c("    [%s] = %d," %
-                    (terminal_name(terminal),
-                     best_indices[terms] >> best_shift),
+    def analyze(self):
+        self.analysis = analyze(self.symbols)
+        return self.analysis
+
+    def build_table(self):
+        self.parse_table = ll_table(self.symbols, self.analysis, self.warn)
+        return self.parse_table
+
+    def optimize(self):
+        self.optimized = optimize(self.symbols, self.parse_table, self.optimize_time, self.profile)
+        return self.optimized
+
+    def load_profile(self, file, name="<profile>"):
+        self.profile = read_profile(self.symbols, file, name)
+        return self.profile
+
+    #
+    # Build and optimize the parse table, or fetch them from the
+    # cache. The optimized layout isn't needed for the dense C table;
+    # when it is skipped, the cache entry is filled in by the next
+    # build which needs it
+    #
+
+    #
+    # Only the warnings from building the table are cached; those from
+    # loading the grammar are reported again each time it is loaded
+    #
+
+    def build(self, cache=None, optimize=True):
+        loaded = len(self.warnings)
+        if cache:
+            key = cache.key(self.symbols, self.ppsyms, self.optimize_time, self.profile)
+            entry = self.phase("cache", cache.get, key)
+            if entry:
+                self.parse_table, self.optimized, warnings = entry
+                for msg in warnings:
+                    self.warn(msg)
+                if self.optimized is None and optimize:
+                    self.phase("optimize", self.optimize)
+                    cache.put(key, (self.parse_table, self.optimized, warnings))
+                self.record_table_size()
+                return True
+        self.phase("analyze", self.analyze)
+        self.phase("table", self.build_table)
+        if optimize:
+            self.phase("optimize", self.optimize)
+        if cache:
+            cache.put(key, (self.parse_table, self.optimized, self.warnings[loaded:]))
+        self.record_table_size()
+        return False
+
+    #
+    # Run one phase of generating the parser, timing it with --stats
+    #
+
+    def phase(self, name, func, *args, **kwargs):
+        if self.stats is None:
+            return func(*args, **kwargs)
+        return self.stats.run(name, func, *args, **kwargs)
+
+    def record(self, name, value):
+        if self.stats is not None:
+            self.stats.size(name, value)
+
+    def record_table_size(self):
+        self.record("parse table entries", len(self.parse_table))
+        if self.optimized:
+            self.record("possible edges", self.optimized[2][0])
+
+    def warn(self, msg):
+        self.warnings.append(msg)
+        fprint(msg, file=sys.stderr)
+
+    def print_c(self, string, end='\n', file=None):
+        self.c_line += string.count("\n") + end.count("\n")
+        fprint(string, file=file, end=end)
+
+    #
+    # Choose the size of the entries indexing the production table
+    # for 'table', along with the shift applied to those indices.
+    # Byte entries are used when the padded indices fit, leaving room
+    # for the markers, otherwise the smallest wider entries holding
+    # every index unshifted
+    #
+
+    def table_entry_layout(self, table, prods):
+        sizes = [prod_size(prod) for prod in prods]
+        if table == 'compact':
+            if self.optimized is None:
+                self.optimize()
+            best_binding, best_table, edges, search = self.optimized
+            prod_shift = padded_shift(sizes, entry_max(1) - 2)
+            if prod_shift is not None and compact_table_shift(best_binding, best_table) is not None:
+                return 1, prod_shift
+            largest = max(sum(sizes[:-1]) + 2, sum(compact_chain_sizes(best_binding, best_table)))
+        else:
+            prod_shift = padded_shift(sizes, entry_max(1) - 1)
+            if prod_shift is not None:
+                return 1, prod_shift
+            largest = sum(sizes[:-1]) + 1
+        return entry_bytes(largest), 0
+
+    #
+    # Dump the compact table, where each terminal selects a chain of
+    # non-terminal table entries which are searched for a production
+    # of the desired non-terminal
+    #
+
+    def emit_compact_table(self, output, prod_map, prod_shift, entry_size, comment_names):
+        symbols = self.symbols
+        terminals = symbols.terminals()
+
+        if self.optimized is None:
+            self.optimize()
+        best_binding, best_table, edges, search = self.optimized
+
+        self.print_c("/*", file=output)
+        self.print_c(" * Possible graph edges %d total %d minimal" % edges, file=output)
+        if search:
+            examined, total, finished, first_cost, cost = search
+            self.print_c(" * Binding search measured %d of %d bindings%s" %
+                    (examined, total, "" if finished else " before running out of time"), file=output)
+            self.print_c(" * Table size %d -> %d, total chain length %d -> %d" %
+                    (first_cost[0], cost[0], first_cost[1], cost[1]), file=output)
+            if self.profile:
+                self.print_c(" * Profiled chain length %d -> %d" % (first_cost[2], cost[2]), file=output)
+        self.print_c(" */", file=output)
+
+        best_shift = 0
+        if entry_size == 1:
+            best_shift = compact_table_shift(best_binding, best_table)
+
+        best_round = 1 << best_shift
+
+        end = "0x%x" % entry_max(entry_size)
+        chain = "0x%x" % (entry_max(entry_size) - 1)
+
+        self.print_c("typedef %s non_terminal_entry_t;" % entry_types[entry_size], file=output)
+        self.print_c("#define NON_TERMINAL_CHAIN %s" % chain, file=output)
+        self.print_c("#define NON_TERMINAL_END %s" % end, file=output)
+        self.print_c("#define non_terminal_index(i) ((i) << %d)" % best_shift, file=output)
+
+        self.print_c("static CONST non_terminal_entry_t PARSE_TABLE_DECLARATION(non_terminal_table)[] = {", file=output)
+
+        #
+        # Dump the table mapping non-terminals to productions
+        #
+        # This table is indexed by the terminal table so that
+        # the entries need not include the terminal value as well
+        #
+
+        best_indices = {}
+        best_index = 0
+
+        for terms, prods in best_table.items():
+            best_indices[terms] = best_index
+
+            # Add a comment marking the start of the table
+            # entries for this terminal set
+
+            self.print_c("    /* %d: (%s) */" %
+                    (best_index, terminal_names(symbols, terms)),
                     file=output)
 
-    print_c("    [TOKEN_NONE] = %d," % (best_index >> best_shift), file=output)
-    print_c("};", file=output);
-    print_c("#endif /* GRAMMAR_TABLE */", file=output)
-    print_c("", file=output)
+            # Dump out production table indices
+            #
 
+            for prod_ent in prods:
+                non_terminal, prod = prod_ent
+                key = prod + (non_terminal,)
+                self.print_c("        %3d,     /* %18s:" %
+                        (prod_map[key] >> prod_shift,
+                         symbols.name(non_terminal)),
+                        end='', file=output)
+                for t in prod:
+                    self.print_c(" %s" % comment_names[t], end='', file=output)
+                self.print_c(" */", file=output)
+                best_index += 1
+
+            if terms in best_binding:
+                next_terms = best_binding[terms]
+                self.print_c("      %s, %3d, /* %s */" %
+                        (chain, best_indices[next_terms] >> best_shift,
+                         terminal_names(symbols, next_terms)),
+                        file=output)
+                best_index += 2
+            else:
+                self.print_c("      %s," % end, file=output)
+                best_index += 1
+
+            p = pad(best_index, best_round)
+            for i in range(p):
+                self.print_c("    %s," % end, file=output)
+                best_index += 1
+            self.print_c("", file=output)
+
+        self.print_c("};", file=output)
+        self.print_c("#define NON_TERMINAL_SIZE %d" % best_index, file=output)
+        self.record("NON_TERMINAL_SIZE", best_index)
+        self.record("terminal table bytes", (len(terminals) + 1) * entry_size)
+
+        #
+        # Dump the table mapping each terminal to a set of
+        # non-terminal/production bindings
+        #
+        # This table holds indices into the non-terminal table cooresponding
+        # to each terminal.
+        #
+
+        self.print_c("static CONST non_terminal_entry_t PARSE_TABLE_DECLARATION(terminal_table)[] = {", file=output)
+
+        for terminal in terminals:
+            terms = terminal_mask(terminal)
+            if terms in best_indices:
+                self.print_c("    [%s] = %d," %
+                        (terminal_name(symbols.name(terminal)),
+                         best_indices[terms] >> best_shift),
+                        file=output)
+
+        self.print_c("    [TOKEN_NONE] = %d," % (best_index >> best_shift), file=output)
+        self.print_c("};", file=output);
     #
-    # Dump a table of token names.
+    # Dump the dense table, indexed by terminal and non-terminal. Each
+    # entry holds a production table index, or DENSE_NONE when the
+    # non-terminal cannot start with the terminal
     #
-    # This is not usually included in the resulting program,
-    # but can be useful for debugging
+
+    def emit_dense_table(self, output, prod_map, prod_shift, entry_size):
+        symbols = self.symbols
+        terminals = symbols.terminals()
+        non_terminals = symbols.non_terminals()
+
+        none = "0x%x" % entry_max(entry_size)
+
+        self.print_c("typedef %s dense_entry_t;" % entry_types[entry_size], file=output)
+        self.print_c("#define DENSE_NONE %s" % none, file=output)
+        self.print_c("static CONST dense_entry_t PARSE_TABLE_DECLARATION(dense_table)[%d][%d] = {" %
+                (len(terminals), len(non_terminals)), file=output)
+        for terminal in terminals:
+            self.print_c("    /* %s */" % symbols.name(terminal), file=output)
+            self.print_c("    {", end='', file=output)
+            for i, non_terminal in enumerate(non_terminals):
+                if i and i % 16 == 0:
+                    self.print_c("", file=output)
+                    self.print_c("     ", end='', file=output)
+                key = (terminal, non_terminal)
+                if key in self.parse_table:
+                    index = prod_map[self.parse_table[key] + (non_terminal,)] >> prod_shift
+                    self.print_c(" %4d," % index, end='', file=output)
+                else:
+                    self.print_c(" %4s," % none, end='', file=output)
+            self.print_c(" },", file=output)
+        self.print_c("};", file=output)
+        self.print_c("#define DENSE_TABLE_SIZE %d" % (len(terminals) * len(non_terminals)), file=output)
+        self.record("dense table bytes", len(terminals) * len(non_terminals) * entry_size)
+
+    #
+    # Dump the row displacement tables, followed by a comparison of
+    # the sizes of each table layout
     #
 
-    print_c("#ifdef TOKEN_NAMES", file=output)
-    print_c("#undef TOKEN_NAMES", file=output)
-    print_c("#define token_name(a) token_names[a]", file=output);
-    print_c("static CONST char *CONST token_names[] = {", file=output)
-    print_c('    0,', file=output);
-    for terminal in terminals:
-        print_c('    "%s",' % (terminal), file=output)
-    for non_terminal in non_terminals:
-        print_c('    "%s",' % (non_terminal), file=output)
-    print_c("};", file=output)
-    print_c("#endif /* TOKEN_NAMES */", file=output)
-    print_c("", file=output)
+    def emit_comb_table(self, output, prod_map, prod_shift, entry_size, prods, prod_bytes):
+        symbols = self.symbols
+        terminals = symbols.terminals()
+        non_terminals = symbols.non_terminals()
+
+        rows = {}
+        for row in range(len(non_terminals)):
+            rows[row] = []
+        for (terminal, non_terminal), prod in self.parse_table.items():
+            row = non_terminal - symbols.first_non_terminal
+            rows[row].append((terminal, prod_map[prod + (non_terminal,)] >> prod_shift))
+
+        base, slots = comb_pack(rows)
+
+        lo = min(min(base.values()), 0)
+        hi = max(max(base.values()) + len(terminals), len(slots))
+        if -32768 <= lo and hi < 32768:
+            base_type, base_size = ("int16_t", 2)
+        else:
+            base_type, base_size = ("int32_t", 4)
+        if len(non_terminals) < 255:
+            check_type, check_size, check_none = ("uint8_t", 1, "0xff")
+        else:
+            check_type, check_size, check_none = ("uint16_t", 2, "0xffff")
+
+        self.print_c("typedef %s comb_base_t;" % base_type, file=output)
+        self.print_c("typedef %s comb_check_t;" % check_type, file=output)
+        self.print_c("typedef %s comb_next_t;" % entry_types[entry_size], file=output)
+        self.print_c("#define COMB_SIZE %d" % len(slots), file=output)
+
+        self.print_c("static CONST comb_base_t PARSE_TABLE_DECLARATION(comb_base)[%d] = {" % len(non_terminals), file=output)
+        for row in range(len(non_terminals)):
+            self.print_c("    %5d, /* %s */" % (base[row], symbols.name(non_terminals[row])), file=output)
+        self.print_c("};", file=output)
+
+        self.print_c("static CONST comb_check_t PARSE_TABLE_DECLARATION(comb_check)[COMB_SIZE] = {", file=output)
+        self.emit_c_values(output, [check_none if slot is None else "%d" % slot[0] for slot in slots])
+        self.print_c("};", file=output)
+
+        next_none = "0x%x" % entry_max(entry_size)
+        self.print_c("static CONST comb_next_t PARSE_TABLE_DECLARATION(comb_next)[COMB_SIZE] = {", file=output)
+        self.emit_c_values(output, [next_none if slot is None else "%d" % slot[1] for slot in slots])
+        self.print_c("};", file=output)
+
+        if self.optimized is None:
+            self.optimize()
+        best_binding, best_table, edges, search = self.optimized
+        compact_size, compact_shift = self.table_entry_layout('compact', prods)
+        if compact_size == 1:
+            non_terminal_bytes = compact_table_size(best_binding, best_table)
+        else:
+            non_terminal_bytes = sum(compact_chain_sizes(best_binding, best_table)) * compact_size
+        terminal_bytes = (len(terminals) + 1) * compact_size
+        dense_bytes = len(terminals) * len(non_terminals) * entry_size
+        comb_bytes = len(non_terminals) * base_size + len(slots) * (check_size + entry_size)
+        self.record("comb table bytes", comb_bytes)
+
+        self.print_c("/*", file=output)
+        self.print_c(" * Table sizes in bytes", file=output)
+        self.print_c(" *", file=output)
+        self.print_c(" *   production_table %8d" % prod_bytes, file=output)
+        self.print_c(" *   compact          %8d  (NON_TERMINAL_SIZE %d, terminal_table %d)" %
+                (non_terminal_bytes + terminal_bytes, non_terminal_bytes, terminal_bytes), file=output)
+        self.print_c(" *   comb             %8d  (comb_base %d, comb_check %d, comb_next %d)" %
+                (comb_bytes, len(non_terminals) * base_size, len(slots) * check_size, len(slots) * entry_size),
+                file=output)
+        self.print_c(" *   dense            %8d" % dense_bytes, file=output)
+        self.print_c(" */", file=output)
 
     #
-    # Dump the parsing code
+    # Dump the scanner. Accepting states hold the token value, or
+    # LEX_SKIP, one past the last terminal, for skipped text
     #
-    # This is the parse_code from above with
-    # all of the actions included at the right spot
+
+    def emit_c_lexer(self, output, scanner):
+        char_class, next, tokens = scanner
+        skip = self.symbols.first_non_terminal + 1
+
+        self.print_c("#ifdef LEX_CODE", file=output)
+        self.print_c("#undef LEX_CODE", file=output)
+        self.print_c("#ifndef PARSE_TABLE_DECLARATION", file=output)
+        self.print_c("#define PARSE_TABLE_DECLARATION(n) n", file=output)
+        self.print_c("#endif", file=output)
+        self.print_c("#ifndef LEX_TABLE_FETCH", file=output)
+        self.print_c("#define LEX_TABLE_FETCH(addr) (*(addr))", file=output)
+        self.print_c("#endif", file=output)
+        self.print_c("#define LEX_STATES %d" % len(next), file=output)
+        self.print_c("#define LEX_CLASSES %d" % len(next[0]), file=output)
+        self.print_c("#define LEX_SKIP %d" % skip, file=output)
+        self.print_c("typedef %s lex_state_t;" % ("uint8_t" if len(next) <= 256 else "uint16_t"), file=output)
+        self.print_c("typedef %s lex_accept_t;" % ("uint8_t" if skip < 256 else "uint16_t"), file=output)
+        self.print_c("typedef %s lex_class_t;" % ("uint8_t" if len(next[0]) <= 256 else "uint16_t"), file=output)
+
+        self.print_c("static CONST lex_class_t PARSE_TABLE_DECLARATION(lex_class)[256] = {", file=output)
+        self.emit_c_values(output, ["%d" % c for c in char_class[:256]])
+        self.print_c("};", file=output)
+
+        self.print_c("static CONST lex_state_t PARSE_TABLE_DECLARATION(lex_next)[LEX_STATES * LEX_CLASSES] = {", file=output)
+        for state, row in enumerate(next):
+            self.print_c("    /* %d */" % state, file=output)
+            self.emit_c_values(output, ["%d" % target for target in row])
+        self.print_c("};", file=output)
+
+        self.print_c("static CONST lex_accept_t PARSE_TABLE_DECLARATION(lex_accept)[LEX_STATES] = {", file=output)
+        for state, token in enumerate(tokens):
+            if token is None:
+                self.print_c("    0,", file=output)
+            elif token == lex_skip:
+                self.print_c("    LEX_SKIP,", file=output)
+            else:
+                self.print_c("    %s," % terminal_name(self.symbols.name(token)), file=output)
+        self.print_c("};", file=output)
+        self.print_c("%s" % lex_code, end='', file=output)
+        self.print_c("#endif /* LEX_CODE */", file=output)
+        self.print_c("", file=output)
+
+    def emit_c_values(self, output, values):
+        for i in range(0, len(values), 16):
+            self.print_c("    %s," % ", ".join("%4s" % v for v in values[i:i+16]), file=output)
+
+    def emit_c(self, file=sys.stdout, filename="<stdout>", table='compact'):
+        symbols = self.symbols
+        parse_table = self.parse_table
+        output=file
+        terminals = symbols.terminals()
+        num_terminals = len(terminals)
+        non_terminals = symbols.non_terminals()
+        num_non_terminals = len(non_terminals)
+        actions = self.phase("get_actions", get_actions, symbols)
+        num_actions = len(actions)
+        self.print_c("/* %d terminals %d non_terminals %d actions (%d duplicates) %d parse table entries */" %
+                (num_terminals, num_non_terminals, num_actions, count_actions(symbols) - num_actions, len(parse_table)), file=output)
+        self.print_c("", file=output)
+        self.print_c("#ifndef CONST", file=output)
+        self.print_c("#define CONST const", file=output)
+        self.print_c("#endif", file=output)
+        self.print_c("#if !defined(GRAMMAR_TABLE) && !defined(TOKEN_NAMES) && !defined(PARSE_CODE) && !defined(LEX_CODE)", file=output)
+        self.print_c("typedef enum {", file=output)
+        self.print_c("    TOKEN_NONE = 0,", file=output)
+        token_value = {}
+        value = 1
+        first_terminal = value
+        for terminal in terminals:
+            self.print_c("    %s = %d," % (terminal_name(symbols.name(terminal)), value), file=output)
+            value += 1
+        first_non_terminal = value
+        self.print_c("    FIRST_NON_TERMINAL = %d," % first_non_terminal, file=output)
+        for non_terminal in non_terminals:
+            self.print_c("    %s = %d," % (non_terminal_name(symbols.name(non_terminal)), value), file=output)
+            value += 1
+        self.print_c("    FIRST_ACTION = %d," % value, file=output)
+        for action in actions:
+            token_value[compress_action(action)] = value
+            self.print_c("    %s = %d, // %s" %
+                    (action_name(token_value, action), value, compress_action(action)), file=output)
+            value += 1
+        self.print_c("} __attribute__((packed)) token_t;", file=output)
+        self.print_c("#endif", file=output)
+
+        # C names for each symbol, and the names used in comments, which
+        # only differ for actions
+
+        c_names = []
+        comment_names = []
+        for id in range(len(symbols.names)):
+            c_names.append(token_name(token_value, symbols.name(id)))
+            if symbols.is_action(id):
+                comment_names.append(c_names[id])
+            else:
+                comment_names.append(symbols.name(id))
+
+        self.print_c("", file=output)
+        self.print_c("#ifdef GRAMMAR_TABLE", file=output)
+        self.print_c("#undef GRAMMAR_TABLE", file=output)
+
+        prod_map = {};
+
+        # Find the width of the table entries and the padding needed
+        # for the index of each production to fit in them
+
+        prods = []
+        prod_handled = set()
+        for key in parse_table:
+            prod = parse_table[key] + (key[1],)
+            if prod not in prod_handled:
+                prods.append(prod)
+                prod_handled.add(prod)
+
+        entry_size, prod_shift = self.table_entry_layout(table, prods)
+
+        prod_round = 1 << prod_shift
+
+        self.print_c("#ifndef PARSE_TABLE_DECLARATION", file=output)
+        self.print_c("#define PARSE_TABLE_DECLARATION(n) n", file=output)
+        self.print_c("#endif", file=output)
+
+        #
+        # Dump production table.
+        #
+        # This table contains all of the productions in the grammar.
+        # When the top of the parse stack is a non-terminal, the
+        # production matching that non-terminal and the current input
+        # token replaces the top of the parse stack.
+        #
+        # Each production is stored in reverse order so that the
+        # tokens can be simply pushed in order. The productions are
+        # terminated with TOKEN_NONE, and then padded to a multiple
+        # of a power of two tokens so that the index into this
+        # table can be stored in a single byte when there are few
+        # enough productions.
+        #
+
+        self.print_c("/*", file=output);
+        self.print_c(" * Parse table", file=output);
+        self.print_c(" *", file=output);
+        for key in parse_table:
+            terminal = key[0]
+            non_terminal = key[1]
+            self.print_c(" * %-12s, %-12s" % (symbols.name(terminal), symbols.name(non_terminal)), end='', file=output)
+            prod = parse_table[key]
+            if not prod:
+                self.print_c("()", end='', file=output)
+            for token in prod:
+                self.print_c(" %s," % comment_names[token], end='', file=output)
+            self.print_c("", file=output)
+        self.print_c(" */", file=output)
+
+        self.print_c("static CONST token_t PARSE_TABLE_DECLARATION(production_table)[] = {", file=output);
+
+        prod_index = 0
+        for key in parse_table:
+            prod = parse_table[key] + (key[1],)
+            if prod not in prod_map:
+                prod_map[prod] = prod_index
+
+                self.print_c("    /* %4d */   " % prod_index, end='', file=output)
+                for token in prod[::-1]:
+                    self.print_c(" %s," % c_names[token], end='', file=output)
+                    prod_index += 1
+
+                # Pad the production with TOKEN_NONE to
+                # allow a single byte to index this table
+                #
+                p = pad(prod_index + 1, prod_round)
+                for i in range(0,p):
+                    self.print_c(" TOKEN_NONE,", end='', file=output)
+                    prod_index += 1
+                self.print_c(" TOKEN_NONE,", file=output)
+                prod_index += 1
+
+        self.print_c("};", file=output)
+
+        if num_non_terminals < 255 and num_terminals < 255:
+            token_key_type = "uint8_t"
+        else:
+            token_key_type = "uint16_t"
+
+        self.print_c("typedef %s token_key_t;" % token_key_type, file=output)
+
+        self.print_c("#define production_index(i) ((i) << %d)" % prod_shift, file=output)
+
+        if value <= 256:
+            token_size = 1
+        else:
+            token_size = 2
+        self.record("production table bytes", prod_index * token_size)
+
+        if table == 'dense':
+            self.emit_dense_table(output, prod_map, prod_shift, entry_size)
+        elif table == 'comb':
+            self.emit_comb_table(output, prod_map, prod_shift, entry_size, prods, prod_index * token_size)
+        else:
+            self.emit_compact_table(output, prod_map, prod_shift, entry_size, comment_names)
+        self.print_c("#endif /* GRAMMAR_TABLE */", file=output)
+        self.print_c("", file=output)
+
+        #
+        # Dump a table of token names.
+        #
+        # This is not usually included in the resulting program,
+        # but can be useful for debugging
+        #
+
+        self.print_c("#ifdef TOKEN_NAMES", file=output)
+        self.print_c("#undef TOKEN_NAMES", file=output)
+        self.print_c("#define token_name(a) token_names[a]", file=output);
+        self.print_c("static CONST char *CONST token_names[] = {", file=output)
+        self.print_c('    0,', file=output);
+        for id in range(symbols.first_action):
+            self.print_c('    "%s",' % (symbols.name(id)), file=output)
+        self.print_c("};", file=output)
+        self.print_c("#endif /* TOKEN_NAMES */", file=output)
+        self.print_c("", file=output)
+
+        scanner = self.lex_scanner()
+        if scanner:
+            self.emit_c_lexer(output, scanner)
+
+        #
+        # Dump the parsing code
+        #
+        # This is the parse_code from above with
+        # all of the actions included at the right spot
+        #
+
+        self.print_c("#ifdef PARSE_CODE", file=output)
+        self.print_c("#undef PARSE_CODE", file=output)
+        if self.attributes:
+            self.print_c("#define PARSE_ATTRIBUTES", file=output)
+
+        #
+        # Names used when writing a parse profile; terminals and
+        # non-terminals use their grammar names so that the profile
+        # can be read back by lola
+        #
+
+        self.print_c("#ifdef PARSE_PROFILE", file=output)
+        self.print_c("#define PARSE_PROFILE_ACTIONS %d" % max(num_actions, 1), file=output)
+        self.print_c("static CONST char *CONST parse_profile_names[] = {", file=output)
+        self.print_c('    "TOKEN_NONE",', file=output)
+        for id in range(symbols.first_action):
+            self.print_c('    "%s",' % symbols.name(id), file=output)
+        for action in actions:
+            self.print_c('    "%s",' % action_name(token_value, action), file=output)
+        self.print_c("};", file=output)
+        self.print_c("#endif", file=output)
+
+        #
+        # The actions are spliced into both parse and parser_feed
+        #
+
+        code = parse_code.replace(match_state_marker, match_state_code[table])
+        bits = code.split(actions_marker)
+
+        self.print_c("%s" % bits[0], end='', file=output)
+        for bit in bits[1:]:
+            for action in actions:
+                self.print_c("    case %s:" % action_name(token_value, action), file=output)
+                self.print_c('#line %d "%s"' % (self.action_line(action), self.lex_file_name), file=output)
+                code = action_value(action)
+                if self.attributes:
+                    code = c_attributes(code)
+                self.print_c("        %s; break;" % code, file=output)
+
+            self.print_c('#line %d "%s"' % (self.c_line + 1, filename), file=output)
+            self.print_c("%s" % bit, end='', file=output)
+        self.print_c("#endif /* PARSE_CODE */", file=output)
+
+    def emit_python(self, file=sys.stdout):
+        dump_python(self.symbols, self.parse_table, file=file)
+        if self.attributes:
+            fprint('', file=file)
+            fprint('# Actions are passed the attribute stack', file=file)
+            fprint('ATTRIBUTES = True', file=file)
+        self.emit_python_lexer(file)
+        self.emit_python_actions(file)
+
+    def emit_python_direct(self, file=sys.stdout):
+        dump_python_direct(self.symbols, self.parse_table, file=file, attributes=self.attributes)
+        self.emit_python_lexer(file)
+        self.emit_python_actions(file)
+
+    #
+    # Dump the scanner tables used by lola_runtime.Lexer. lex_classes
+    # holds the class of each character, with one more entry for all
+    # characters past 255
     #
 
-    print_c("#ifdef PARSE_CODE", file=output)
-    print_c("#undef PARSE_CODE", file=output)
+    def emit_python_lexer(self, file):
+        scanner = self.lex_scanner()
+        if not scanner:
+            return
+        char_class, next, tokens = scanner
+        fprint('', file=file)
+        fprint('#', file=file)
+        fprint('# Scanner tables for lola_runtime.Lexer', file=file)
+        fprint('#', file=file)
+        fprint('', file=file)
+        fprint('LEX_SKIP = %d' % lex_skip, file=file)
+        fprint('', file=file)
+        fprint('lex_classes = (', file=file)
+        for i in range(0, len(char_class), 16):
+            fprint('    %s,' % ", ".join("%2d" % c for c in char_class[i:i+16]), file=file)
+        fprint(')', file=file)
+        fprint('', file=file)
+        fprint('lex_next = (', file=file)
+        for row in next:
+            fprint('    (%s),' % ", ".join("%d" % state for state in row), file=file)
+        fprint(')', file=file)
+        fprint('', file=file)
+        fprint('lex_accept = (', file=file)
+        for state, token in enumerate(tokens):
+            if token is None or token == lex_skip:
+                fprint('    %r,' % token, file=file)
+            else:
+                fprint('    %d,    # %s' % (token, self.symbols.name(token)), file=file)
+        fprint(')', file=file)
 
-    actions_loc = parse_code.find(actions_marker)
+    #
+    # Dump the python code for actions. The functions are compiled in
+    # a copy of the namespace passed to bind_actions so that, like C
+    # actions spliced into parse(), they can use the globals of the
+    # program running the parser, without adding the functions to that
+    # namespace. Each function is compiled separately, with
+    # its line numbers moved to those of the action in the grammar so
+    # that tracebacks point at the right place. With --attributes,
+    # each function is passed the attribute stack
+    #
 
-    first_bit = parse_code[:actions_loc]
-    last_bit = parse_code[actions_loc + len(actions_marker):]
+    def emit_python_actions(self, file):
+        symbols = self.symbols
+        codes = python_codes(symbols)
+        sources = []
+        functions = []
+        parameters = "attrs" if self.attributes else ""
+        for id in range(symbols.first_action, len(symbols.names)):
+            if codes[id] != id:
+                continue
+            action = symbols.name(id)
+            skipped, body = python_action_body(action)
+            if not body:
+                continue
+            function = "parse_action_%d" % id
+            lines = ["def %s(%s):" % (function, parameters)]
+            for line in body:
+                if self.attributes:
+                    line = python_attributes(line)
+                lines.append("    " + line)
+            sources.append((self.action_line(action) + skipped - 1, "\n".join(lines) + "\n"))
+            functions.append((python_action_name(action, id), function))
+        if not functions:
+            return
+        fprint('', file=file)
+        fprint('#', file=file)
+        fprint('# Actions from the grammar', file=file)
+        fprint('#', file=file)
+        fprint('', file=file)
+        fprint('import ast', file=file)
+        fprint('', file=file)
+        fprint('# Line of each function in the grammar and its source', file=file)
+        fprint('action_source = (', file=file)
+        for line, source in sources:
+            fprint('    (%d, %r),' % (line, source), file=file)
+        fprint(')', file=file)
+        fprint('', file=file)
+        fprint('action_functions = {', file=file)
+        for name, function in functions:
+            fprint('    %s: %r,' % (name, function), file=file)
+        fprint('}', file=file)
+        fprint('', file=file)
+        fprint('def bind_actions(namespace):', file=file)
+        fprint('    namespace = dict(namespace)', file=file)
+        fprint('    for line, source in action_source:', file=file)
+        fprint('        tree = ast.parse(source, %r)' % self.lex_file_name, file=file)
+        fprint('        ast.increment_lineno(tree, line - 1)', file=file)
+        fprint('        exec(compile(tree, %r, "exec"), namespace)' % self.lex_file_name, file=file)
+        fprint('    actions = {}', file=file)
+        fprint('    for action, function in action_functions.items():', file=file)
+        fprint('        actions[action] = namespace[function]', file=file)
+        fprint('    return actions', file=file)
 
-    print_c("%s" % first_bit, end='', file=output)
-    for action in actions:
-        print_c("    case %s:" % action_name(token_value, action), file=output)
-        print_c('#line %d "%s"' % (action_line(action), lex_file_name), file=output)
-        print_c("        %s; break;" % action_value(action), file=output)
+#
+# Generate one parser. Returns the time taken and any error message
+# so that this can be run in a worker process
+#
 
-    print_c('#line %d "%s"' % (c_line + 1, filename), file=output)
-    print_c("%s" % last_bit, end='', file=output)
-    print_c("#endif /* PARSE_CODE */", file=output)
+def compile_grammar(input, output, format, defines, cache=None, table='compact', optimize_time=None, profile=None,
+                    stats=False, attributes=False, left_factor=False, left_recursion=False):
+    start = time.perf_counter()
+    stats = Stats() if stats else None
+    try:
+        lola = Lola(defines, optimize_time, stats, attributes, left_factor, left_recursion)
+        with open(input, 'r') as lex_file:
+            lola.phase("load", lola.load, lex_file, input)
+        if profile:
+            with open(profile, 'r') as profile_file:
+                lola.phase("profile", lola.load_profile, profile_file, profile)
+        lola.build(cache, optimize=(format == 'c' and table != 'dense'))
+        if output:
+            outputname = output
+            file = open(output, 'w')
+        else:
+            outputname = "<stdout>"
+            file = sys.stdout
+        try:
+            if format == 'c':
+                lola.phase("output", lola.emit_c, file=file, filename=outputname, table=table)
+            elif format == 'python':
+                lola.phase("output", lola.emit_python, file=file)
+            elif format == 'python-direct':
+                lola.phase("output", lola.emit_python_direct, file=file)
+        finally:
+            if file is not sys.stdout:
+                file.close()
+    except (LolaError, OSError) as e:
+        return (time.perf_counter() - start, str(e))
+    finally:
+        if stats:
+            stats.close()
+    if stats:
+        stats.report(input)
+    return (time.perf_counter() - start, None)
+
+output_suffix = { 'c': '.h', 'python': '.py', 'python-direct': '.py' }
 
-def main():
-    global lex_file
-    global lex_file_name
+#
+# In batch mode, each input is either 'grammar' or 'grammar=output'.
+# Without an explicit output, the output name is the grammar name with
+# the suffix replaced by .h or .py
+#
+
+def batch_output(input, format):
+    if '=' in input:
+        return tuple(input.split('=', 1))
+    base, ext = os.path.splitext(input)
+    return (input, base + output_suffix[format])
+
+#
+# A manifest lists one grammar per line:
+#
+#   grammar [output [format]]
+#
+# Blank lines and lines starting with '#' are ignored
+#
+
+def read_manifest(name, format):
+    jobs = []
+    with open(name, 'r') as f:
+        for line in f:
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+            input = words[0]
+            job_format = format
+            if len(words) > 2:
+                job_format = words[2]
+                if job_format not in output_suffix:
+                    error("%s: invalid output format %r" % (name, job_format))
+            if len(words) > 1:
+                output = words[1]
+            else:
+                output = batch_output(input, job_format)[1]
+            jobs.append((input, output, job_format))
+    return jobs
 
+#
+# Generate many parsers, using a pool of worker processes when more
+# than one job is requested. Reports the time taken for each grammar
+# and returns the number of failures
+#
+
+def compile_batch(jobs, defines, max_jobs, cache, **options):
+    results = []
+    if max_jobs > 1 and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_jobs) as pool:
+            futures = []
+            for input, output, format in jobs:
+                futures.append(pool.submit(compile_grammar, input, output, format, defines, cache, **options))
+            for (input, output, format), future in zip(jobs, futures):
+                results.append((input, output) + future.result())
+    else:
+        for input, output, format in jobs:
+            results.append((input, output) + compile_grammar(input, output, format, defines, cache, **options))
+
+    failed = 0
+    total = 0
+    for input, output, seconds, message in results:
+        total += seconds
+        if message:
+            fprint(message, file=sys.stderr)
+            fprint("lola: %s failed" % input, file=sys.stderr)
+            failed += 1
+        else:
+            fprint("lola: %s -> %s %.3fs" % (input, output, seconds), file=sys.stderr)
+    fprint("lola: %d grammars %.3fs" % (len(results), total), file=sys.stderr)
+    return failed
+
+def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("input", help="Grammar input file")
+    parser.add_argument("input", nargs='*', help="Grammar input file(s); in batch mode 'grammar=output' names the output")
     parser.add_argument("-o", "--output", help="Parser data output file")
-    parser.add_argument("-f", "--format", help="Parser output format (c, python)")
+    parser.add_argument("-f", "--format", help="Parser output format (c, python, python-direct)")
+    parser.add_argument("-t", "--table", choices=table_formats, default='compact', help="C parse table layout")
+    parser.add_argument("--optimize-time", type=float, metavar="SECONDS",
+                        help="Search for the smallest compact table for up to SECONDS")
+    parser.add_argument("--profile", metavar="FILE", help="Order the compact table using parse profile FILE")
     parser.add_argument("-D", "--define", action='append', help="Define pre-processor symbol")
-    parser.add_argument("-V", "--version", action='version', version='%(prog)s 1.8')
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of grammars to process in parallel")
+    parser.add_argument("-m", "--manifest", help="File listing grammars to process")
+    parser.add_argument("--cache", action='store_true', help="Reuse parse tables saved in %s" % default_cache_dir())
+    parser.add_argument("--cache-dir", help="Reuse parse tables saved in CACHE_DIR")
+    parser.add_argument("--no-cache", action='store_true', help="Don't use the parse table cache")
+    parser.add_argument("--stats", action='store_true', help="Print time and memory used by each phase, and table sizes")
+    parser.add_argument("--attributes", action='store_true', help="Give each symbol a value, used as $1..$n in actions")
+    parser.add_argument("--left-factor", action='store_true', help="Factor common prefixes out of productions")
+    parser.add_argument("--left-recursion", action='store_true', help="Rewrite left-recursive productions as repeated tails")
+    parser.add_argument("-V", "--version", action='version', version='%(prog)s ' + version)
     args = parser.parse_args()
-    if args.define:
-        for name in args.define:
-            define_pp(name)
-    lex_file = open(args.input, 'r')
-    lex_file_name = args.input
-    output = sys.stdout
-    outputname = "<stdout>"
     format = 'c'
     if not args.format or args.format == 'c':
         format='c'
-    elif args.format == 'python':
-        format='python'
+    elif args.format == 'python' or args.format == 'python-direct':
+        format=args.format
     else:
-        error("Invalid output format %r" % args.format)
-    grammar = lola()
-    parse_table = ll(grammar)
+        fprint("Invalid output format %r" % args.format, file=sys.stderr)
+        exit(1)
+    defines = tuple(args.define or ())
+    cache = None
+    if (args.cache or args.cache_dir) and not args.no_cache:
+        cache = TableCache(args.cache_dir)
+
+    if not args.manifest and len(args.input) == 1 and '=' not in args.input[0]:
+        seconds, message = compile_grammar(args.input[0], args.output, format, defines, cache,
+                                           table=args.table, optimize_time=args.optimize_time,
+                                           profile=args.profile, stats=args.stats, attributes=args.attributes,
+                                           left_factor=args.left_factor, left_recursion=args.left_recursion)
+        if message:
+            fprint(message, file=sys.stderr)
+            exit(1)
+        return
+
     if args.output:
-        outputname = args.output
-        output = open(args.output, 'w')
-    if format == 'c':
-        dump_c(grammar, parse_table, file=output, filename=outputname)
-    elif format == 'python':
-        dump_python(grammar, parse_table, file=output)
-main()
+        parser.error("--output cannot be used with more than one grammar")
+    if not args.input and not args.manifest:
+        parser.error("no grammar specified")
+    try:
+        jobs = []
+        if args.manifest:
+            jobs += read_manifest(args.manifest, format)
+        for input in args.input:
+            jobs.append(batch_output(input, format) + (format,))
+    except (LolaError, OSError) as e:
+        fprint(str(e), file=sys.stderr)
+        exit(1)
+    if compile_batch(jobs, defines, max(args.jobs, 1), cache,
+                     table=args.table, optimize_time=args.optimize_time, profile=args.profile,
+                     stats=args.stats, attributes=args.attributes, left_factor=args.left_factor,
+                     left_recursion=args.left_recursion):
+        exit(1)
+
+if __name__ == "__main__":
+    main()
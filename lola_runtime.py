@@ -0,0 +1,258 @@
+#
+# Copyright © 2019 Keith Packard <keithp@keithp.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin St, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+
+#
+# Runtime support for parsers generated by lola --format=python
+#
+# The generated module holds integer codes for each token, with
+# terminals first, then non-terminals and finally actions:
+#
+#   END, ...             terminal codes, END is always 0
+#   FIRST_NON_TERMINAL   code of the first non-terminal
+#   FIRST_ACTION         code of the first action
+#   START                code of the start non-terminal
+#   ACTION_...           action codes
+#   token_names          name of each code
+#   parse_rows           for each non-terminal code, a dict mapping
+#                        lookahead terminal codes to the production,
+#                        stored in reverse so that it can be pushed
+#                        directly on to the parse stack. Terminal and
+#                        action codes hold None
+#
+# LLParser drives the parse using those tables. The parse stack is a
+# list with the top at the end, so each step takes time proportional
+# to the length of the production, not the depth of the stack.
+#
+# Programs which receive tokens a few at a time can use the push
+# interface instead: init returns a ParseState which the caller keeps,
+# feed hands it one token and returns MORE once that token has been
+# matched, finish supplies END and returns ACCEPT. A grammar which
+# matches END itself is accepted as soon as END is matched. Errors
+# raise ParseError, as they do from parse.
+#
+# Modules generated with --attributes also keep an attribute stack, a
+# list holding a value for each symbol being parsed. Each terminal
+# matched pushes the result of calling 'value', or the value passed
+# to feed, and each action is called with the list. parse returns
+# the value of the start symbol; with the push interface, it is left
+# in state.attrs[0].
+#
+
+MORE = 0
+ACCEPT = 1
+
+class ParseError(Exception):
+    def __init__(self, msg, token=None, expected=None):
+        super().__init__(msg)
+        self.token = token
+        self.expected = expected
+
+class ParseState:
+    def __init__(self, start, attributes=False):
+        self.stack = [start]
+        self.attrs = [] if attributes else None
+
+class LLParser:
+    def __init__(self, tables, actions=None, value=None):
+        self.tables = tables
+        self.rows = tables.parse_rows
+        self.start = tables.START
+        self.end = tables.END
+        self.first_non_terminal = tables.FIRST_NON_TERMINAL
+        self.first_action = tables.FIRST_ACTION
+        self.token_names = tables.token_names
+        if actions is None:
+            actions = {}
+        self.actions = actions
+        self.attributes = getattr(tables, 'ATTRIBUTES', False)
+        self.value = value
+
+    def name(self, token):
+        return self.token_names[token]
+
+    #
+    # Parse the tokens returned by 'lex', which is called with no
+    # arguments and must return terminal codes, ending with END.
+    # Each action popped from the parse stack is looked up in
+    # 'actions' and called, with no arguments unless the grammar
+    # has attributes
+    #
+
+    def parse(self, lex):
+        rows = self.rows
+        actions = self.actions
+        first_non_terminal = self.first_non_terminal
+        first_action = self.first_action
+        stack = [self.start]
+        pop = stack.pop
+        extend = stack.extend
+        attrs = [] if self.attributes else None
+        value = self.value
+        token = None
+        while stack:
+            top = pop()
+
+            if top >= first_action:
+                action = actions.get(top)
+                if action:
+                    if attrs is None:
+                        action()
+                    else:
+                        action(attrs)
+                continue
+
+            if token is None:
+                token = lex()
+
+            if top < first_non_terminal:
+                if top != token:
+                    raise ParseError("parse error. got %s expected %s" % (self.name(token), self.name(top)),
+                                     token, top)
+                token = None
+                if attrs is not None:
+                    attrs.append(value() if value else None)
+            else:
+                production = rows[top].get(token)
+                if production is None:
+                    raise ParseError("parse error at %s %s" % (self.name(token), self.name(top)),
+                                     token, top)
+                extend(production)
+                if attrs is not None:
+                    attrs.append(None)
+
+        if token is None:
+            token = lex()
+        if token != self.end:
+            raise ParseError("parse stack empty at %s" % self.name(token), token)
+        if attrs:
+            return attrs[0]
+        return None
+
+    def init(self):
+        return ParseState(self.start, self.attributes)
+
+    def feed(self, state, token, value=None):
+        rows = self.rows
+        actions = self.actions
+        first_non_terminal = self.first_non_terminal
+        first_action = self.first_action
+        stack = state.stack
+        pop = stack.pop
+        extend = stack.extend
+        attrs = state.attrs
+        matched_end = False
+        while stack:
+            top = pop()
+
+            if top >= first_action:
+                action = actions.get(top)
+                if action:
+                    if attrs is None:
+                        action()
+                    else:
+                        action(attrs)
+                continue
+
+            if token is None:
+                stack.append(top)
+                return MORE
+
+            if top < first_non_terminal:
+                if top != token:
+                    raise ParseError("parse error. got %s expected %s" % (self.name(token), self.name(top)),
+                                     token, top)
+                matched_end = token == self.end
+                token = None
+                if attrs is not None:
+                    attrs.append(value)
+            else:
+                production = rows[top].get(token)
+                if production is None:
+                    raise ParseError("parse error at %s %s" % (self.name(token), self.name(top)),
+                                     token, top)
+                extend(production)
+                if attrs is not None:
+                    attrs.append(None)
+
+        if token is None:
+            return ACCEPT if matched_end else MORE
+        if token != self.end:
+            raise ParseError("parse stack empty at %s" % self.name(token), token)
+        return ACCEPT
+
+    def finish(self, state):
+        return self.feed(state, self.end)
+
+class LexError(ParseError):
+    pass
+
+#
+# Scanner for modules generated from grammars with terminal
+# definitions. The module holds a DFA: lex_classes maps each
+# character to a column of lex_next, which holds the next state for
+# each state and column. State 0 is the dead state and scanning
+# starts in state 1. lex_accept holds the token matched in each state,
+# LEX_SKIP for text which is skipped, or None.
+#
+# The scanner takes the longest match. Each call to lex returns the
+# next token code, leaving the matched text in 'value', and returns
+# END once the text is used up
+#
+
+class Lexer:
+    def __init__(self, tables, text=""):
+        self.classes = tables.lex_classes
+        self.next = tables.lex_next
+        self.accept = tables.lex_accept
+        self.skip = tables.LEX_SKIP
+        self.end = tables.END
+        self.text = text
+        self.pos = 0
+        self.value = None
+
+    def lex(self):
+        text = self.text
+        length = len(text)
+        classes = self.classes
+        other = classes[-1]
+        next = self.next
+        accept = self.accept
+        while True:
+            start = self.pos
+            if start >= length:
+                self.value = ""
+                return self.end
+            state = 1
+            pos = start
+            token = None
+            token_end = start
+            while pos < length:
+                c = ord(text[pos])
+                state = next[state][classes[c] if c < 256 else other]
+                if not state:
+                    break
+                pos += 1
+                if accept[state] is not None:
+                    token = accept[state]
+                    token_end = pos
+            if token is None:
+                raise LexError("invalid input %r at offset %d" % (text[start:start+10], start))
+            self.pos = token_end
+            if token != self.skip:
+                self.value = text[start:token_end]
+                return token
@@ -18,6 +18,9 @@
 #
 
 import sys
+import lola_runtime
+import pycalc_gram
+from pycalc_gram import *
 
 lex_c = False
 
@@ -41,21 +44,21 @@ def lex():
     while True:
         c = getc()
         if c == '':
-            return 'END'
+            return END
         if c == '+':
-            return "PLUS"
+            return PLUS
         if c == '-':
-            return "MINUS"
+            return MINUS
         if c == '*':
-            return "TIMES"
+            return TIMES
         if c == '/':
-            return "DIVIDE"
+            return DIVIDE
         if c == '(':
-            return "OP"
+            return OP
         if c == ')':
-            return "CP"
+            return CP
         if c == '\n':
-            return "NL"
+            return NL
         if '0' <= c and c <= '9':
             v = ord(c) - ord('0')
             while True:
@@ -66,25 +69,7 @@ def lex():
                     ungetc(c)
                     break;
             lex_value = v
-            return "NUMBER"
-
-value_stack = ()
-
-def head(s):
-    return s[0]
-
-def rest(s):
-    return s[1:]
-
-def push(v):
-    global value_stack
-    value_stack = (v,) + value_stack
-
-def pop():
-    global value_stack
-    v = head(value_stack)
-    value_stack = rest(value_stack)
-    return v
+            return NUMBER
 
 #
 # lines : line lines
@@ -99,74 +84,15 @@ def pop():
 #       | MINUS expr
 #       |
 
-from pycalc_gram import *
-
-def is_non_terminal(item):
-    return item[0].islower()
-
-def is_terminal(item):
-    return item[0].isupper()
-
-def is_action(item):
-    return item[0] == '@'
-
 def error(msg):
     print(msg)
     exit(1)
 
 def test():
-    global lex_value
-    global value_stack
-    global parse_table
-    table = parse_table
-    stack = ('start',)
-    token = False
-    while True:
-        if stack:
-            top = head(stack)
-            stack = rest(stack)
-        else:
-            top = False
-
-        if top and is_action(top):
-            if top == "@PUSH":
-                push(lex_value)
-            elif top == "@ADD":
-                push(pop() + pop())
-            elif top == "@SUBTRACT":
-                a = pop()
-                b = pop()
-                push(b - a)
-            elif top == "@TIMES":
-                push(pop() * pop())
-            elif top == "@DIVIDE":
-                a = pop()
-                b = pop()
-                push(b / a)
-            elif top == "@NEGATE":
-                a = pop()
-                push(-a)
-            elif top == "@PRINT":
-                print("= %r" % pop())
-            continue
-
-        if not token:
-            token = lex()
-
-        if not top:
-            if token == 'END':
-                return
-            error("parse stack empty at %r" % token)
+    parser = lola_runtime.LLParser(pycalc_gram, pycalc_gram.bind_actions(globals()), lambda: lex_value)
+    try:
+        parser.parse(lex)
+    except lola_runtime.ParseError as e:
+        error(str(e))
 
-        if is_terminal(top):
-            if top == token:
-                token = False
-            else:
-                error("parse error. got %r expected %r" % (token, top))
-        else:
-            key = (token, top)
-            if key not in table:
-                error("parse error at %r %r" % (token, top))
-            stack = table[key] + stack
-        
 test()
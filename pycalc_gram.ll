@@ -19,22 +19,18 @@
 start	: line start
 	|
 	;
-line	: expr @PRINT@ NL
+line	: expr @PRINT print("= %r" % $1)@ NL
 	| NL
 	;
-expr	: term expr-p
+expr	: expr PLUS term @ADD $$ = $1 + $3@
+	| expr MINUS term @SUBTRACT $$ = $1 - $3@
+	| term
 	;
-expr-p	: PLUS term @ADD@ expr-p
-	| MINUS term @SUBTRACT@ expr-p
-	|
-	;
-term	: fact term-p
-	;
-term-p	: TIMES fact @TIMES@ term-p
-	| DIVIDE fact @DIVIDE@ term-p
-	|
+term	: term TIMES fact @TIMES $$ = $1 * $3@
+	| term DIVIDE fact @DIVIDE $$ = $1 / $3@
+	| fact
 	;
-fact	: OP expr CP
-	| MINUS fact @NEGATE@
-	| NUMBER @PUSH@
+fact	: OP expr CP @PAREN $$ = $2@
+	| MINUS fact @NEGATE $$ = -$2@
+	| NUMBER
 	;
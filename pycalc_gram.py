@@ -0,0 +1,230 @@
+parse_table = \
+{   ('CP', 'expr-p'): (),
+    ('CP', 'term-p'): (),
+    ('DIVIDE', 'term-p'): (   'DIVIDE',
+                              'fact',
+                              '@DIVIDE $[4] = $[4] / $[1]',
+                              '@ATTR_POP_3 $pop(3)',
+                              'term-p'),
+    ('END', 'start'): (),
+    ('MINUS', 'expr'): (   'term',
+                           'expr-p',
+                           '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('MINUS', 'expr-p'): (   'MINUS',
+                             'term',
+                             '@SUBTRACT $[4] = $[4] - $[1]',
+                             '@ATTR_POP_3 $pop(3)',
+                             'expr-p'),
+    ('MINUS', 'fact'): (   'MINUS',
+                           'fact',
+                           '@NEGATE $[3] = -$[1]',
+                           '@ATTR_POP_2 $pop(2)'),
+    ('MINUS', 'line'): (   'expr',
+                           '@PRINT print("= %r" % $[1])',
+                           'NL',
+                           '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('MINUS', 'start'): ('line', '@ATTR_POP_2 $pop(2)', 'start'),
+    ('MINUS', 'term'): (   'fact',
+                           'term-p',
+                           '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('MINUS', 'term-p'): (),
+    ('NL', 'expr-p'): (),
+    ('NL', 'line'): ('NL', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('NL', 'start'): ('line', '@ATTR_POP_2 $pop(2)', 'start'),
+    ('NL', 'term-p'): (),
+    ('NUMBER', 'expr'): (   'term',
+                            'expr-p',
+                            '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('NUMBER', 'fact'): ('NUMBER', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('NUMBER', 'line'): (   'expr',
+                            '@PRINT print("= %r" % $[1])',
+                            'NL',
+                            '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('NUMBER', 'start'): ('line', '@ATTR_POP_2 $pop(2)', 'start'),
+    ('NUMBER', 'term'): (   'fact',
+                            'term-p',
+                            '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OP', 'expr'): ('term', 'expr-p', '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OP', 'fact'): (   'OP',
+                        'expr',
+                        'CP',
+                        '@PAREN $[4] = $[2]',
+                        '@ATTR_POP_3 $pop(3)'),
+    ('OP', 'line'): (   'expr',
+                        '@PRINT print("= %r" % $[1])',
+                        'NL',
+                        '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OP', 'start'): ('line', '@ATTR_POP_2 $pop(2)', 'start'),
+    ('OP', 'term'): ('fact', 'term-p', '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('PLUS', 'expr-p'): (   'PLUS',
+                            'term',
+                            '@ADD $[4] = $[4] + $[1]',
+                            '@ATTR_POP_3 $pop(3)',
+                            'expr-p'),
+    ('PLUS', 'term-p'): (),
+    ('TIMES', 'term-p'): (   'TIMES',
+                             'fact',
+                             '@TIMES $[4] = $[4] * $[1]',
+                             '@ATTR_POP_3 $pop(3)',
+                             'term-p')}
+
+#
+# Token codes and parse rows for lola_runtime.LLParser
+#
+
+END = 0
+NL = 1
+PLUS = 2
+MINUS = 3
+TIMES = 4
+DIVIDE = 5
+OP = 6
+CP = 7
+NUMBER = 8
+FIRST_NON_TERMINAL = 9
+FIRST_ACTION = 16
+START = 9
+ACTION_ATTR_POP_2 = 16
+ACTION_PRINT = 17
+ACTION_ATTR_COPY_POP_2 = 18
+ACTION_ATTR_COPY_POP_1 = 19
+ACTION_ADD = 20
+ACTION_ATTR_POP_3 = 21
+ACTION_SUBTRACT = 22
+ACTION_TIMES = 23
+ACTION_DIVIDE = 24
+ACTION_PAREN = 25
+ACTION_NEGATE = 26
+
+token_names = (
+    'END',
+    'NL',
+    'PLUS',
+    'MINUS',
+    'TIMES',
+    'DIVIDE',
+    'OP',
+    'CP',
+    'NUMBER',
+    'start',
+    'line',
+    'expr',
+    'expr-p',
+    'term',
+    'term-p',
+    'fact',
+    '@ATTR_POP_2 $pop(2)',
+    '@PRINT print("= %r" % $[1])',
+    '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)',
+    '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)',
+    '@ADD $[4] = $[4] + $[1]',
+    '@ATTR_POP_3 $pop(3)',
+    '@SUBTRACT $[4] = $[4] - $[1]',
+    '@TIMES $[4] = $[4] * $[1]',
+    '@DIVIDE $[4] = $[4] / $[1]',
+    '@PAREN $[4] = $[2]',
+    '@NEGATE $[3] = -$[1]',
+)
+
+parse_rows = (
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    {   # start
+        0: (),
+        1: (9, 16, 10),
+        3: (9, 16, 10),
+        6: (9, 16, 10),
+        8: (9, 16, 10),
+    },
+    {   # line
+        1: (19, 1),
+        3: (18, 1, 17, 11),
+        6: (18, 1, 17, 11),
+        8: (18, 1, 17, 11),
+    },
+    {   # expr
+        3: (18, 12, 13),
+        6: (18, 12, 13),
+        8: (18, 12, 13),
+    },
+    {   # expr-p
+        1: (),
+        2: (12, 21, 20, 13, 2),
+        3: (12, 21, 22, 13, 3),
+        7: (),
+    },
+    {   # term
+        3: (18, 14, 15),
+        6: (18, 14, 15),
+        8: (18, 14, 15),
+    },
+    {   # term-p
+        1: (),
+        2: (),
+        3: (),
+        4: (14, 21, 23, 15, 4),
+        5: (14, 21, 24, 15, 5),
+        7: (),
+    },
+    {   # fact
+        3: (16, 26, 15, 3),
+        6: (21, 25, 7, 11, 6),
+        8: (19, 8),
+    },
+)
+
+# Actions are passed the attribute stack
+ATTRIBUTES = True
+
+#
+# Actions from the grammar
+#
+
+import ast
+
+# Line of each function in the grammar and its source
+action_source = (
+    (18, 'def parse_action_16(attrs):\n    del attrs[-2:]\n'),
+    (21, 'def parse_action_17(attrs):\n    print("= %r" % attrs[-1])\n'),
+    (21, 'def parse_action_18(attrs):\n    attrs[-3] = attrs[-2]; del attrs[-2:]\n'),
+    (21, 'def parse_action_19(attrs):\n    attrs[-2] = attrs[-1]; del attrs[-1:]\n'),
+    (24, 'def parse_action_20(attrs):\n    attrs[-4] = attrs[-4] + attrs[-1]\n'),
+    (0, 'def parse_action_21(attrs):\n    del attrs[-3:]\n'),
+    (25, 'def parse_action_22(attrs):\n    attrs[-4] = attrs[-4] - attrs[-1]\n'),
+    (28, 'def parse_action_23(attrs):\n    attrs[-4] = attrs[-4] * attrs[-1]\n'),
+    (29, 'def parse_action_24(attrs):\n    attrs[-4] = attrs[-4] / attrs[-1]\n'),
+    (32, 'def parse_action_25(attrs):\n    attrs[-4] = attrs[-2]\n'),
+    (33, 'def parse_action_26(attrs):\n    attrs[-3] = -attrs[-1]\n'),
+)
+
+action_functions = {
+    ACTION_ATTR_POP_2: 'parse_action_16',
+    ACTION_PRINT: 'parse_action_17',
+    ACTION_ATTR_COPY_POP_2: 'parse_action_18',
+    ACTION_ATTR_COPY_POP_1: 'parse_action_19',
+    ACTION_ADD: 'parse_action_20',
+    ACTION_ATTR_POP_3: 'parse_action_21',
+    ACTION_SUBTRACT: 'parse_action_22',
+    ACTION_TIMES: 'parse_action_23',
+    ACTION_DIVIDE: 'parse_action_24',
+    ACTION_PAREN: 'parse_action_25',
+    ACTION_NEGATE: 'parse_action_26',
+}
+
+def bind_actions(namespace):
+    namespace = dict(namespace)
+    for line, source in action_source:
+        tree = ast.parse(source, 'pycalc_gram.ll')
+        ast.increment_lineno(tree, line - 1)
+        exec(compile(tree, 'pycalc_gram.ll', "exec"), namespace)
+    actions = {}
+    for action, function in action_functions.items():
+        actions[action] = namespace[function]
+    return actions
@@ -18,6 +18,9 @@
 #
 
 import sys
+import lola_runtime
+import pyjson_gram
+from pyjson_gram import *
 
 lex_c = False
 
@@ -41,19 +44,19 @@ def lex():
     while True:
         c = getc()
         if c == '':
-            return 'END'
+            return END
         if c == '{':
-            return "OC"
+            return OC
         if c == '}':
-            return "CC"
+            return CC
         if c == ',':
-            return "COMMA"
+            return COMMA
         if c == ':':
-            return "COLON"
+            return COLON
         if c == '[':
-            return "OS"
+            return OS
         if c == ']':
-            return "CS"
+            return CS
         if c == '\n' or c == ' ' or c == '\t':
             continue
         if '0' <= c and c <= '9':
@@ -66,7 +69,7 @@ def lex():
                     ungetc(c)
                     break;
             lex_value = v
-            return "NUMBER"
+            return NUMBER
         if c == '"':
             v = ''
             while True:
@@ -87,7 +90,7 @@ def lex():
                         c = '\t'
                 v += c
             lex_value = v
-            return "STRING"
+            return STRING
         v = c
         if 'a' <= c and c <= 'z':
             while True:
@@ -98,32 +101,14 @@ def lex():
                     ungetc(c)
                     break;
             if v == 'true':
-                return "TRUE"
+                return TRUE
             if v == 'false':
-                return "FALSE"
+                return FALSE
             if v == 'null':
-                return "NULL"
+                return NULL
         print('Invalid token %s. Skipped' % v)
             
 
-value_stack = ()
-
-def head(s):
-    return s[0]
-
-def rest(s):
-    return s[1:]
-
-def push(v):
-    global value_stack
-    value_stack = (v,) + value_stack
-
-def pop():
-    global value_stack
-    v = head(value_stack)
-    value_stack = rest(value_stack)
-    return v
-
 #
 # lines : line lines
 #       |
@@ -137,87 +122,15 @@ def pop():
 #       | MINUS expr
 #       |
 
-from pyjson_gram import *
-
-def is_non_terminal(item):
-    return item[0].islower()
-
-def is_terminal(item):
-    return item[0].isupper()
-
-def is_action(item):
-    return item[0] == '@'
-
 def error(msg):
     print(msg)
     exit(1)
 
 def test():
-    global lex_value
-    global value_stack
-    global parse_table
-    table = parse_table
-    stack = ('start',)
-    token = False
-    while True:
-        if stack:
-            top = head(stack)
-            stack = rest(stack)
-        else:
-            top = False
-
-        if top and is_action(top):
-            if top == "@VALUE":
-                print("%r\n" % pop())
-                break
-            elif top == "@OBJSTART":
-                push({})
-            elif top == "@OBJEND":
-                pass
-            elif top == "@NAME":
-                push(lex_value)
-            elif top == "@MEMBER":
-                value = pop()
-                name = pop()
-                obj = pop()
-                obj[name] = value
-                push(obj)
-            elif top == "@ARRSTART":
-                push([])
-            elif top == "@ARREND":
-                pass
-            elif top == "@ARRADD":
-                value = pop()
-                arr = pop()
-                arr.append(value)
-                push(arr)
-            elif top == "@STRING" or top == "@NUMBER":
-                push(lex_value)
-            elif top == "@TRUE":
-                push(True)
-            elif top == "@FALSE":
-                push(False)
-            elif top == "@NULL":
-                push(None)
-            continue
-
-        if not token:
-            token = lex()
-
-        if not top:
-            if token == 'END':
-                return
-            error("parse stack empty at %r" % token)
+    parser = lola_runtime.LLParser(pyjson_gram, pyjson_gram.bind_actions(globals()), lambda: lex_value)
+    try:
+        parser.parse(lex)
+    except lola_runtime.ParseError as e:
+        error(str(e))
 
-        if is_terminal(top):
-            if top == token:
-                token = False
-            else:
-                error("parse error. got %r expected %r" % (token, top))
-        else:
-            key = (token, top)
-            if key not in table:
-                error("parse error at %r %r" % (token, top))
-            stack = table[key] + stack
-        
 test()
@@ -1,42 +1,42 @@
-start	: value END @VALUE@
+start	: value END @VALUE print("%r\n" % $1)@
 	;
 
-object	: OC @OBJSTART@ o-pairs CC @OBJEND@
+object	: OC o-pairs CC @OBJECT $$ = $2@
 	;
 
 o-pairs	: pairs
-	|
+	| @NOPAIRS $$ = {}@
 	;
 
-pairs	: pair pairs-p
+pairs	: pair @PAIRS $1 = dict([$1])@ pairs-p
 	;
 
-pairs-p	: COMMA pair pairs-p
+pairs-p	: COMMA pair @MEMBER $0[$2[0]] = $2[1]@ pairs-p
 	|
 	;
 
-pair	: STRING @NAME@ COLON value @MEMBER@
+pair	: STRING COLON value @PAIR $$ = ($1, $3)@
 	;
 
-array	: OS @ARRSTART@ o-values CS @ARREND@
+array	: OS o-values CS @ARRAY $$ = $2@
 	;
 
 o-values: values
-	|
+	| @NOVALUES $$ = []@
 	;
 
-values	: value @ARRADD@ values-p
+values	: value @VALUES $1 = [$1]@ values-p
 	;
 
-values-p: COMMA value @ARRADD@ values-p
+values-p: COMMA value @ARRADD $0.append($2)@ values-p
 	|
 	;
 
-value	: STRING @STRING@
-	| NUMBER @NUMBER@
+value	: STRING
+	| NUMBER
 	| object
 	| array
-	| TRUE @TRUE@
-	| FALSE @FALSE@
-	| NULL @NULL@
+	| TRUE @TRUE $$ = True@
+	| FALSE @FALSE $$ = False@
+	| NULL @NULL $$ = None@
 	;
@@ -0,0 +1,322 @@
+parse_table = \
+{   ('CC', 'o-pairs'): ('@NOPAIRS $[1] = {}',),
+    ('CC', 'pairs-p'): (),
+    ('COMMA', 'pairs-p'): (   'COMMA',
+                              'pair',
+                              '@MEMBER $[4][$[1][0]] = $[1][1]',
+                              '@ATTR_POP_3 $pop(3)',
+                              'pairs-p'),
+    ('COMMA', 'values-p'): (   'COMMA',
+                               'value',
+                               '@ARRADD $[4].append($[1])',
+                               '@ATTR_POP_3 $pop(3)',
+                               'values-p'),
+    ('CS', 'o-values'): ('@NOVALUES $[1] = []',),
+    ('CS', 'values-p'): (),
+    ('FALSE', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('FALSE', 'start'): (   'value',
+                            'END',
+                            '@VALUE print("%r\\n" % $[2])',
+                            '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('FALSE', 'value'): ('FALSE', '@FALSE $[2] = False', '@ATTR_POP_1 $pop(1)'),
+    ('FALSE', 'values'): (   'value',
+                             '@VALUES $[1] = [$[1]]',
+                             'values-p',
+                             '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('NULL', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('NULL', 'start'): (   'value',
+                           'END',
+                           '@VALUE print("%r\\n" % $[2])',
+                           '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('NULL', 'value'): ('NULL', '@NULL $[2] = None', '@ATTR_POP_1 $pop(1)'),
+    ('NULL', 'values'): (   'value',
+                            '@VALUES $[1] = [$[1]]',
+                            'values-p',
+                            '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('NUMBER', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('NUMBER', 'start'): (   'value',
+                             'END',
+                             '@VALUE print("%r\\n" % $[2])',
+                             '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('NUMBER', 'value'): ('NUMBER', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('NUMBER', 'values'): (   'value',
+                              '@VALUES $[1] = [$[1]]',
+                              'values-p',
+                              '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OC', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('OC', 'object'): (   'OC',
+                          'o-pairs',
+                          'CC',
+                          '@OBJECT $[4] = $[2]',
+                          '@ATTR_POP_3 $pop(3)'),
+    ('OC', 'start'): (   'value',
+                         'END',
+                         '@VALUE print("%r\\n" % $[2])',
+                         '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OC', 'value'): ('object', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('OC', 'values'): (   'value',
+                          '@VALUES $[1] = [$[1]]',
+                          'values-p',
+                          '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OS', 'array'): (   'OS',
+                         'o-values',
+                         'CS',
+                         '@ARRAY $[4] = $[2]',
+                         '@ATTR_POP_3 $pop(3)'),
+    ('OS', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('OS', 'start'): (   'value',
+                         'END',
+                         '@VALUE print("%r\\n" % $[2])',
+                         '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('OS', 'value'): ('array', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('OS', 'values'): (   'value',
+                          '@VALUES $[1] = [$[1]]',
+                          'values-p',
+                          '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('STRING', 'o-pairs'): ('pairs', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('STRING', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('STRING', 'pair'): (   'STRING',
+                            'COLON',
+                            'value',
+                            '@PAIR $[4] = ($[3], $[1])',
+                            '@ATTR_POP_3 $pop(3)'),
+    ('STRING', 'pairs'): (   'pair',
+                             '@PAIRS $[1] = dict([$[1]])',
+                             'pairs-p',
+                             '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('STRING', 'start'): (   'value',
+                             'END',
+                             '@VALUE print("%r\\n" % $[2])',
+                             '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('STRING', 'value'): ('STRING', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('STRING', 'values'): (   'value',
+                              '@VALUES $[1] = [$[1]]',
+                              'values-p',
+                              '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('TRUE', 'o-values'): ('values', '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)'),
+    ('TRUE', 'start'): (   'value',
+                           'END',
+                           '@VALUE print("%r\\n" % $[2])',
+                           '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)'),
+    ('TRUE', 'value'): ('TRUE', '@TRUE $[2] = True', '@ATTR_POP_1 $pop(1)'),
+    ('TRUE', 'values'): (   'value',
+                            '@VALUES $[1] = [$[1]]',
+                            'values-p',
+                            '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)')}
+
+#
+# Token codes and parse rows for lola_runtime.LLParser
+#
+
+END = 0
+OC = 1
+CC = 2
+COMMA = 3
+STRING = 4
+COLON = 5
+OS = 6
+CS = 7
+NUMBER = 8
+TRUE = 9
+FALSE = 10
+NULL = 11
+FIRST_NON_TERMINAL = 12
+FIRST_ACTION = 23
+START = 12
+ACTION_VALUE = 23
+ACTION_ATTR_COPY_POP_2 = 24
+ACTION_OBJECT = 25
+ACTION_ATTR_POP_3 = 26
+ACTION_ATTR_COPY_POP_1 = 27
+ACTION_NOPAIRS = 28
+ACTION_PAIRS = 29
+ACTION_MEMBER = 30
+ACTION_PAIR = 31
+ACTION_ARRAY = 32
+ACTION_NOVALUES = 33
+ACTION_VALUES = 34
+ACTION_ARRADD = 35
+ACTION_TRUE = 36
+ACTION_ATTR_POP_1 = 37
+ACTION_FALSE = 38
+ACTION_NULL = 39
+
+token_names = (
+    'END',
+    'OC',
+    'CC',
+    'COMMA',
+    'STRING',
+    'COLON',
+    'OS',
+    'CS',
+    'NUMBER',
+    'TRUE',
+    'FALSE',
+    'NULL',
+    'start',
+    'object',
+    'o-pairs',
+    'pairs',
+    'pairs-p',
+    'pair',
+    'array',
+    'o-values',
+    'values',
+    'values-p',
+    'value',
+    '@VALUE print("%r\\n" % $[2])',
+    '@ATTR_COPY_POP_2 $[3] = $[2]; $pop(2)',
+    '@OBJECT $[4] = $[2]',
+    '@ATTR_POP_3 $pop(3)',
+    '@ATTR_COPY_POP_1 $[2] = $[1]; $pop(1)',
+    '@NOPAIRS $[1] = {}',
+    '@PAIRS $[1] = dict([$[1]])',
+    '@MEMBER $[4][$[1][0]] = $[1][1]',
+    '@PAIR $[4] = ($[3], $[1])',
+    '@ARRAY $[4] = $[2]',
+    '@NOVALUES $[1] = []',
+    '@VALUES $[1] = [$[1]]',
+    '@ARRADD $[4].append($[1])',
+    '@TRUE $[2] = True',
+    '@ATTR_POP_1 $pop(1)',
+    '@FALSE $[2] = False',
+    '@NULL $[2] = None',
+)
+
+parse_rows = (
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    {   # start
+        1: (24, 23, 0, 22),
+        4: (24, 23, 0, 22),
+        6: (24, 23, 0, 22),
+        8: (24, 23, 0, 22),
+        9: (24, 23, 0, 22),
+        10: (24, 23, 0, 22),
+        11: (24, 23, 0, 22),
+    },
+    {   # object
+        1: (26, 25, 2, 14, 1),
+    },
+    {   # o-pairs
+        2: (28,),
+        4: (27, 15),
+    },
+    {   # pairs
+        4: (24, 16, 29, 17),
+    },
+    {   # pairs-p
+        2: (),
+        3: (16, 26, 30, 17, 3),
+    },
+    {   # pair
+        4: (26, 31, 22, 5, 4),
+    },
+    {   # array
+        6: (26, 32, 7, 19, 6),
+    },
+    {   # o-values
+        1: (27, 20),
+        4: (27, 20),
+        6: (27, 20),
+        7: (33,),
+        8: (27, 20),
+        9: (27, 20),
+        10: (27, 20),
+        11: (27, 20),
+    },
+    {   # values
+        1: (24, 21, 34, 22),
+        4: (24, 21, 34, 22),
+        6: (24, 21, 34, 22),
+        8: (24, 21, 34, 22),
+        9: (24, 21, 34, 22),
+        10: (24, 21, 34, 22),
+        11: (24, 21, 34, 22),
+    },
+    {   # values-p
+        3: (21, 26, 35, 22, 3),
+        7: (),
+    },
+    {   # value
+        1: (27, 13),
+        4: (27, 4),
+        6: (27, 18),
+        8: (27, 8),
+        9: (37, 36, 9),
+        10: (37, 38, 10),
+        11: (37, 39, 11),
+    },
+)
+
+# Actions are passed the attribute stack
+ATTRIBUTES = True
+
+#
+# Actions from the grammar
+#
+
+import ast
+
+# Line of each function in the grammar and its source
+action_source = (
+    (0, 'def parse_action_23(attrs):\n    print("%r\\n" % attrs[-2])\n'),
+    (0, 'def parse_action_24(attrs):\n    attrs[-3] = attrs[-2]; del attrs[-2:]\n'),
+    (3, 'def parse_action_25(attrs):\n    attrs[-4] = attrs[-2]\n'),
+    (3, 'def parse_action_26(attrs):\n    del attrs[-3:]\n'),
+    (6, 'def parse_action_27(attrs):\n    attrs[-2] = attrs[-1]; del attrs[-1:]\n'),
+    (7, 'def parse_action_28(attrs):\n    attrs[-1] = {}\n'),
+    (10, 'def parse_action_29(attrs):\n    attrs[-1] = dict([attrs[-1]])\n'),
+    (13, 'def parse_action_30(attrs):\n    attrs[-4][attrs[-1][0]] = attrs[-1][1]\n'),
+    (17, 'def parse_action_31(attrs):\n    attrs[-4] = (attrs[-3], attrs[-1])\n'),
+    (20, 'def parse_action_32(attrs):\n    attrs[-4] = attrs[-2]\n'),
+    (24, 'def parse_action_33(attrs):\n    attrs[-1] = []\n'),
+    (27, 'def parse_action_34(attrs):\n    attrs[-1] = [attrs[-1]]\n'),
+    (30, 'def parse_action_35(attrs):\n    attrs[-4].append(attrs[-1])\n'),
+    (38, 'def parse_action_36(attrs):\n    attrs[-2] = True\n'),
+    (34, 'def parse_action_37(attrs):\n    del attrs[-1:]\n'),
+    (39, 'def parse_action_38(attrs):\n    attrs[-2] = False\n'),
+    (40, 'def parse_action_39(attrs):\n    attrs[-2] = None\n'),
+)
+
+action_functions = {
+    ACTION_VALUE: 'parse_action_23',
+    ACTION_ATTR_COPY_POP_2: 'parse_action_24',
+    ACTION_OBJECT: 'parse_action_25',
+    ACTION_ATTR_POP_3: 'parse_action_26',
+    ACTION_ATTR_COPY_POP_1: 'parse_action_27',
+    ACTION_NOPAIRS: 'parse_action_28',
+    ACTION_PAIRS: 'parse_action_29',
+    ACTION_MEMBER: 'parse_action_30',
+    ACTION_PAIR: 'parse_action_31',
+    ACTION_ARRAY: 'parse_action_32',
+    ACTION_NOVALUES: 'parse_action_33',
+    ACTION_VALUES: 'parse_action_34',
+    ACTION_ARRADD: 'parse_action_35',
+    ACTION_TRUE: 'parse_action_36',
+    ACTION_ATTR_POP_1: 'parse_action_37',
+    ACTION_FALSE: 'parse_action_38',
+    ACTION_NULL: 'parse_action_39',
+}
+
+def bind_actions(namespace):
+    namespace = dict(namespace)
+    for line, source in action_source:
+        tree = ast.parse(source, 'pyjson_gram.ll')
+        ast.increment_lineno(tree, line - 1)
+        exec(compile(tree, 'pyjson_gram.ll', "exec"), namespace)
+    actions = {}
+    for action, function in action_functions.items():
+        actions[action] = namespace[function]
+    return actions
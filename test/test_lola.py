@@ -0,0 +1,1167 @@
+#
+# Copyright © 2019 Keith Packard <keithp@keithp.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin St, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+
+#
+# Tests for lola and the parsers it generates. Run with
+#
+#   python3 -m unittest discover test
+#
+# The C tests need a C compiler and are skipped without one.
+#
+
+import contextlib
+import importlib.util
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+import unittest
+import unittest.mock
+
+top_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, top_dir)
+
+import lola
+import lola_runtime
+
+#
+# Generate a parser from 'text' in 'dir', returning the output file name
+#
+
+def generate(dir, name, text, format='c', **options):
+    input = os.path.join(dir, name + '.ll')
+    output = os.path.join(dir, name + lola.output_suffix[format])
+    with open(input, 'w') as file:
+        file.write(text)
+    seconds, message = lola.compile_grammar(input, output, format, (), **options)
+    if message:
+        raise lola.LolaError(message)
+    return output
+
+def load_module(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+cc = shutil.which('cc')
+
+#
+# Compile 'program', a C source including 'header', and return what it
+# prints
+#
+
+def run_program(dir, name, header, program, **values):
+    source = os.path.join(dir, name + '.c')
+    binary = os.path.join(dir, name)
+    with open(source, 'w') as file:
+        file.write(program % dict(values, header=os.path.basename(header)))
+    subprocess.run((cc, '-Wall', '-o', binary, source), check=True)
+    return subprocess.run((binary,), stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+#
+# Push interface, with and without END at the end of the start
+# production
+#
+
+push_grammars = (('push_end', "start : list END ;\n"
+                              "list : ITEM @{ count++; }@ list\n"
+                              "     |\n"
+                              "     ;\n"),
+                 ('push_open', "start : ITEM @{ count++; }@ start\n"
+                               "      |\n"
+                               "      ;\n"))
+
+push_program = r"""
+#include <stdio.h>
+#include <stdbool.h>
+#include <stdint.h>
+
+#include "%(header)s"
+
+#define PARSE_STACK_SIZE	32
+#define PARSE_PUSH
+
+static int count;
+
+#define GRAMMAR_TABLE
+#define PARSE_CODE
+#include "%(header)s"
+
+int main(void)
+{
+    struct parse_state state;
+    int i;
+
+    if (!parser_init(&state))
+	return 1;
+    for (i = 0; i < 3; i++)
+	if (parser_feed(&state, ITEM) != parse_return_more)
+	    return 2;
+    printf("%%d %%d\n", parser_finish(&state), count);
+    parser_fini(&state);
+    return 0;
+}
+"""
+
+class PushTest(unittest.TestCase):
+
+    def test_python_finish(self):
+        with tempfile.TemporaryDirectory() as dir:
+            for name, text in push_grammars:
+                with self.subTest(grammar=name):
+                    module = load_module(generate(dir, name, text.replace('count++;', 'count.append(1)'),
+                                                  format='python'))
+                    count = []
+                    parser = lola_runtime.LLParser(module, module.bind_actions({'count': count}))
+                    state = parser.init()
+                    for i in range(3):
+                        self.assertEqual(parser.feed(state, module.ITEM), lola_runtime.MORE)
+                    self.assertEqual(parser.finish(state), lola_runtime.ACCEPT)
+                    self.assertEqual(len(count), 3)
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_c_finish(self):
+        with tempfile.TemporaryDirectory() as dir:
+            for name, text in push_grammars:
+                with self.subTest(grammar=name):
+                    header = generate(dir, name, text)
+                    source = os.path.join(dir, name + '.c')
+                    program = os.path.join(dir, name)
+                    with open(source, 'w') as file:
+                        file.write(push_program % { 'header': os.path.basename(header) })
+                    subprocess.run((cc, '-o', program, source), check=True)
+                    result = subprocess.run((program,), stdout=subprocess.PIPE, universal_newlines=True)
+                    self.assertEqual(result.returncode, 0)
+                    self.assertEqual(result.stdout, "0 3\n")
+
+#
+# A grammar with too many productions for their indices to fit in
+# bytes, which is parsed with each table layout
+#
+
+wide_depth = 150
+
+wide_grammar = ("start : n0 END ;\n" +
+                "".join("n%d : T%d n%d | U%d ;\n" % (i, i, i + 1, i) for i in range(wide_depth)) +
+                "n%d : W ;\n" % wide_depth)
+
+wide_program = r"""
+#include <stdio.h>
+#include <stdbool.h>
+#include <stdint.h>
+
+#include "%(header)s"
+
+#define PARSE_STACK_SIZE	512
+#define PARSE_PUSH
+
+#define GRAMMAR_TABLE
+#define PARSE_CODE
+#include "%(header)s"
+
+static const token_t tokens[] = { %(tokens)s };
+
+int main(void)
+{
+    struct parse_state state;
+    parse_return_t ret = parse_return_more;
+    unsigned i;
+
+    if (!parser_init(&state))
+	return 1;
+    for (i = 0; i < sizeof(tokens) / sizeof(tokens[0]) && ret == parse_return_more; i++)
+	ret = parser_feed(&state, tokens[i]);
+    printf("%%d\n", ret == parse_return_success);
+    parser_fini(&state);
+    return 0;
+}
+"""
+
+class TableTest(unittest.TestCase):
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_wide_entries(self):
+        inputs = ((["T%d" % i for i in range(wide_depth)] + ["W", "END"], "1\n"),
+                  (["T%d" % i for i in range(wide_depth - 1)] + ["U%d" % (wide_depth - 1), "END"], "1\n"),
+                  (["T0", "T1", "U1", "W", "END"], "0\n"))
+        with tempfile.TemporaryDirectory() as dir:
+            for table in ('compact', 'dense', 'comb'):
+                with self.subTest(table=table):
+                    header = generate(dir, 'wide_' + table, wide_grammar, table=table)
+                    with open(header) as file:
+                        self.assertIn("typedef uint16_t", file.read())
+                    for n, (tokens, expect) in enumerate(inputs):
+                        source = os.path.join(dir, 'wide_%s_%d.c' % (table, n))
+                        program = os.path.join(dir, 'wide_%s_%d' % (table, n))
+                        with open(source, 'w') as file:
+                            file.write(wide_program % { 'header': os.path.basename(header),
+                                                        'tokens': ", ".join(tokens) })
+                        subprocess.run((cc, '-o', program, source), check=True)
+                        result = subprocess.run((program,), stdout=subprocess.PIPE, universal_newlines=True)
+                        self.assertEqual(result.stdout, expect)
+
+#
+# Attributes with PARSE_STACK_ALLOC, where nesting deeper than the
+# initial stack size grows both the parse and attribute stacks
+#
+
+nest_grammar = ("start : expr END @{ result = $1; }@ ;\n"
+                "expr : LP expr RP @{ $$ = $2 + 1; }@\n"
+                "     | X @{ $$ = 0; }@\n"
+                "     ;\n")
+
+nest_program = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <stdbool.h>
+#include <stdint.h>
+
+#include "%(header)s"
+
+#define PARSE_STACK_SIZE	4
+#define PARSE_ATTR_TYPE		int
+#define PARSE_PUSH
+%(defines)s
+
+static void *
+stack_alloc(void *old, size_t bytes)
+{
+    if (bytes == 0) {
+	free(old);
+	return NULL;
+    }
+    return realloc(old, bytes);
+}
+
+static int result = -1;
+
+#define GRAMMAR_TABLE
+#define PARSE_CODE
+#include "%(header)s"
+
+int main(void)
+{
+    struct parse_state state;
+    parse_return_t ret = parse_return_more;
+    int i;
+
+    (void) stack_alloc;
+    if (!parser_init(&state))
+	return 1;
+    for (i = 0; i < %(depth)d && ret == parse_return_more; i++)
+	ret = parser_feed(&state, LP);
+    if (ret == parse_return_more)
+	ret = parser_feed(&state, X);
+    for (i = 0; i < %(depth)d && ret == parse_return_more; i++)
+	ret = parser_feed(&state, RP);
+    if (ret == parse_return_more)
+	ret = parser_feed(&state, END);
+    printf("%%d %%d\n", ret, result);
+    parser_fini(&state);
+    return 0;
+}
+"""
+
+class AttributeTest(unittest.TestCase):
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_stack_alloc(self):
+        cases = (("#define PARSE_STACK_ALLOC(old, bytes) stack_alloc(old, bytes)", "0 100\n"),
+                 ("", "3 -1\n"))
+        with tempfile.TemporaryDirectory() as dir:
+            header = generate(dir, 'nest', nest_grammar, attributes=True)
+            for n, (defines, expect) in enumerate(cases):
+                with self.subTest(defines=defines):
+                    source = os.path.join(dir, 'nest_%d.c' % n)
+                    program = os.path.join(dir, 'nest_%d' % n)
+                    with open(source, 'w') as file:
+                        file.write(nest_program % { 'header': os.path.basename(header),
+                                                    'defines': defines, 'depth': 100 })
+                    subprocess.run((cc, '-o', program, source), check=True)
+                    result = subprocess.run((program,), stdout=subprocess.PIPE, universal_newlines=True)
+                    self.assertEqual(result.stdout, expect)
+
+#
+# Growing the parse stack with PARSE_STACK_ALLOC, which must fail
+# cleanly when the new size would overflow
+#
+
+grow_program = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <stdbool.h>
+#include <stdint.h>
+
+#include "%(header)s"
+
+#define PARSE_STACK_SIZE	4
+#define PARSE_STACK_ALLOC(old, bytes)	stack_alloc(old, bytes)
+#define PARSE_PUSH
+
+static int allocs;
+
+static void *
+stack_alloc(void *old, size_t bytes)
+{
+    if (bytes == 0) {
+	free(old);
+	return NULL;
+    }
+    allocs++;
+    return realloc(old, bytes);
+}
+
+#define GRAMMAR_TABLE
+#define PARSE_CODE
+#include "%(header)s"
+
+int main(void)
+{
+    int size = (int) (~0u >> 2) + 1;
+    void *stack;
+
+    printf("%%d %%d\n", parse_grow(NULL, &size, 1) == NULL, size == (int) (~0u >> 2) + 1);
+    size = 1 << 20;
+    printf("%%d %%d\n", parse_grow(NULL, &size, SIZE_MAX >> 19) == NULL, size == 1 << 20);
+    size = 4;
+    stack = parse_grow(NULL, &size, 4);
+    printf("%%d %%d\n", stack != NULL, size);
+    printf("%%d\n", allocs);
+    free(stack);
+    return 0;
+}
+"""
+
+class GrowTest(unittest.TestCase):
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_grow_overflow(self):
+        with tempfile.TemporaryDirectory() as dir:
+            header = generate(dir, 'grow', "start : X END ;\n")
+            self.assertEqual(run_program(dir, 'grow', header, grow_program), "1 1\n1 1\n1 8\n1\n")
+
+#
+# parse_tokens, reading pre-lexed tokens, with and without
+# PARSE_REENTRANT and PARSE_STACK_ALLOC. In the re-entrant parser, an
+# action runs a second parse on a separate state part way through the
+# first
+#
+
+tokens_grammar = ("start : list END ;\n"
+                  "list : item list | ;\n"
+                  "item : NUM @{ number(PARSE_VALUE); }@ | LP list RP ;\n")
+
+tokens_program = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <stdbool.h>
+#include <stdint.h>
+
+#include "%(header)s"
+
+#define PARSE_STACK_SIZE	4
+#define PARSE_TOKENS
+#define PARSE_TOKEN_VALUE(context, index)	(((int *) (context))[index])
+%(defines)s
+
+static int allocs;
+
+static void *
+stack_alloc(void *old, size_t bytes)
+{
+    if (bytes == 0) {
+	free(old);
+	return NULL;
+    }
+    allocs++;
+    return realloc(old, bytes);
+}
+
+static void number(int value);
+
+#define GRAMMAR_TABLE
+#define PARSE_CODE
+#include "%(header)s"
+
+static token_t inner_tokens[] = { LP, NUM, NUM, RP };
+static int inner_values[] = { 0, 100, 200, 0 };
+static int sum, inner_ret = -1;
+
+static void
+number(int value)
+{
+    sum += value;
+#ifdef PARSE_REENTRANT
+    if (value == 0) {
+	struct parse_state inner;
+
+	inner_ret = parse_tokens(&inner, inner_tokens, 4, inner_values);
+    }
+#endif
+}
+
+static parse_return_t
+run(token_t *tokens, size_t n, int *values)
+{
+#ifdef PARSE_REENTRANT
+    struct parse_state state;
+
+    return parse_tokens(&state, tokens, n, values);
+#else
+    return parse_tokens(tokens, n, values);
+#endif
+}
+
+int main(void)
+{
+    token_t tokens[%(depth)d * 2 + 2];
+    int values[%(depth)d * 2 + 2] = { 0 };
+    size_t n = 0;
+    parse_return_t ret;
+    int i;
+
+    (void) stack_alloc;
+    for (i = 0; i < %(depth)d; i++)
+	tokens[n++] = LP;
+    values[n] = 1;
+    tokens[n++] = NUM;
+    values[n] = 0;
+    tokens[n++] = NUM;
+    for (i = 0; i < %(depth)d; i++)
+	tokens[n++] = RP;
+    ret = run(tokens, n, values);
+    printf("%%d %%d %%d\n", ret, sum, inner_ret);
+    printf("%%d\n", run(tokens, n - 1, values));
+    printf("%%d\n", allocs > 2);
+    return 0;
+}
+"""
+
+class TokensTest(unittest.TestCase):
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_parse_tokens(self):
+        alloc = "#define PARSE_STACK_ALLOC(old, bytes) stack_alloc(old, bytes)\n"
+        reentrant = "#define PARSE_REENTRANT\n"
+        cases = ((alloc + reentrant, "0 301 0\n2\n1\n"),
+                 (alloc, "0 1 -1\n2\n1\n"),
+                 (reentrant, "3 0 -1\n3\n0\n"),
+                 ("", "3 0 -1\n3\n0\n"))
+        with tempfile.TemporaryDirectory() as dir:
+            header = generate(dir, 'tokens', tokens_grammar)
+            for n, (defines, expect) in enumerate(cases):
+                with self.subTest(defines=defines):
+                    self.assertEqual(run_program(dir, 'tokens_%d' % n, header, tokens_program,
+                                                 defines=defines, depth=20), expect)
+
+#
+# The scanner generated from terminal definitions, in python and C
+#
+
+lex_grammar = (r"""start : items END ;
+items : item items | ;
+item : IF | IDENT | NUMBER | LE | LT | STRING | TAB | SEMI ;
+IF = "if" ;
+IDENT = /[a-zA-Z_]\w*/ ;
+NUMBER = /\d+(\.\d*)?/ ;
+LE = "<=" ;
+LT = "<" ;
+STRING = /"([^"\\]|\\.)*"/ ;
+TAB = /\t+/ ;
+SEMI = /\x3b/ ;
+UNUSED = "zz" ;
+= /[ \n]+/ ;
+""")
+
+lex_input = 'if iffy 12.5 <= <\n"a\\"b" \t\t ; x_1'
+
+lex_expect = [('IF', 'if'), ('IDENT', 'iffy'), ('NUMBER', '12.5'), ('LE', '<='), ('LT', '<'),
+              ('STRING', '"a\\"b"'), ('TAB', '\t\t'), ('SEMI', ';'), ('IDENT', 'x_1'), ('END', '')]
+
+lex_program = r"""
+#include <stdio.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <string.h>
+
+#include "%(header)s"
+
+#define GRAMMAR_TABLE
+#define TOKEN_NAMES
+#define LEX_CODE
+#include "%(header)s"
+
+int main(int argc, char **argv)
+{
+    struct lex_input input;
+    token_t token;
+
+    lex_input_init(&input, argv[1], strlen(argv[1]));
+    do {
+	token = lex_scan(&input);
+	if (token == TOKEN_NONE) {
+	    printf("TOKEN_NONE %%d\n", (int) (input.pos - input.text));
+	    break;
+	}
+	printf("%%s %%.*s\n", token_names[token], (int) input.span.len, input.span.start);
+    } while (token != END);
+    return 0;
+}
+"""
+
+class LexerTest(unittest.TestCase):
+
+    def test_python(self):
+        with tempfile.TemporaryDirectory() as dir:
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                module = load_module(generate(dir, 'lex', lex_grammar, format='python'))
+            self.assertIn("terminal UNUSED is not used in the grammar", stderr.getvalue())
+            names = { getattr(module, name): name for name, value in lex_expect }
+            lexer = lola_runtime.Lexer(module, lex_input)
+            tokens = []
+            while not tokens or tokens[-1][0] != 'END':
+                token = lexer.lex()
+                tokens.append((names[token], lexer.value))
+            self.assertEqual(tokens, lex_expect)
+            lexer = lola_runtime.Lexer(module, 'if $x')
+            self.assertEqual(lexer.lex(), module.IF)
+            with self.assertRaisesRegex(lola_runtime.LexError, "invalid input '\\$x' at offset 3"):
+                lexer.lex()
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_c(self):
+        with tempfile.TemporaryDirectory() as dir:
+            with contextlib.redirect_stderr(io.StringIO()):
+                header = generate(dir, 'lex', lex_grammar)
+            source = os.path.join(dir, 'lex.c')
+            program = os.path.join(dir, 'lex')
+            with open(source, 'w') as file:
+                file.write(lex_program % { 'header': os.path.basename(header) })
+            subprocess.run((cc, '-o', program, source), check=True)
+            for text, expect in ((lex_input, "".join("%s %s\n" % token for token in lex_expect)),
+                                 ('if $x', "IF if\nTOKEN_NONE 3\n")):
+                with self.subTest(text=text):
+                    result = subprocess.run((program, text), stdout=subprocess.PIPE, universal_newlines=True)
+                    self.assertEqual(result.stdout, expect)
+
+#
+# The comb layout, where rows of the parse table overlap and the
+# check array rejects lookups landing in another row's slot
+#
+
+comb_grammar = ("start : a END ;\n"
+                "a : X b | Y c | Z a | ;\n"
+                "b : W | V a ;\n"
+                "c : U | X d ;\n"
+                "d : T | S ;\n")
+
+comb_program = r"""
+#include <stdio.h>
+#include <stdbool.h>
+#include <stdint.h>
+
+#include "%(header)s"
+
+#define PARSE_STACK_SIZE	32
+#define PARSE_PUSH
+#define GRAMMAR_TABLE
+#define TOKEN_NAMES
+#define PARSE_CODE
+#include "%(header)s"
+
+int main(void)
+{
+    int t, n, rejected = 0;
+
+    for (t = 1; t < FIRST_NON_TERMINAL; t++) {
+	for (n = FIRST_NON_TERMINAL; n < FIRST_ACTION; n++) {
+	    CONST token_t *p = match_state(t, n);
+	    int i = comb_base[n - FIRST_NON_TERMINAL] + t - 1;
+
+	    if (!p) {
+		if (0 <= i && i < COMB_SIZE)
+		    rejected++;
+		continue;
+	    }
+	    printf("%%s %%s:", token_names[t], token_names[n]);
+	    while (*p != TOKEN_NONE)
+		printf(" %%s", token_names[*p++]);
+	    printf("\n");
+	}
+    }
+    printf("rejected %%d\n", rejected);
+    return 0;
+}
+"""
+
+class CombTest(unittest.TestCase):
+
+    def parse_table(self):
+        generator = lola.Lola()
+        generator.load(io.StringIO(comb_grammar), 'comb.ll')
+        generator.analyze()
+        generator.build_table()
+        return generator.symbols, generator.parse_table
+
+    def test_pack(self):
+        rows = { 0: [(0, 'a'), (2, 'b')], 1: [(1, 'c'), (3, 'd')], 2: [(0, 'e'), (1, 'f'), (2, 'g')] }
+        base, slots = lola.comb_pack(rows)
+        self.assertEqual(base[0], base[1])
+        self.assertEqual(len(slots), sum(len(entries) for entries in rows.values()))
+        for row, entries in rows.items():
+            columns = dict(entries)
+            for column in range(4):
+                i = base[row] + column
+                if column in columns:
+                    self.assertEqual(slots[i], (row, columns[column]))
+                elif 0 <= i < len(slots):
+                    self.assertTrue(slots[i] is None or slots[i][0] != row)
+
+    @unittest.skipIf(cc is None, "no C compiler")
+    def test_c(self):
+        symbols, parse_table = self.parse_table()
+        expect = []
+        for (terminal, non_terminal), prod in sorted(parse_table.items(), key=lambda item: (item[0][0], item[0][1])):
+            expect.append("%s %s:%s\n" % (symbols.name(terminal), symbols.name(non_terminal),
+                                          "".join(" " + symbols.name(token) for token in prod[::-1])))
+        with tempfile.TemporaryDirectory() as dir:
+            header = generate(dir, 'comb', comb_grammar, table='comb')
+            source = os.path.join(dir, 'comb.c')
+            program = os.path.join(dir, 'comb')
+            with open(source, 'w') as file:
+                file.write(comb_program % { 'header': os.path.basename(header) })
+            subprocess.run((cc, '-o', program, source), check=True)
+            result = subprocess.run((program,), stdout=subprocess.PIPE, universal_newlines=True)
+            lines = result.stdout.splitlines(True)
+            self.assertEqual(lines[:-1], expect)
+            self.assertGreater(int(lines[-1].split()[1]), 0)
+
+    def test_sizes(self):
+        symbols, parse_table = self.parse_table()
+        terminals = len(symbols.terminals())
+        non_terminals = len(symbols.non_terminals())
+        with tempfile.TemporaryDirectory() as dir:
+            with open(generate(dir, 'comb', comb_grammar, table='comb')) as file:
+                text = file.read()
+        size = int(re.search(r"#define COMB_SIZE (\d+)", text).group(1))
+        self.assertLess(size, terminals * non_terminals)
+        self.assertIn("typedef int16_t comb_base_t;", text)
+        self.assertIn("typedef uint8_t comb_check_t;", text)
+        self.assertIn("typedef uint8_t comb_next_t;", text)
+        self.assertIn(" *   comb             %8d  (comb_base %d, comb_check %d, comb_next %d)" %
+                      (non_terminals * 2 + size * 2, non_terminals * 2, size, size), text)
+        self.assertIn(" *   dense            %8d" % (terminals * non_terminals), text)
+
+#
+# The binding search, which should find the cheapest binding when it
+# has time to finish, and say so when it doesn't
+#
+
+class OptimizeTest(unittest.TestCase):
+
+    def optimize(self, seconds):
+        generator = lola.Lola(optimize_time=seconds)
+        with open(os.path.join(top_dir, 'calc-gram.ll')) as file:
+            generator.load(file, 'calc-gram.ll')
+        generator.analyze()
+        generator.build_table()
+        with unittest.mock.patch('lola.search_binding', wraps=lola.search_binding) as search:
+            binding, table, edges, result = generator.optimize()
+        return search.call_args[0], result
+
+    def test_search_finds_best(self):
+        (terminals, parse_table, terminal_map, possibles, binding, seconds, profile), result = self.optimize(60)
+        examined, total, finished, first_cost, cost = result
+        self.assertTrue(finished)
+        best = None
+        for n in range(lola.total_bindings(possibles)):
+            candidate = lola.pick_binding(possibles, n)
+            table = lola.non_terminal_table(terminals, terminal_map, candidate)
+            key = lola.cost_key(lola.binding_cost(parse_table, candidate, table), None)
+            if best is None or key < best:
+                best = key
+        self.assertEqual(lola.cost_key(cost, None), best)
+
+    def test_search_out_of_time(self):
+        args, result = self.optimize(0)
+        examined, total, finished, first_cost, cost = result
+        self.assertFalse(finished)
+        self.assertEqual(cost, first_cost)
+
+class SymbolTest(unittest.TestCase):
+
+    def test_rule_for_terminal(self):
+        with tempfile.TemporaryDirectory() as dir:
+            with self.assertRaisesRegex(lola.LolaError, "Rule defined for terminal B"):
+                generate(dir, 'terminal', "start : A B END ;\nB : X ;\n")
+
+#
+# --stats, which must stop tracing memory once the grammar is done
+#
+
+class StatsTest(unittest.TestCase):
+
+    def compile(self, text):
+        with tempfile.TemporaryDirectory() as dir:
+            input = os.path.join(dir, 'stats.ll')
+            with open(input, 'w') as file:
+                file.write(text)
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                seconds, message = lola.compile_grammar(input, os.path.join(dir, 'stats.h'), 'c', (),
+                                                        stats=True)
+        return message, stderr.getvalue()
+
+    def test_stops_tracing(self):
+        message, report = self.compile("start : A END ;\n")
+        self.assertIsNone(message)
+        self.assertFalse(tracemalloc.is_tracing())
+        message, report = self.compile("start : A END\n")
+        self.assertIsNotNone(message)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_leaves_tracing(self):
+        tracemalloc.start()
+        try:
+            self.compile("start : A END ;\n")
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+#
+# Line numbers counted while reading the grammar
+#
+
+class LineTest(unittest.TestCase):
+
+    def test_non_terminal_lines(self):
+        text = ("start : a END ;\n"
+                "# comment\n"
+                "a : B @{\n"
+                "      $$ = $1;\n"
+                "    }@ b ;\n"
+                "\n"
+                "b : C ;\n")
+        generator = lola.Lola(attributes=True)
+        generator.load(io.StringIO(text), 'lines.ll')
+        self.assertEqual(generator.non_terminal_lines, {'start': 1, 'a': 3, 'b': 7})
+
+    def test_parse_error_line(self):
+        generator = lola.Lola()
+        with self.assertRaisesRegex(lola.LolaError, "^lines.ll:4: parse error"):
+            generator.load(io.StringIO("start : a END ;\n\na : B\n    | ;;\n"), 'lines.ll')
+
+class ActionTest(unittest.TestCase):
+
+    def test_name_reused_for_other_code(self):
+        with tempfile.TemporaryDirectory() as dir:
+            with self.assertRaisesRegex(lola.LolaError, "action PUSH is already used"):
+                generate(dir, 'actions', "start : A @PUSH out.append(1)@ B @PUSH out.append(2)@ END ;\n",
+                         format='python')
+
+    def test_name_reused_for_same_code(self):
+        with tempfile.TemporaryDirectory() as dir:
+            module = load_module(generate(dir, 'actions',
+                                          "start : A @PUSH out.append(1)@ B @PUSH  out.append(1)@ END ;\n",
+                                          format='python'))
+            out = []
+            parser = lola_runtime.LLParser(module, module.bind_actions({'out': out}))
+            tokens = iter((module.A, module.B, module.END, module.END))
+            parser.parse(lambda: next(tokens))
+            self.assertEqual(out, [1, 1])
+
+    def test_namespace_unchanged(self):
+        with tempfile.TemporaryDirectory() as dir:
+            module = load_module(generate(dir, 'actions',
+                                          "start : A @FIRST out.append(1)@ B @SECOND out.append(2)@ END ;\n",
+                                          format='python'))
+            out = []
+            namespace = {'out': out}
+            actions = module.bind_actions(namespace)
+            self.assertEqual(namespace, {'out': out})
+            self.assertEqual(sorted(actions), sorted((module.ACTION_FIRST, module.ACTION_SECOND)))
+            tokens = iter((module.A, module.B, module.END, module.END))
+            lola_runtime.LLParser(module, actions).parse(lambda: next(tokens))
+            self.assertEqual(out, [1, 2])
+
+    #
+    # Tracebacks from python actions give the line in the grammar,
+    # with several actions on one line and across lines
+    #
+
+    def test_traceback_line(self):
+        grammars = (("start : A @ out.append(1) @ B @ out.append(1 / 0) @ rest END ;\n"
+                     "rest : C @\n"
+                     "    out.append(3)\n"
+                     "    @ ;\n", 1),
+                    ("start : A @ out.append(1) @ B @ out.append(2) @ rest END ;\n"
+                     "rest : C @\n"
+                     "    out.append(3)\n"
+                     "    out.append(1 / 0)\n"
+                     "    @ ;\n", 4))
+        for format in ('python', 'python-direct'):
+            for n, (text, line) in enumerate(grammars):
+                with self.subTest(format=format, grammar=n):
+                    with tempfile.TemporaryDirectory() as dir:
+                        module = load_module(generate(dir, 'trace', text, format=format))
+                        actions = module.bind_actions({'out': []})
+                        tokens = iter((module.A, module.B, module.C, module.END, module.END))
+                        try:
+                            if format == 'python':
+                                lola_runtime.LLParser(module, actions).parse(lambda: next(tokens))
+                            else:
+                                module.parse(lambda: next(tokens), actions)
+                        except ZeroDivisionError as e:
+                            frame = traceback.extract_tb(e.__traceback__)[-1]
+                        else:
+                            self.fail("action did not raise")
+                        self.assertEqual(os.path.basename(frame.filename), 'trace.ll')
+                        self.assertEqual(frame.lineno, line)
+
+class LeftFactorTest(unittest.TestCase):
+
+    def test_prefix_lengths(self):
+        grammar = {'a': (('X', 'Y', 'Z'), ('X', 'Y', 'W'), ('X', 'V'))}
+        self.assertEqual(lola.left_factor(grammar),
+                         ({'a': (('X', 'a-p'),),
+                           'a-p': (('Y', 'a-p-p'), ('V',)),
+                           'a-p-p': (('Z',), ('W',))}, 2))
+
+    def test_empty_tail(self):
+        grammar = {'a': (('X', 'Y'), ('X', 'Y', 'Z'))}
+        self.assertEqual(lola.left_factor(grammar),
+                         ({'a': (('X', 'Y', 'a-p'),),
+                           'a-p': ((), ('Z',))}, 1))
+
+    def test_actions(self):
+        same = {'a': (('X', '@f', 'Y'), ('X', '@f', 'Z'))}
+        self.assertEqual(lola.left_factor(same),
+                         ({'a': (('X', '@f', 'a-p'),),
+                           'a-p': (('Y',), ('Z',))}, 1))
+        different = {'a': (('X', '@f', 'Y'), ('X', '@g', 'Z'))}
+        self.assertEqual(lola.left_factor(different),
+                         ({'a': (('X', 'a-p'),),
+                           'a-p': (('@f', 'Y'), ('@g', 'Z'))}, 1))
+
+    def test_names(self):
+        grammar = {'a': (('X', 'Y'), ('X', 'Z')), 'a-p': (('W',),)}
+        self.assertEqual(lola.left_factor(grammar),
+                         ({'a': (('X', 'a-p-p'),),
+                           'a-p-p': (('Y',), ('Z',)),
+                           'a-p': (('W',),)}, 1))
+
+    #
+    # The factored grammar parses the same input, running the same
+    # actions in the same order
+    #
+
+    def test_parse(self):
+        text = ("start : a END ;\n"
+                "a : X @ out.append('x') @ Y @ out.append('xy') @\n"
+                "  | X @ out.append('x') @ Y Z @ out.append('xyz') @\n"
+                "  | X W @ out.append('xw') @\n"
+                "  ;\n")
+        with tempfile.TemporaryDirectory() as dir:
+            module = load_module(generate(dir, 'factor', text, format='python', left_factor=True))
+            for tokens, expect in ((('X', 'Y'), ['x', 'xy']),
+                                   (('X', 'Y', 'Z'), ['x', 'xyz']),
+                                   (('X', 'W'), ['xw'])):
+                with self.subTest(tokens=tokens):
+                    out = []
+                    parser = lola_runtime.LLParser(module, module.bind_actions({'out': out}))
+                    codes = iter([getattr(module, token) for token in tokens] + [module.END, module.END])
+                    parser.parse(lambda: next(codes))
+                    self.assertEqual(out, expect)
+
+class LeftRecursionTest(unittest.TestCase):
+
+    def build(self, text):
+        generator = lola.Lola(left_recursion=True)
+        with contextlib.redirect_stderr(io.StringIO()):
+            generator.load(io.StringIO(text), 'recursion.ll')
+            generator.analyze()
+            generator.build_table()
+        return generator
+
+    def test_indirect(self):
+        for text in ("start : a END ;\nb : a Z | W ;\na : b X | Y ;\n",
+                     "start : a END ;\na : b X | Y ;\nb : a Z | W ;\n"):
+            with self.subTest(grammar=text):
+                generator = self.build(text)
+                self.assertEqual(generator.warnings, [])
+                self.assertNotIn('b', generator.grammar)
+                self.assertEqual(generator.grammar['a'], (('W', 'X', 'a-p'), ('Y', 'a-p')))
+                self.assertEqual(generator.grammar['a-p'], (('Z', 'X', 'a-p'), ()))
+
+class CacheTest(unittest.TestCase):
+
+    def test_lexer_warnings_not_replayed(self):
+        text = ("start : A END ;\n"
+                "A = \"a\" ;\n"
+                "Z = \"z\" ;\n")
+        with tempfile.TemporaryDirectory() as dir:
+            cache = lola.TableCache(os.path.join(dir, 'cache'))
+            input = os.path.join(dir, 'unused.ll')
+            with open(input, 'w') as file:
+                file.write(text)
+            for run in range(2):
+                stderr = io.StringIO()
+                with contextlib.redirect_stderr(stderr):
+                    lola.compile_grammar(input, os.path.join(dir, 'unused.h'), 'c', (), cache)
+                self.assertEqual(stderr.getvalue().count("terminal Z is not used"), 1)
+
+    def compile(self, dir, cache, text, defines=(), **options):
+        input = os.path.join(dir, 'cached.ll')
+        output = os.path.join(dir, 'cached.h')
+        with open(input, 'w') as file:
+            file.write(text)
+        seconds, message = lola.compile_grammar(input, output, 'c', defines, cache, **options)
+        self.assertIsNone(message)
+        with open(output) as file:
+            return file.read()
+
+    def test_hit_matches_uncached(self):
+        with tempfile.TemporaryDirectory() as dir:
+            cache = CountingCache(os.path.join(dir, 'cache'))
+            text = calc_grammar()
+            uncached = self.compile(dir, None, text)
+            self.assertEqual(self.compile(dir, cache, text), uncached)
+            self.assertEqual(cache.hits, 0)
+            self.assertEqual(self.compile(dir, cache, text), uncached)
+            self.assertEqual(cache.hits, 1)
+
+    def test_action_text_hits(self):
+        with tempfile.TemporaryDirectory() as dir:
+            cache = CountingCache(os.path.join(dir, 'cache'))
+            self.compile(dir, cache, "start : A @{ first(); }@ END ;\n")
+            output = self.compile(dir, cache, "start : A @{ second(); }@ END ;\n")
+            self.assertEqual(cache.hits, 1)
+            self.assertIn("second();", output)
+            self.assertNotIn("first();", output)
+
+    def test_misses(self):
+        text = calc_grammar()
+        with tempfile.TemporaryDirectory() as dir:
+            profile = os.path.join(dir, 'calc.profile')
+            with open(profile, 'w') as file:
+                file.write("# lola parse profile\nlookup NUMBER expr 10\n")
+            variants = (
+                dict(text=text),
+                dict(text=text, defines=('FOO',)),
+                dict(text=text, optimize_time=0.0),
+                dict(text=text, profile=profile),
+                dict(text=text.replace("NUMBER", "INTEGER")),
+            )
+            cache = CountingCache(os.path.join(dir, 'cache'))
+            for variant in variants:
+                self.compile(dir, cache, **variant)
+            self.assertEqual(cache.hits, 0)
+            for variant in variants:
+                self.compile(dir, cache, **variant)
+            self.assertEqual(cache.hits, len(variants))
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as dir:
+            cache = lola.TableCache(dir, max_bytes=1 << 20)
+            now = time.time()
+            for age, key in enumerate(('c', 'b', 'a'), 1):
+                cache.put(key, key * 100)
+                os.utime(cache.path(key), (now - age * 10, now - age * 10))
+            self.assertEqual(cache.get('a'), 'a' * 100)
+            cache.max_bytes = os.path.getsize(cache.path('a')) * 2
+            cache.put('d', 'd' * 100)
+            self.assertEqual(sorted(name for name in os.listdir(dir)), ['a.table', 'd.table'])
+            os.utime(cache.path('a'), (now - 100, now - 100))
+            cache.max_age = 50
+            cache.put('e', 'e' * 100)
+            self.assertEqual(sorted(name for name in os.listdir(dir)), ['d.table', 'e.table'])
+
+    def test_opt_in(self):
+        with tempfile.TemporaryDirectory() as dir:
+            input = os.path.join(dir, 'opt.ll')
+            with open(input, 'w') as file:
+                file.write("start : A END ;\n")
+            env = dict(os.environ, HOME=dir, XDG_CACHE_HOME=os.path.join(dir, 'xdg'))
+            lola_py = os.path.join(top_dir, 'lola.py')
+            subprocess.run((sys.executable, lola_py, input, '-o', os.path.join(dir, 'opt.h')), env=env, check=True)
+            self.assertEqual(sorted(os.listdir(dir)), ['opt.h', 'opt.ll'])
+            subprocess.run((sys.executable, lola_py, '--cache', input, '-o', os.path.join(dir, 'opt.h')), env=env, check=True)
+            self.assertEqual(len(os.listdir(os.path.join(dir, 'xdg', 'lola'))), 1)
+
+#
+# The python-direct output, which should accept the same input and
+# run the same actions as the table-driven LLParser, and raise the
+# same ParseError on bad input
+#
+
+direct_tokens = (('SKIP', r'[ \t]+', None), ('NUMBER', r'\d+', int), ('STRING', r'"[^"]*"', lambda text: text[1:-1]),
+                 ('TRUE', r'true', None), ('FALSE', r'false', None), ('NULL', r'null', None),
+                 ('NL', r'\n', None), ('PLUS', r'\+', None), ('MINUS', r'-', None), ('TIMES', r'\*', None),
+                 ('DIVIDE', r'/', None), ('OP', r'\(', None), ('CP', r'\)', None),
+                 ('OC', r'\{', None), ('CC', r'\}', None), ('OS', r'\[', None), ('CS', r'\]', None),
+                 ('COMMA', r',', None), ('COLON', r':', None))
+
+direct_inputs = {
+    'pycalc_gram': ("1 + 2 * 3\n(4 - 1) / -2\n\n7\n", "1 + \n", "(1\n", "1 2\n"),
+    'pyjson_gram': ('{ "a" : [1, 2, { "b" : true }], "c" : null, "d" : [] }', '[1, false]',
+                    '{ "a" 1 }', '[1, 2', '[1] ]'),
+}
+
+class DirectTest(unittest.TestCase):
+
+    def lexer(self, module, text):
+        pattern = re.compile("|".join("(?P<%s>%s)" % (name, regex) for name, regex, convert in direct_tokens))
+        converts = { name: convert for name, regex, convert in direct_tokens }
+        tokens = []
+        for match in pattern.finditer(text):
+            if match.lastgroup == 'SKIP':
+                continue
+            convert = converts[match.lastgroup]
+            tokens.append((getattr(module, match.lastgroup), convert(match.group()) if convert else None))
+        current = [None]
+
+        def lex():
+            if not tokens:
+                return module.END
+            token, current[0] = tokens.pop(0)
+            return token
+        return lex, lambda: current[0]
+
+    #
+    # Parse 'text' and return the result, the actions run and any
+    # ParseError, as (message, token, expected)
+    #
+
+    def run_parser(self, module, parse, actions, text):
+        lex, value = self.lexer(module, text)
+        calls = []
+        printed = []
+        namespace = { 'print': printed.append }
+        if actions is None:
+            actions = { id: (lambda attrs=None, id=id: calls.append(id))
+                        for id in range(module.FIRST_ACTION, len(module.token_names)) }
+        else:
+            actions = module.bind_actions(namespace)
+        try:
+            result = parse(lex, actions, value)
+        except lola_runtime.ParseError as e:
+            return calls, printed, (str(e), e.token, e.expected)
+        return calls, printed, result
+
+    def compare(self, grammar, **options):
+        with open(os.path.join(top_dir, grammar + '.ll')) as file:
+            text = file.read()
+        with tempfile.TemporaryDirectory() as dir:
+            table = load_module(generate(dir, 'table_' + grammar, text, 'python', **options))
+            direct = load_module(generate(dir, 'direct_' + grammar, text, 'python-direct', **options))
+        for input in direct_inputs[grammar]:
+            for bound in (None, True) if options.get('attributes') else (None,):
+                with self.subTest(input=input, bound=bound):
+                    expect = self.run_parser(table, lambda lex, actions, value:
+                                             lola_runtime.LLParser(table, actions, value).parse(lex),
+                                             bound, input)
+                    if options.get('attributes'):
+                        parse = direct.parse
+                    else:
+                        parse = lambda lex, actions, value: direct.parse(lex, actions)
+                    got = self.run_parser(direct, parse, bound, input)
+                    self.assertEqual(got, expect)
+
+    def test_calc(self):
+        self.compare('pycalc_gram', left_recursion=True)
+
+    def test_calc_attributes(self):
+        self.compare('pycalc_gram', left_recursion=True, attributes=True)
+        with tempfile.TemporaryDirectory() as dir:
+            with open(os.path.join(top_dir, 'pycalc_gram.ll')) as file:
+                direct = load_module(generate(dir, 'direct_calc', file.read(), 'python-direct',
+                                              left_recursion=True, attributes=True))
+        calls, printed, result = self.run_parser(direct, direct.parse, True, "1 + 2 * 3\n(4 - 1) / -2\n")
+        self.assertEqual(printed, ["= 7", "= -1.5"])
+
+    def test_json(self):
+        self.compare('pyjson_gram')
+
+    def test_json_attributes(self):
+        self.compare('pyjson_gram', attributes=True)
+        with tempfile.TemporaryDirectory() as dir:
+            with open(os.path.join(top_dir, 'pyjson_gram.ll')) as file:
+                direct = load_module(generate(dir, 'direct_json', file.read(), 'python-direct', attributes=True))
+        calls, printed, result = self.run_parser(direct, direct.parse, True, direct_inputs['pyjson_gram'][0])
+        self.assertEqual(result, { 'a': [1, 2, { 'b': True }], 'c': None, 'd': [] })
+
+#
+# Batch mode, generating several parsers from a manifest
+#
+
+class BatchTest(unittest.TestCase):
+
+    def run_batch(self, dir, grammars, manifest):
+        for name, text in grammars.items():
+            with open(os.path.join(dir, name), 'w') as file:
+                file.write(text)
+        with open(os.path.join(dir, 'manifest'), 'w') as file:
+            file.write(manifest)
+        return subprocess.run((sys.executable, os.path.join(top_dir, 'lola.py'), '-j', '2', '-m', 'manifest'),
+                              cwd=dir, stderr=subprocess.PIPE, universal_newlines=True)
+
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as dir:
+            result = self.run_batch(dir, { 'one.ll': "start : A END ;\n", 'two.ll': "start : B B END ;\n" },
+                                    "# grammars\none.ll\n\ntwo.ll two-gram.py python\n")
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with open(os.path.join(dir, 'one.h')) as file:
+                self.assertIn("FIRST_NON_TERMINAL = 3,", file.read())
+            module = load_module(os.path.join(dir, 'two-gram.py'))
+            self.assertTrue(hasattr(module, 'parse_table'))
+            self.assertIn("lola: 2 grammars", result.stderr)
+
+    def test_error(self):
+        with tempfile.TemporaryDirectory() as dir:
+            result = self.run_batch(dir, { 'good.ll': "start : A END ;\n", 'bad.ll': "start : A END\n" },
+                                    "good.ll\nbad.ll\n")
+            self.assertNotEqual(result.returncode, 0)
+            self.assertTrue(os.path.exists(os.path.join(dir, 'good.h')))
+            self.assertIn("bad.ll:", result.stderr)
+            self.assertIn("lola: bad.ll failed", result.stderr)
+            self.assertNotIn("lola: good.ll failed", result.stderr)
+
+def calc_grammar():
+    with open(os.path.join(top_dir, 'calc-gram.ll')) as file:
+        return file.read()
+
+class CountingCache(lola.TableCache):
+    hits = 0
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry:
+            self.hits += 1
+        return entry
+
+if __name__ == '__main__':
+    unittest.main()